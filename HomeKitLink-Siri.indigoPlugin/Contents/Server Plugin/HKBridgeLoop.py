@@ -0,0 +1,103 @@
+"""
+One asyncio event loop hosting every HomeKit bridge.
+
+Normally each bridge gets its own threading.Thread running AccessoryDriver.start,
+its own asyncio.new_event_loop() and its own unbounded ThreadPoolExecutor.  With
+a dozen bridges that is a dozen loops waking up, and dozens of SyncWorker threads.
+
+BridgeLoop runs a single loop in a single thread with one bounded executor.  Each
+driver is created with loop=BridgeLoop.loop and started/stopped as a task on it, so
+the HAPServers all share that loop.  Bridges stay isolated - each one is started
+and stopped on its own, and a bridge whose async_start fails is reported back via
+on_failure so only that bridge is restarted.  on_started is told of each bridge that
+does start, so the plugin can reset that bridge's restart backoff.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("Plugin.HomeKit_pyHap")
+
+
+class BridgeLoop:
+    """Event loop thread shared by all AccessoryDrivers."""
+
+    def __init__(self, max_workers=8, on_failure=None, on_started=None):
+        self.max_workers = max_workers
+        self.on_failure = on_failure
+        self.on_started = on_started
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="BridgeWorker")
+        self.loop.set_default_executor(self.executor)
+        self.loop.set_exception_handler(self._exception_handler)
+        self.drivers = {}  # indigodeviceid -> driver
+        self.thread = threading.Thread(name="HomeKit Bridges Loop", target=self._run, daemon=True)
+        self.thread.start()
+
+    def __repr__(self):
+        return f"BridgeLoop({len(self.drivers)} bridges, {self.max_workers} workers)"
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        logger.debug("Shared Bridge event loop running")
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+            logger.debug("Shared Bridge event loop closed")
+
+    def _exception_handler(self, loop, context):
+        ## An exception in one bridge's task shouldn't take down the loop the others are using
+        logger.debug(f"Shared Bridge loop exception: {context.get('message')}", exc_info=context.get("exception"))
+
+    def is_running(self):
+        return self.thread.is_alive() and self.loop.is_running()
+
+    def start_driver(self, driver):
+        """Start driver on the shared loop.  Returns a concurrent Future for its async_start."""
+        ## publish() compares the calling thread against tid to decide whether it is on the loop
+        driver.tid = self.thread
+        driver._validate_start()
+        self.drivers[driver.indigodeviceid] = driver
+        future = asyncio.run_coroutine_threadsafe(driver.async_start(), self.loop)
+        future.add_done_callback(lambda fut, driver=driver: self._driver_started(driver, fut))
+        return future
+
+    def _driver_started(self, driver, future):
+        if future.cancelled():
+            return
+        exception = future.exception()
+        if exception is None:
+            logger.debug(f"Bridge {driver.indigodeviceid} started on shared loop")
+            if self.on_started is not None:
+                self.on_started(driver)
+            return
+        logger.error(f"Bridge {driver.indigodeviceid} failed to start: {exception}")
+        logger.debug("Bridge start exception", exc_info=exception)
+        self.drivers.pop(driver.indigodeviceid, None)
+        if self.on_failure is not None:
+            ## restart happens off the loop, it calls back into Indigo
+            threading.Thread(target=self.on_failure, args=(driver,), daemon=True).start()
+
+    def stop_driver(self, driver, timeout=5):
+        """Stop one driver and wait for it, leaving the loop and the other bridges running."""
+        self.drivers.pop(driver.indigodeviceid, None)
+        if not self.is_running():
+            return False
+        future = asyncio.run_coroutine_threadsafe(driver.async_stop(), self.loop)
+        try:
+            future.result(timeout=timeout)
+            return True
+        except Exception:
+            logger.debug(f"Bridge {driver.indigodeviceid} did not stop cleanly", exc_info=True)
+            return False
+
+    def shutdown(self, timeout=5):
+        for driver in list(self.drivers.values()):
+            self.stop_driver(driver, timeout=timeout)
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=timeout)
+        self.executor.shutdown(wait=False)
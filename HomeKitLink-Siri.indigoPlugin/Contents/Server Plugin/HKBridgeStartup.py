@@ -0,0 +1,165 @@
+"""
+Concurrent bridge startup, with a readiness event per bridge.
+
+Indigo calls deviceStartComm for each bridge device in turn, and each one used to build
+all of its accessories (an indigo.devices lookup per accessory, an IID allocation per
+characteristic), start its driver and then sleep 0.5 seconds before the next bridge got
+a look in.  runConcurrentThread then waited a fixed 1 + 5 + 10 seconds before saying
+the accessories were started, however long the bridges actually took.
+
+BridgeStartup runs each bridge's build and start on a small pool, so deviceStartComm
+returns straight away and the bridges are built side by side.  The Indigo device
+records they need are read beforehand in one pass (update_deviceList seeds the state
+cache) so the builds don't each go back to the Indigo Server.
+
+Every enabled bridge device is expected at startup and has a threading.Event, set once
+its driver has registered its mDNS service (HomeDriver.advertised) or failed to.  A pool
+worker returns as soon as its bridge is built and started, and one waiter thread watches
+all the advertised events, so mDNS registration never holds up the next bridge's build.
+runConcurrentThread waits on those rather than sleeping, and the time from plugin
+start to every bridge advertised is logged.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("Plugin.HomeKit_pyHap")
+
+MAX_WORKERS = 4
+ADVERTISE_TIMEOUT = 60
+WAITER_INTERVAL = 0.1
+
+
+class BridgeStartup:
+    """Bridge device id -> readiness Event, with the pool the bridges are started on."""
+
+    def __init__(self, started=None, max_workers=MAX_WORKERS, advertise_timeout=ADVERTISE_TIMEOUT):
+        self.started = started if started != None else time.monotonic()
+        self.max_workers = max_workers
+        self.advertise_timeout = advertise_timeout
+        self.events = {}
+        self.failed = set()
+        self.reported = False
+        self._lock = threading.Lock()
+        self._executor = None
+        self._advertising = {}  ## deviceid -> (name, advertised Event, time built, deadline)
+        self._waiter = None
+
+    def __repr__(self):
+        ready = sum(1 for event in self.events.values() if event.is_set())
+        return f"BridgeStartup({ready}/{len(self.events)} bridges ready, {len(self.failed)} failed)"
+
+    def expect(self, deviceid):
+        """Readiness event for a bridge device, created if it isn't expected yet."""
+        with self._lock:
+            event = self.events.get(deviceid)
+            if event is None:
+                event = self.events[deviceid] = threading.Event()
+            return event
+
+    def forget(self, deviceid):
+        """Stop waiting for a bridge, e.g. one that was disabled before it started."""
+        with self._lock:
+            event = self.events.pop(deviceid, None)
+        if event is not None:
+            event.set()
+        self._check_all_ready()
+
+    def submit(self, deviceid, name, start):
+        """Run start() on the pool.  It returns the bridge's HomeDriver, or None if it failed."""
+        self.expect(deviceid)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="BridgeStartup")
+            executor = self._executor
+        return executor.submit(self.run, deviceid, name, start)
+
+    def run(self, deviceid, name, start):
+        """Build and start one bridge in this thread, leaving the wait for its advertisement to the waiter."""
+        begin = time.monotonic()
+        driver = None
+        try:
+            driver = start()
+        except Exception:
+            logger.debug(f"Exception starting Bridge {name}", exc_info=True)
+        if driver is None:
+            self.ready(deviceid, name, ok=False)
+            return None
+        built = time.monotonic()
+        logger.debug(f"Bridge {name} built in {built - begin:.2f}s")
+        advertised = getattr(driver, "advertised", None)
+        if advertised is None or advertised.is_set():
+            self.ready(deviceid, name)
+            return driver
+        with self._lock:
+            self._advertising[deviceid] = (name, advertised, built, built + self.advertise_timeout)
+            if self._waiter is None or not self._waiter.is_alive():
+                self._waiter = threading.Thread(target=self._wait_advertised, name="BridgeAdvertised", daemon=True)
+                self._waiter.start()
+        return driver
+
+    def _wait_advertised(self):
+        ## one thread for every bridge waiting on mDNS, it ends when none are left
+        while True:
+            now = time.monotonic()
+            finished = []
+            with self._lock:
+                if not self._advertising:
+                    self._waiter = None
+                    return
+                for deviceid, (name, advertised, built, deadline) in list(self._advertising.items()):
+                    if advertised.is_set() or now >= deadline:
+                        del self._advertising[deviceid]
+                        finished.append((deviceid, name, advertised.is_set(), built))
+            for deviceid, name, ok, built in finished:
+                if ok:
+                    logger.debug(f"Bridge {name} advertised {now - built:.2f}s after it was built")
+                else:
+                    logger.info(f"Bridge {name} not advertised after {self.advertise_timeout} seconds, not waiting on it any longer.")
+                self.ready(deviceid, name, ok=ok)
+            time.sleep(WAITER_INTERVAL)
+
+    def ready(self, deviceid, name, ok=True):
+        """Mark a bridge as started (ok) or given up on, and report once all are."""
+        if not ok:
+            self.failed.add(deviceid)
+        else:
+            self.failed.discard(deviceid)
+        self.expect(deviceid).set()
+        logger.debug(f"Bridge {name} {'ready' if ok else 'failed'} {time.monotonic() - self.started:.2f}s after plugin start")
+        self._check_all_ready()
+
+    def all_ready(self):
+        with self._lock:
+            return all(event.is_set() for event in self.events.values())
+
+    def wait(self, timeout=None):
+        """Block until every expected bridge is ready, True if they all are within timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for event in list(self.events.values()):
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not event.wait(remaining):
+                return False
+        return True
+
+    def _check_all_ready(self):
+        with self._lock:
+            if self.reported or not self.events or not all(event.is_set() for event in self.events.values()):
+                return
+            self.reported = True
+            count = len(self.events)
+            failed = len(self.failed)
+        elapsed = time.monotonic() - self.started
+        if failed:
+            logger.info(f"{count - failed} of {count} Bridges advertised {elapsed:.1f} seconds after plugin start, {failed} failed to start.")
+        else:
+            logger.info(f"All {count} Bridges advertised {elapsed:.1f} seconds after plugin start.")
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._advertising.clear()
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,153 @@
+"""
+Memoized device classification for the config dialog menus.
+
+device_list_generator walked all of indigo.devices every time the dialog asked for the
+device menu - each click on the device/light/camera/sensor selector, each refresh - and
+looked at every device's plugin, model, type and brightness attribute to decide whether
+it belonged.  Selecting a device then ran detectHomeKitType, which probes the device with
+dir() and "x" in dev.states a dozen times.  With a few thousand Indigo devices the dialog
+stopped for seconds after every click.
+
+DeviceCatalog makes that pass once, the first time a dialog needs it.  Each device is
+kept as a small DeviceEntry (name, assigned bridge, the menu categories it is in) and
+each category as a list sorted by name, built from the entries when first asked for.
+detectHomeKitType results are kept per device id together with the device's lastChanged.
+
+deviceUpdated passes every updated device through updated(), which refreshes its entry
+and drops its HomeKit type if lastChanged moved on; the category lists are only rebuilt
+when a device's name or categories actually changed.  deviceCreated/deviceDeleted add and
+remove entries.  Action groups are not cached, Indigo sends no updates for them.
+"""
+
+import logging
+import threading
+import time
+
+import indigo
+
+logger = logging.getLogger("Plugin.HomeKit_pyHap")
+
+## the device menu choices in the config dialog, other than action_group
+CATEGORIES = ("device", "BI_camera", "lights", "SS_camera", "switch", "sensor", "doorbell")
+
+
+def categories_for(device):
+    """The config menu categories an Indigo device is listed under."""
+    categories = ["device"]
+    pluginId = device.pluginId
+    model = device.model
+    if pluginId == "com.GlennNZ.indigoplugin.BlueIris" and model == "BlueIris Camera":
+        categories.append("BI_camera")
+    if hasattr(device, "brightness"):
+        categories.append("lights")
+    if (pluginId == "org.cynic.indigo.securityspy" and model == "Camera") or (pluginId == "com.flyingdiver.indigoplugin.securityspy" and model == "SecuritySpy Camera"):
+        categories.append("SS_camera")
+    if type(device) == indigo.RelayDevice:
+        categories.append("switch")
+    if type(device) == indigo.SensorDevice:
+        categories.append("sensor")
+    if "onOffState" in device.states:  # for doorbell only use onOffState devices
+        categories.append("doorbell")
+    return frozenset(categories)
+
+
+class DeviceEntry:
+    """What the config menus need of one Indigo device."""
+
+    __slots__ = ("id", "name", "bridge", "categories", "lastChanged")
+
+    def __init__(self, device):
+        self.id = device.id
+        self.name = device.name
+        try:
+            self.bridge = int(device.pluginProps.get("HomeKit_bridgeUniqueID", 99))  ## shouldnt ever =99 if published
+        except ValueError:
+            self.bridge = 99
+        self.categories = categories_for(device)
+        self.lastChanged = device.lastChanged
+
+    def __repr__(self):
+        return f"DeviceEntry({self.id}, {self.name}, bridge {self.bridge})"
+
+
+class DeviceCatalog:
+    """Device id -> DeviceEntry, sorted lists per category, and memoized HomeKit types."""
+
+    def __init__(self):
+        self._entries = None   ## built on first use
+        self._lists = {}
+        self._types = {}       ## device id -> (lastChanged, detected HomeKit type)
+        self._lock = threading.RLock()
+        self.builds = 0
+
+    def __repr__(self):
+        count = "not built" if self._entries is None else f"{len(self._entries)} devices"
+        return f"DeviceCatalog({count}, {len(self._types)} types)"
+
+    def _ensure(self):
+        with self._lock:
+            if self._entries is None:
+                start = time.perf_counter()
+                entries = {}
+                for device in indigo.devices:
+                    try:
+                        entries[device.id] = DeviceEntry(device)
+                    except:
+                        logger.debug(f"Device catalog skipping device {device.id}", exc_info=True)
+                self._entries = entries
+                self._lists.clear()
+                self.builds += 1
+                logger.debug(f"Device catalog built, {len(entries)} devices in {(time.perf_counter() - start) * 1000:.1f} ms")
+            return self._entries
+
+    def entry(self, deviceid):
+        return self._ensure().get(deviceid)
+
+    def category(self, name):
+        """DeviceEntries in a config menu category, sorted by name."""
+        with self._lock:
+            entries = self._ensure()
+            listed = self._lists.get(name)
+            if listed is None:
+                listed = sorted((entry for entry in entries.values() if name in entry.categories), key=lambda entry: entry.name)
+                self._lists[name] = listed
+            return listed
+
+    def updated(self, device):
+        """deviceUpdated/deviceCreated - cheap, it sees every device change in Indigo."""
+        memo = self._types.get(device.id)
+        if memo is not None and memo[0] != device.lastChanged:
+            self._types.pop(device.id, None)
+        if self._entries is None:
+            return
+        try:
+            entry = DeviceEntry(device)
+        except:
+            logger.debug(f"Device catalog skipping device {device.id}", exc_info=True)
+            return
+        with self._lock:
+            old = self._entries.get(device.id)
+            self._entries[device.id] = entry
+            if old is None or old.name != entry.name or old.categories != entry.categories:
+                self._lists.clear()
+
+    def remove(self, deviceid):
+        """deviceDeleted."""
+        self._types.pop(deviceid, None)
+        with self._lock:
+            if self._entries is not None and self._entries.pop(deviceid, None) is not None:
+                self._lists.clear()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = None
+            self._lists.clear()
+            self._types.clear()
+
+    def homekit_type(self, deviceid):
+        """Memoized detectHomeKitType result, None if not known or stale."""
+        memo = self._types.get(deviceid)
+        return None if memo is None else memo[1]
+
+    def remember_homekit_type(self, device, detected):
+        self._types[device.id] = (getattr(device, "lastChanged", None), detected)
@@ -0,0 +1,141 @@
+"""
+Indexed registry of the published HomeKit devices.
+
+Replaces the old list of dicts (self.device_list_internal) which was walked
+with next(enumerate(...)) on every deviceUpdated and every HomeKit getter.
+Entries are still the same plain dicts - deviceid, devicename, accessory, aid,
+subtype, bridgeID, devicemodel, devicesensor, manufacturername - so existing
+code that reads/writes item["accessory"] etc. keeps working, but lookup is by
+Indigo device id, with secondary indexes by bridge id and subtype.
+"""
+
+import time
+
+
+class DeviceRegistry:
+    """
+    Dict backed registry keyed by Indigo device id.
+
+    Iterating returns the entry dicts in insertion order, like the old list did.
+    First entry added for a device id wins - later duplicates (e.g. a linked
+    doorbell that is also published on its own) are ignored, which matches the
+    old behaviour of next() returning the first match.
+    """
+
+    def __init__(self):
+        self._by_id = {}
+        self._by_bridge = {}
+        self._by_subtype = {}
+
+    def __contains__(self, deviceid):
+        return deviceid in self._by_id
+
+    def __getitem__(self, deviceid):
+        return self._by_id[deviceid]
+
+    def __delitem__(self, deviceid):
+        self.remove(deviceid)
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __repr__(self):
+        return f"DeviceRegistry({len(self._by_id)} devices, {len(self._by_bridge)} bridges)"
+
+    def get(self, deviceid, default=None):
+        return self._by_id.get(deviceid, default)
+
+    def add(self, entry):
+        """Add an entry dict.  Returns False if the device id is already registered."""
+        deviceid = int(entry["deviceid"])
+        if deviceid in self._by_id:
+            return False
+        self._by_id[deviceid] = entry
+        self._by_bridge.setdefault(int(entry["bridgeID"]), {})[deviceid] = entry
+        self._by_subtype.setdefault(entry["subtype"], {})[deviceid] = entry
+        return True
+
+    append = add
+
+    def extend(self, entries):
+        for entry in entries:
+            self.add(entry)
+
+    def remove(self, deviceid):
+        """Remove and return entry for deviceid, or None if not registered."""
+        entry = self._by_id.pop(deviceid, None)
+        if entry is None:
+            return None
+        bridge = self._by_bridge.get(int(entry["bridgeID"]))
+        if bridge is not None:
+            bridge.pop(deviceid, None)
+            if not bridge:
+                del self._by_bridge[int(entry["bridgeID"])]
+        subtype = self._by_subtype.get(entry["subtype"])
+        if subtype is not None:
+            subtype.pop(deviceid, None)
+            if not subtype:
+                del self._by_subtype[entry["subtype"]]
+        return entry
+
+    def clear(self):
+        self._by_id.clear()
+        self._by_bridge.clear()
+        self._by_subtype.clear()
+
+    def ids(self):
+        return list(self._by_id.keys())
+
+    def for_bridge(self, bridgeid):
+        """Entries published on the given bridge, in insertion order."""
+        return list(self._by_bridge.get(int(bridgeid), {}).values())
+
+    def for_subtype(self, subtype):
+        return list(self._by_subtype.get(subtype, {}).values())
+
+    def bridges(self):
+        return list(self._by_bridge.keys())
+
+    def subtypes(self):
+        return list(self._by_subtype.keys())
+
+
+def benchmark_lookup(sizes=(10, 100, 600, 2000, 10000), lookups=20000):
+    """
+    Micro-benchmark: registry lookup vs the old linear list walk.
+    Registry cost should stay flat as the device count grows, list cost grows with it.
+    Run with: python3 HKDeviceRegistry.py
+    """
+    results = []
+    for size in sizes:
+        registry = DeviceRegistry()
+        old_list = []
+        for num in range(size):
+            entry = {"deviceid": 100000 + num, "devicename": f"Device {num}", "accessory": None, "aid": 100000 + num,
+                     "subtype": "LightBulb", "bridgeID": num % 4, "devicemodel": "", "devicesensor": "", "manufacturername": ""}
+            registry.add(entry)
+            old_list.append(entry)
+        ## worst realistic case for the list is a device towards the end
+        target = 100000 + size - 1
+
+        start = time.perf_counter()
+        for _ in range(lookups):
+            checkindex = next((i for i, item in enumerate(old_list) if item["deviceid"] == target), None)
+        list_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(lookups):
+            entry = registry.get(target)
+        registry_time = time.perf_counter() - start
+
+        results.append((size, list_time / lookups * 1e6, registry_time / lookups * 1e6))
+    return results
+
+
+if __name__ == "__main__":
+    print("{0:>8}  {1:>14}  {2:>14}".format("devices", "list us/lookup", "dict us/lookup"))
+    for size, list_us, registry_us in benchmark_lookup():
+        print("{0:>8}  {1:>14.3f}  {2:>14.3f}".format(size, list_us, registry_us))
@@ -0,0 +1,145 @@
+"""
+Single pass snapshot of the Indigo devices and action groups published to HomeKit.
+
+update_deviceList walked all of indigo.devices and indigo.actionGroups to find the
+published ids (checking duplicates with a list), then create_deviceList_internal went
+back to the Indigo Server with return_deviceorAG for every one of them to work out its
+HomeKit subtype, model and manufacturer - with 2,000 Indigo devices, thousands of round
+trips at every bridge start.
+
+build() walks each collection once.  For every published device it keeps a compact
+DeviceRecord with just what the internal list needs, worked out from the copy the
+iteration already handed us, plus that copy for the state cache.  update_deviceList
+takes the published set from it and create_deviceList_internal its entries, so neither
+looks a device up again.  record() does the same for a single device object, for ids
+published later from the config UI.
+"""
+
+import logging
+
+import indigo
+
+import HKutils
+
+logger = logging.getLogger("Plugin.HomeKit_pyHap")
+
+
+class DeviceRecord:
+    """What create_deviceList_internal needs of one published device or action group."""
+
+    __slots__ = ("deviceid", "devicename", "subtype", "bridgeID", "devicemodel", "devicesensor", "manufacturername", "device")
+
+    def __init__(self, deviceid, devicename, subtype, bridgeID, devicemodel, devicesensor, manufacturername, device):
+        self.deviceid = deviceid
+        self.devicename = devicename
+        self.subtype = subtype
+        self.bridgeID = bridgeID
+        self.devicemodel = devicemodel
+        self.devicesensor = devicesensor
+        self.manufacturername = manufacturername
+        self.device = device
+
+    def __repr__(self):
+        return f"DeviceRecord({self.deviceid}, {self.devicename}, {self.subtype}, bridge {self.bridgeID})"
+
+    def entry(self):
+        """A new device_list_internal entry for this device."""
+        return {"deviceid": self.deviceid,
+                "devicename": self.devicename,
+                "accessory": None,
+                "aid": self.deviceid,
+                "subtype": self.subtype,
+                "bridgeID": self.bridgeID,
+                "devicemodel": self.devicemodel,
+                "devicesensor": self.devicesensor,
+                "manufacturername": self.manufacturername}
+
+
+def record(device, debug=False):
+    """DeviceRecord for an Indigo device or action group object."""
+    device_props = device.pluginProps
+    devicename = device_props.get("homekit-name", "")
+    deviceType = device_props.get("HomeKit_deviceSubtype", "")
+    devicesensor = device_props.get("HomeKit_deviceSensor", "")
+    # Move to subtype reflecting plugins belief as to type of Accessory
+    # Currently Lightbulb can reflect Lightbulb_switch, HueLightBulb and now ColorTempLightBulb
+    if str(deviceType) == "LightBulb":
+        supportsRGB = getattr(device, "supportsRGB", False)  ## Defaulting to lamp model
+        supportsWhiteTemperature = getattr(device, "supportsWhiteTemperature", False)
+        if supportsRGB and supportsWhiteTemperature:
+            deviceType = "ColorTempLightBulb"  ## Modify the internal list subtype
+        elif supportsRGB and not supportsWhiteTemperature:
+            deviceType = "HueLightBulb"
+        elif "brightnessLevel" in device.states and hasattr(device, "brightness"):
+            deviceType = "LightBulb"   ## Dimmer variety
+        elif type(device) == indigo.DimmerDevice:
+            deviceType = "LightBulb"  ## Dimmer variety
+        else:
+            ## simple switch
+            deviceType = "LightBulb_switch"
+        if debug:
+            logger.debug("LightBulb Device Found and assessed.  Accessory will be a {} type of LightBulb".format(deviceType))
+    if str(deviceType) == "Fan":
+        if type(device) == indigo.SpeedControlDevice or "brightnessLevel" in device.states:
+            deviceType = "Fan"
+        else:
+            deviceType = "Fan_switch"
+    try:
+        deviceBridgeID = int(device_props.get("HomeKit_bridgeUniqueID", 99))
+    except ValueError:
+        deviceBridgeID = 99
+    if type(device) == indigo.ActionGroup:
+        devicemodel = "Action Group"
+        manufacturerName = "Indigo Domotics"
+    else:
+        owner_props = device.ownerProps
+        zwave = device.protocol == indigo.kProtocol.ZWave
+        devicemodel = owner_props.get("zwModelName", "Zwave Model") if zwave else device.model
+        if device.pluginId == "com.perceptiveautomation.indigoplugin.devicecollection":
+            manufacturerName = "Indigo Domotics"
+        elif "manufacturerName" in owner_props:
+            manufacturerName = owner_props["manufacturerName"]
+        elif "manufactureName" in owner_props:
+            manufacturerName = owner_props["manufactureName"]
+        elif zwave:
+            manufacturerName = owner_props.get("zwManufactureName", "Zwave")
+        else:
+            manufacturerName = device.pluginId  ## truncate device name...device.pluginId
+    if debug:
+        logger.debug("Device: {},  ID: {}  Model: {} Type: {}  Sensor  {}   ManufacturerName: {}".format(devicename, device.id, devicemodel, deviceType, devicesensor, manufacturerName))
+    ## santise names ## max length of all = 64
+    return DeviceRecord(int(device.id),
+                        HKutils.cleanup_name_for_homekit(devicename),
+                        deviceType,
+                        deviceBridgeID,
+                        HKutils.cleanup_name_for_homekit(devicemodel),
+                        devicesensor,
+                        HKutils.cleanup_name_for_homekit(manufacturerName),
+                        device)
+
+
+def build(debug=False):
+    """
+    One pass over indigo.devices and one over indigo.actionGroups.
+
+    Returns (records, published, count): device id -> DeviceRecord, the set of published
+    ids (including any whose record failed), and the number marked for publishing
+    counting duplicate ids, as update_deviceList counted.
+    """
+    records = {}
+    published = set()
+    count = 0
+    for collection in (indigo.devices, indigo.actionGroups):
+        for device in collection:
+            if not device.pluginProps.get("HomeKit_publishDevice", False):
+                continue
+            count += 1
+            if device.id in published:
+                logger.error("Duplicate ID Skipped")
+                continue
+            published.add(device.id)
+            try:
+                records[device.id] = record(device, debug)
+            except:
+                logger.exception("Caught Exception with device_list:  Hopefully still adding other devices..")
+    return records, published, count
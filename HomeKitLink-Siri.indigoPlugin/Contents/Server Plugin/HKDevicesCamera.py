@@ -3,13 +3,12 @@ import asyncio
 from datetime import timedelta
 import logging
 
-from scipy.stats import false_discovery_control
-
 from indigoffmpeg.core import IndigoFFmpeg, FFMPEG_STDERR
 from homekit_audio_proxy import AudioProxy
 from typing import Any
 from HKutils import pid_is_alive
 from HKutils import SimpleIntervalScheduler
+import HKSharedStream
 import time as t
 import datetime
 from typing import Callable
@@ -376,6 +375,7 @@ FFMPEG_WATCHER = "ffmpeg_watcher"
 FFMPEG_PID = "ffmpeg_pid"
 SESSION_ID = "session_id"
 AUDIO_PROXY = "audio_proxy"
+SHARED_STREAM = "shared_stream"
 
 CONFIG_DEFAULTS = {
     CONF_SUPPORT_AUDIO: DEFAULT_SUPPORT_AUDIO,
@@ -524,8 +524,8 @@ class Camera(HomeAccessory,  PyhapCamera):
 
             self.base_config = stream_config
             input_source = self.config.get(CONF_STREAM_SOURCE)
-            ffprobe_video = self.config.get("ffprobe_video")
-            ffprobe_audio = self.config.get("ffprobe_audio")
+            ffprobe_video = self.plugin.ffprobe_service.get_video(self.config)
+            ffprobe_audio = self.plugin.ffprobe_service.get_audio(self.config)
 
             # --- Log ffprobe results if available ---
             if ffprobe_video:
@@ -762,13 +762,41 @@ class Camera(HomeAccessory,  PyhapCamera):
             # ============================================================
             # Build input source
             # ============================================================
-            input_source = input_source + "&kbps=" + str(output_vars["v_max_bitrate"]) + "&cache=1"
-
-            if strategy["input_extra"]:
-                # HEVC or other codecs needing larger probe
-                input_source = strategy["input_extra"] + "-rtsp_transport tcp -i " + input_source
+            warm_input = self.plugin.camera_warm_input(self.config)
+            if warm_input:
+                ## warm source already connected, starts from its buffered keyframe
+                _LOGGER.debug("[%s] Using warm source %s", self.display_name, warm_input)
+                input_source = "-f mpegts -i " + warm_input
             else:
-                input_source = "-rtsp_transport tcp -i " + input_source
+                input_source = input_source + "&kbps=" + str(output_vars["v_max_bitrate"]) + "&cache=1"
+
+                if strategy["input_extra"]:
+                    # HEVC or other codecs needing larger probe
+                    input_source = strategy["input_extra"] + "-rtsp_transport tcp -i " + input_source
+                else:
+                    input_source = "-rtsp_transport tcp -i " + input_source
+
+            # ============================================================
+            # Shared source - one pull / transcode per camera for every viewer
+            # ============================================================
+            if self.plugin.camera_shared_streams != None:
+                try:
+                    shared_key = HKSharedStream.stream_key(self.display_name, strategy["use_copy"], output_vars)
+                    shared_input = await self.plugin.camera_shared_streams.acquire(
+                        shared_key,
+                        input_source.split(),
+                        HKSharedStream.output_args(strategy["use_copy"], output_vars, self.config[CONF_SUPPORT_AUDIO]),
+                    )
+                    session_info[SHARED_STREAM] = shared_key
+                    input_source = "-f mpegts -i " + shared_input
+                    ## this session only packetises and encrypts, with its own SRTP key and SSRC
+                    session_vars = dict(output_vars, v_map=HKSharedStream.SHARED_V_MAP, a_map=HKSharedStream.SHARED_A_MAP)
+                    output = VIDEO_OUTPUT_COPY.format(**session_vars)
+                    if self.config[CONF_SUPPORT_AUDIO]:
+                        output = output + " " + AUDIO_OUTPUT.format(**session_vars)
+                    _LOGGER.debug("[%s] Using shared stream, output settings: %s", self.display_name, output)
+                except:
+                    _LOGGER.debug("[%s] Shared stream not available, reading camera directly", self.display_name, exc_info=True)
 
             _LOGGER.debug("INPUT SOURCE: %s", input_source)
 
@@ -789,6 +817,7 @@ class Camera(HomeAccessory,  PyhapCamera):
                 _LOGGER.error("Failed to open ffmpeg stream")
                 if audio_proxy:
                     await audio_proxy.async_stop()
+                self._release_shared_stream(session_info)
                 return False
 
             _LOGGER.info(
@@ -832,6 +861,8 @@ class Camera(HomeAccessory,  PyhapCamera):
 
         except:
             _LOGGER.exception("Start Stream Exception")
+            ## don't leave the camera's shared ffmpeg running for a session that never started
+            self._release_shared_stream(session_info)
 
     async def start_stream_old(self, session_info, stream_config):
         """Start a new stream with the given configuration."""
@@ -847,8 +878,8 @@ class Camera(HomeAccessory,  PyhapCamera):
             input_source = self.config.get(CONF_STREAM_SOURCE)
 
             # --- Log ffprobe results if available ---
-            ffprobe_video = self.config.get("ffprobe_video")
-            ffprobe_audio = self.config.get("ffprobe_audio")
+            ffprobe_video = self.plugin.ffprobe_service.get_video(self.config)
+            ffprobe_audio = self.plugin.ffprobe_service.get_audio(self.config)
 
             if ffprobe_video:
                 _LOGGER.debug(
@@ -1084,6 +1115,7 @@ class Camera(HomeAccessory,  PyhapCamera):
                 _LOGGER.error("Failed to open ffmpeg stream")
                 if audio_proxy:
                     await audio_proxy.async_stop()
+                self._release_shared_stream(session_info)
                 return False
 
             _LOGGER.info(
@@ -1187,11 +1219,17 @@ class Camera(HomeAccessory,  PyhapCamera):
             await self.sessions[session_id][FFMPEG_WATCHER].stop()
             self.sessions[session_id].pop(FFMPEG_WATCHER)
         self._async_stop_ffmpeg_watch(session_id)
+        self._release_shared_stream(self.sessions[session_id])
         if session_id in self.sessions and "stream_idx" in self.sessions[session_id]:
             self.set_streaming_available(self.sessions[session_id]["stream_idx"])
         self.set_streaming_available(self.sessions[session_id]["stream_idx"])
         return False
 
+    def _release_shared_stream(self, session_info) -> None:
+        """Drop this session's hold on its camera's shared stream, if it had one."""
+        if (shared_key := session_info.pop(SHARED_STREAM, None)) is not None:
+            self.plugin.camera_shared_streams.release(shared_key)
+
     def _async_stop_ffmpeg_watch(self, session_id: str) -> None:
         """Cleanup a streaming session after stopping."""
         try:
@@ -1345,6 +1383,7 @@ class Camera(HomeAccessory,  PyhapCamera):
         session_id = session_info["id"]
         if proxy := session_info.pop(AUDIO_PROXY, None):
             await proxy.async_stop()
+        self._release_shared_stream(session_info)
         if not (stream := session_info.get("stream")):
             _LOGGER.debug("No stream for session ID %s", session_id)
             return
@@ -1376,48 +1415,38 @@ class Camera(HomeAccessory,  PyhapCamera):
             asyncio.create_task(self.stop_stream(session_info))
         await super().stop()
 
-    def get_snapshot(self, image_size):  # pylint: disable=unused-argument, no-self-use
-    #async def async_get_snapshot(self, image_size):
+    async def async_get_snapshot(self, image_size):
+        ## Served from plugin.snapshot_store in memory - no file I/O, and never a half written image
         try:
-            debug_function = False
-            if self.plugin.debug7:
-                debug_function = True
+            debug_function = self.plugin.debug7
             if "BI_name" in self.config:
                 camname = self.config["BI_name"]
-                #_LOGGER.info("Get_Snapshot Config: called for this camera Name {}".format(camname ))
                 if "image-width" in image_size:
                     width = image_size["image-width"]
                 else:
                     width = 1380
-                self.plugin.camera_snapShot_Requested_que.put((camname,width))  # que a tuple..
-                #_LOGGER.info("Image Size:{}".format(image_size))
-                path = self.plugin.cameraimagePath + "/" + camname + '.jpg'
-            else:
-                ## or default saved to plugin packages
-                path = self.plugin.pluginPath + "/cameras/snapshot.jpg"
-            if debug_function:
-                _LOGGER.debug(f"Entering file read for: {path}")
-
-            try:
-                if debug_function:
-                    _LOGGER.debug("Before open()")
-                with open(path, 'rb') as fp:
-                    if debug_function:
-                        _LOGGER.debug("After open(), before read()")
-                    data = fp.read()
+                self.plugin.camera_snapShot_Requested_que.put((camname, width))  # que a tuple..
+                ## Home app is open, live view may be next
+                self.plugin.camera_warm(self.config)
+                data = self.plugin.snapshot_store.get(camname, width)
+                if data is None and self.plugin.snapshot_fetcher is not None:
+                    ## nothing downloaded yet for this camera, wait briefly on the download
+                    future = self.plugin.snapshot_fetcher.request(self.config, width)
+                    if future is not None:
+                        try:
+                            data = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=5)
+                        except asyncio.TimeoutError:
+                            data = None
+                if data is None:
+                    data = self.plugin.snapshot_store.get_default(camname)
+                if data is not None:
                     if debug_function:
-                        _LOGGER.debug("After read()")
-                        _LOGGER.debug(f"Data type: {type(data)}")
-                        _LOGGER.debug(f"Data length: {len(data)}")
-                        _LOGGER.debug(f"First 32 bytes: {data[:32]!r}")
-                        _LOGGER.debug(f"get_snapshot returning bytes len={len(data)} header={data[:8]!r}")
+                        _LOGGER.debug(f"async_get_snapshot returning bytes len={len(data)} header={data[:8]!r} for {camname}")
                     return data
-            except Exception as e:
-                _LOGGER.debug(f"Exception during file read: {e}")
-                raise
-
+            ## or default saved to plugin packages
+            return self.plugin.get_default_snapshot()
         except:
-            _LOGGER.debug("Error in get snapshot:",exc_info=True)
+            _LOGGER.debug("Error in get snapshot:", exc_info=True)
             raise
 
 
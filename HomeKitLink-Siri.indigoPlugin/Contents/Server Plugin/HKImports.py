@@ -0,0 +1,160 @@
+"""
+Deferred imports and import timing for plugin startup.
+
+plugin.py used to import every accessory type and its stack at load - the Blue Iris and
+SecuritySpy camera modules (ffmpeg wrappers, audio proxy, shared streams), the thermostat,
+requests for the snapshot fetcher, the QR code libraries - whether or not anything of
+that type is published.  HKDevicesCamera also pulled in SciPy/NumPy for nothing.
+
+LazyModule stands in for a module and imports it on first attribute access, so
+HKThermostat.Thermostat(...) in the subtype chain only loads HKThermostat when a
+thermostat is actually set up.  The time that takes is logged at debug.
+
+ImportTimer is the -X importtime report, built in: a meta path finder that times every
+module executed while it is installed, self and cumulative, in microseconds.  plugin.py
+installs it before its imports and logs the report at debug once the plugin is up, so a
+new heavy import shows up in the log rather than as a slow start.
+"""
+
+import importlib
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger("Plugin.HomeKit_pyHap")
+
+
+class LazyModule:
+    """A module imported on first attribute access."""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def __repr__(self):
+        return f"LazyModule({self._name}, {'loaded' if self.loaded else 'not loaded'})"
+
+    @property
+    def loaded(self):
+        """True once the module has been imported, here or by anything else."""
+        return self._name in sys.modules
+
+    def load(self):
+        module = self._module
+        if module is None:
+            start = time.perf_counter()
+            already = self.loaded
+            module = importlib.import_module(self._name)
+            if not already:
+                logger.debug(f"Imported {self._name} on demand in {(time.perf_counter() - start) * 1000:.1f} ms")
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.load(), attr, value)
+
+
+class _TimedLoader:
+    """Wraps a spec's loader to time create_module and exec_module."""
+
+    def __init__(self, timer, name, loader):
+        self.timer = timer
+        self.name = name
+        self.loader = loader
+
+    def __getattr__(self, attr):
+        return getattr(self.loader, attr)
+
+    def create_module(self, spec):
+        ## extension modules do their work here rather than in exec_module
+        create = getattr(self.loader, "create_module", None)
+        if create is None:
+            return None
+        return self.timer._timed(self.name, create, spec, final=False)
+
+    def exec_module(self, module):
+        ## the module only ever sees its real loader
+        module.__loader__ = module.__spec__.loader = self.loader
+        self.timer._timed(self.name, self.loader.exec_module, module, final=True)
+
+
+class ImportTimer:
+    """Meta path finder recording (module, self us, cumulative us, depth) per import."""
+
+    def __init__(self):
+        self.records = []
+        self.started = time.perf_counter()
+        self._local = threading.local()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path=None, target=None):
+        if getattr(self._local, "finding", False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+        spec.loader = _TimedLoader(self, name, spec.loader)
+        return spec
+
+    def _timed(self, name, func, arg, final):
+        stack = self._local.__dict__.setdefault("stack", [])
+        ## create_module and exec_module of one module add up to one entry
+        if not stack or stack[-1][0] != name:
+            stack.append([name, 0.0, 0.0])
+        entry = stack[-1]
+        start = time.perf_counter()
+        try:
+            result = func(arg)
+        except BaseException:
+            entry[1] += time.perf_counter() - start
+            self._record(stack)
+            raise
+        entry[1] += time.perf_counter() - start
+        if final:
+            self._record(stack)
+        return result
+
+    def _record(self, stack):
+        name, cumulative, children = stack.pop()
+        if stack:
+            stack[-1][2] += cumulative
+        self.records.append((name, int((cumulative - children) * 1e6), int(cumulative * 1e6), len(stack)))
+
+    def report(self, log=None, top=25):
+        """Log the slowest imports and each top level import's cumulative cost at debug."""
+        log = log or logger
+        if not self.records:
+            return
+        total = sum(self_us for _, self_us, _, _ in self.records)
+        log.debug(f"Startup imported {len(self.records)} modules in {total / 1000:.1f} ms, "
+                  f"{(time.perf_counter() - self.started) * 1000:.1f} ms since the timer started")
+        log.debug(f"{'self [us]':>10} | {'cumulative':>10} | imported package")
+        for name, self_us, cumulative_us, depth in self.records:
+            if depth == 0:
+                log.debug(f"{self_us:>10} | {cumulative_us:>10} | {name}")
+        log.debug(f"Slowest {top} modules by self time:")
+        for name, self_us, cumulative_us, depth in sorted(self.records, key=lambda record: -record[1])[:top]:
+            log.debug(f"{self_us:>10} | {cumulative_us:>10} | {'  ' * depth}{name}")
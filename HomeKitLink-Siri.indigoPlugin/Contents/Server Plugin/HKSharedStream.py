@@ -0,0 +1,159 @@
+"""
+One shared source per camera for live view, fanned out to every HomeKit viewer.
+
+Each iPhone, iPad, Apple TV or Watch opening a camera calls start_stream, which used to
+start its own ffmpeg pulling the same RTSP stream from Blue Iris / SecuritySpy and, for
+cameras that need it, transcoding it with libx264 - three viewers, three RTSP pulls and
+three encodes.
+
+SharedStreams runs the demux / transcode once per camera (per copy-or-encode setting),
+as a WarmSource writing MPEG-TS to a local TCP port.  Every session then runs a light
+ffmpeg that reads that port with -c:v copy and only packetises and encrypts to its own
+SRTP output, with the session's own key and SSRC.  Audio is carried as AAC in the shared
+stream and encoded per session for its audio proxy, which is cheap at HomeKit rates.
+
+Sources are reference counted by session.  When the last viewer leaves the source is
+kept for LINGER seconds, so closing and reopening a camera reuses it, then stopped.
+A transcoded source uses the bitrate asked for by the session that started it.
+"""
+
+import asyncio
+import logging
+import threading
+
+from HKWarmPool import WarmSource
+
+logger = logging.getLogger("Plugin.HomeKit_pyHap")
+
+LINGER = 10
+
+SHARED_VIDEO_COPY = "-map {v_map} -c:v copy"
+
+SHARED_VIDEO_TRANSCODE = (
+    "-map {v_map} "
+    "-c:v libx264 "
+    "{v_profile}"
+    "-bf 0 "
+    "-preset ultrafast "
+    "-tune zerolatency "
+    "-pix_fmt yuv420p "
+    "-color_range mpeg "
+    "-g 15 "
+    "-keyint_min 15 "
+    "-r {fps} "
+    "-b:v {v_max_bitrate}k -bufsize {v_bufsize}k -maxrate {v_max_bitrate}k"
+)
+
+SHARED_AUDIO = "-map {a_map}? -c:a aac -b:a 64k"
+
+## maps for the per session ffmpeg reading the shared stream, which has one of each
+SHARED_V_MAP = "0:v:0"
+SHARED_A_MAP = "0:a:0"
+
+
+def stream_key(camname, use_copy, output_vars):
+    """Sessions with the same key can share a source."""
+    if use_copy:
+        return (camname, "copy")
+    return (camname, "libx264", output_vars["v_profile"].strip(), output_vars["fps"])
+
+
+def output_args(use_copy, output_vars, audio):
+    """ffmpeg output arguments for the shared stage, before its -f mpegts."""
+    template = SHARED_VIDEO_COPY if use_copy else SHARED_VIDEO_TRANSCODE
+    args = template.format(**output_vars).split()
+    if audio:
+        args += SHARED_AUDIO.format(**output_vars).split()
+    else:
+        args += ["-an"]
+    return args
+
+
+class _Shared:
+    __slots__ = ("source", "refs", "linger", "starting")
+
+    def __init__(self, source):
+        self.source = source
+        self.refs = 0
+        self.linger = None
+        self.starting = asyncio.ensure_future(source.start())
+
+
+class SharedStreams:
+    """Reference counted WarmSources, keyed by stream_key, on their own event loop thread."""
+
+    def __init__(self, ffmpeg_bin, linger=LINGER):
+        self.ffmpeg_bin = ffmpeg_bin
+        self.linger = linger
+        self.streams = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(name="Camera Shared Streams", target=self._run, daemon=True)
+        self.thread.start()
+
+    def __repr__(self):
+        return f"SharedStreams({', '.join(f'{key[0]}: {shared.refs} viewers' for key, shared in self.streams.items())})"
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def acquire(self, key, input_args, output_args):
+        """Add a viewer to the source for key, starting it if needed.  Awaitable from any loop, returns the local input url."""
+        future = asyncio.run_coroutine_threadsafe(self._async_acquire(key, input_args, output_args), self.loop)
+        return await asyncio.wrap_future(future)
+
+    async def _async_acquire(self, key, input_args, output_args):
+        shared = self.streams.get(key)
+        if shared is None:
+            source = WarmSource(key[0], self.ffmpeg_bin, input_args, pinned=True, output_args=output_args)
+            shared = self.streams[key] = _Shared(source)
+            logger.debug(f"[{key[0]}] Starting shared stream {key[1:]}")
+        ## a second viewer arriving while the first is starting it waits on the same start
+        try:
+            await shared.starting
+        except Exception:
+            if self.streams.get(key) is shared:
+                del self.streams[key]
+            raise
+        if shared.linger is not None:
+            shared.linger.cancel()
+            shared.linger = None
+        shared.refs += 1
+        logger.debug(f"[{key[0]}] Shared stream viewer added on port {shared.source.port}, {shared.refs} viewers")
+        return f"tcp://127.0.0.1:{shared.source.port}"
+
+    def release(self, key):
+        """Remove a viewer, thread safe.  The source stops LINGER seconds after its last viewer."""
+        self.loop.call_soon_threadsafe(self._release, key)
+
+    def _release(self, key):
+        shared = self.streams.get(key)
+        if shared is None:
+            return
+        shared.refs = max(0, shared.refs - 1)
+        logger.debug(f"[{key[0]}] Shared stream viewer removed, {shared.refs} viewers")
+        if shared.refs == 0 and shared.linger is None:
+            shared.linger = self.loop.call_later(self.linger, lambda: asyncio.ensure_future(self._async_stop(key)))
+
+    async def _async_stop(self, key):
+        shared = self.streams.get(key)
+        if shared is None or shared.refs > 0:
+            return
+        del self.streams[key]
+        await shared.source.stop()
+        logger.debug(f"[{key[0]}] Shared stream stopped")
+
+    def viewers(self, key):
+        shared = self.streams.get(key)
+        return shared.refs if shared is not None else 0
+
+    def shutdown(self, timeout=5):
+        async def _stop_all():
+            for key in list(self.streams):
+                shared = self.streams.pop(key)
+                await shared.source.stop()
+        try:
+            asyncio.run_coroutine_threadsafe(_stop_all(), self.loop).result(timeout)
+        except Exception:
+            logger.debug("Exception stopping shared streams", exc_info=True)
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,223 @@
+"""
+Camera snapshot downloader shared by all cameras.
+
+thread_cameraSnapShots used to download each requested image itself, one after the
+other, with a 3 second sleep after any failure - so one offline camera held up every
+other camera's tile.  It now just hands requests to SnapshotFetcher, which:
+
+  - downloads on a bounded thread pool, so several cameras fetch at once
+  - keeps one requests.Session (connection pool) per camera server host
+  - single-flight per camera: a request for a camera already downloading gets the
+    in-flight Future rather than starting another download
+  - applies timeouts, the minimum refresh interval and failure backoff per camera,
+    so a dead camera only backs off itself
+
+Downloaded images go into the SnapshotStore (HKSnapshotStore), and to disk only if
+write_to_disk is set.
+
+With derive_variants (needs Pillow) each refresh downloads one frame, at the largest
+width HomeKit has asked this camera for, and the other requested widths are scaled
+from it locally rather than each being another request to Blue Iris / SecuritySpy.
+"""
+
+import logging
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from HKSnapshotStore import width_bucket, scale_jpeg, can_scale
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("Plugin.HomeKit_pyHap")
+
+BACKOFF_START = 3
+BACKOFF_MAX = 300
+
+
+def camera_name(camera):
+    if "BI_name" in camera:
+        return camera["BI_name"]
+    elif "SS_name" in camera:
+        return camera["SS_name"]
+    return ""
+
+
+def build_snapshot_request(camera, image_width):
+    """Returns (url, auth) for this camera's snapshot at image_width, auth None if in the URL."""
+    if "BI_name" in camera:
+        url = camera["BI_imageURL"] + "?w=" + str(image_width)
+        return url, (str(camera["BI_username"]), str(camera["BI_password"]))
+    if 'auth=' in camera["SS_imageURL"]:
+        parsed_url = urllib.parse.urlparse(camera["SS_imageURL"])
+        params_url = urllib.parse.parse_qs(parsed_url.query)
+        # Update Width
+        params_url['width'] = [str(image_width)]
+        ## Remove Height - hopefully auto adjusts aspect
+        params_url.pop('height', None)
+        new_query = urllib.parse.urlencode(params_url, doseq=True)
+        url = urllib.parse.urlunparse((parsed_url.scheme, parsed_url.netloc, parsed_url.path, parsed_url.params, new_query, parsed_url.fragment))
+        return url, None
+    url = camera["SS_imageURL"] + "&width=" + str(image_width)
+    return url, (str(camera["SS_username"]), str(camera["SS_password"]))
+
+
+class _CameraState:
+    __slots__ = ("last_fetch", "failures", "retry_after", "future", "widths", "source")
+
+    def __init__(self):
+        self.last_fetch = 0.0
+        self.failures = 0
+        self.retry_after = 0.0
+        self.future = None
+        self.widths = set()   ## width buckets HomeKit has asked for
+        self.source = None    ## last full frame downloaded, variants are scaled from this
+
+
+class SnapshotFetcher:
+    """Bounded parallel snapshot downloads with per-camera single-flight and backoff."""
+
+    def __init__(self, image_path, store=None, write_to_disk=True, max_workers=4, timeout=10, debug=False, derive_variants=False):
+        self.image_path = image_path
+        self.store = store
+        self.write_to_disk = write_to_disk
+        self.derive_variants = derive_variants and store is not None and can_scale()
+        if derive_variants and not self.derive_variants:
+            logger.info("Scale Snapshot Sizes Locally is enabled but needs Pillow, which is not installed.  Downloading each width instead.")
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.debug = debug
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="CameraSnapshot")
+        self._sessions = {}   ## host:port -> requests.Session
+        self._cameras = {}    ## camera name -> _CameraState
+        self._lock = threading.Lock()
+
+    def _session_for(self, url):
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+        return session
+
+    def request(self, camera, image_width, min_interval=0):
+        """
+        Request a snapshot for camera.  Returns the Future of the download - the existing one
+        if this camera is already downloading - or None if skipped (too soon / backing off).
+        The Future's result is the JPEG bytes, or None if the download failed.
+        """
+        camname = camera_name(camera)
+        now = time.time()
+        with self._lock:
+            state = self._cameras.get(camname)
+            if state is None:
+                state = self._cameras[camname] = _CameraState()
+            bucket = width_bucket(image_width)
+            new_width = bucket not in state.widths
+            state.widths.add(bucket)
+            if state.future is not None and not state.future.done():
+                if self.debug:
+                    logger.debug(f"{camname}: Snapshot already downloading, joining that.")
+                return state.future
+            if self.derive_variants and new_width and state.source is not None and bucket < state.source[1]:
+                ## a smaller width not asked for before this refresh window, scale it from the frame we have
+                state.future = self._executor.submit(self._derive, camname, state, bucket)
+                return state.future
+            ## a width larger than the frame we have can't be scaled from it, so download now
+            larger = self.derive_variants and new_width and state.source is not None
+            if now < state.retry_after:
+                if self.debug:
+                    logger.debug(f"{camname}: Snapshot backing off for another {state.retry_after - now:.0f} seconds after {state.failures} failures.")
+                return None
+            if now - state.last_fetch < min_interval and not larger:
+                if self.debug:
+                    logger.debug(f"{camname}: Skipping update as too soon, last fetched {now - state.last_fetch:.1f} seconds ago")
+                return None
+            state.last_fetch = now
+            if self.derive_variants:
+                ## one frame per refresh, big enough for every width HomeKit wants
+                image_width = max(state.widths)
+            state.future = self._executor.submit(self._download, camname, camera, image_width, state)
+            return state.future
+
+    def _derive(self, camname, state, bucket):
+        ## only for buckets smaller than the source, larger ones are downloaded
+        source = state.source[0]
+        try:
+            data = scale_jpeg(source, bucket)
+            self.store.put(camname, bucket, data)
+            return data
+        except Exception:
+            logger.debug(f"{camname}: Error scaling snapshot to {bucket}", exc_info=True)
+            return None
+
+    def _store_variants(self, camname, data, image_width, state):
+        ## store the downloaded frame and scale every other width asked for from it
+        source_bucket = width_bucket(image_width)
+        state.source = (data, source_bucket)
+        self.store.put(camname, source_bucket, data)
+        for bucket in sorted(state.widths):
+            if bucket < source_bucket:
+                try:
+                    self.store.put(camname, bucket, scale_jpeg(data, bucket))
+                except Exception:
+                    logger.debug(f"{camname}: Error scaling snapshot to {bucket}", exc_info=True)
+
+    def _download(self, camname, camera, image_width, state):
+        url, auth = build_snapshot_request(camera, image_width)
+        path = os.path.join(self.image_path, camname + '.jpg')
+        start = time.time()
+        try:
+            r = self._session_for(url).get(url, auth=auth, stream=True, timeout=self.timeout)
+            try:
+                if r.status_code != 200:
+                    raise IOError(f"Status Code:{r.status_code}")
+                data = bytearray()
+                for chunk in r.iter_content(65536):
+                    data += chunk
+                    if time.time() > start + self.timeout:
+                        raise IOError("Download Image Taking to long.  Aborted.")
+            finally:
+                r.close()
+            data = bytes(data)
+            if self.derive_variants:
+                self._store_variants(camname, data, image_width, state)
+            elif self.store is not None:
+                self.store.put(camname, image_width, data)
+            if self.write_to_disk or self.store is None:
+                ## write beside and swap in, so a reader never sees half an image
+                temp_path = path + ".tmp"
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            with self._lock:
+                state.failures = 0
+                state.retry_after = 0.0
+            if self.debug:
+                logger.debug(f"Downloaded Image for {camname} in {time.time() - start:.2f} seconds, with URL \n{url}")
+            return data
+        except Exception as ex:
+            with self._lock:
+                state.failures += 1
+                backoff = min(BACKOFF_MAX, BACKOFF_START * (2 ** (state.failures - 1)))
+                state.retry_after = time.time() + backoff
+            logger.debug(f"{camname}: Error Downloading Camera Snapshot {ex}.  Camera or server likely offline, backing off this camera {backoff} seconds.")
+            return None
+
+    def in_flight(self):
+        with self._lock:
+            return [name for name, state in self._cameras.items() if state.future is not None and not state.future.done()]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
@@ -0,0 +1,133 @@
+"""
+In memory store of the latest camera snapshots.
+
+get_snapshot used to open() and read() cameraimagePath/<name>.jpg on every HomeKit
+tile refresh, and could catch the file half written by the download thread.  The
+snapshot fetcher now puts each downloaded JPEG here as an immutable bytes object,
+keyed by camera name and width bucket, and async_get_snapshot returns it without
+any file I/O.  Replacing an entry is a single dict assignment, so a reader gets the
+old image or the new one, never part of either.
+
+Entries are evicted least recently used first once the total size passes max_bytes.
+Per camera default (placeholder) images are kept separately and never evicted.
+
+If Pillow is installed, scale_jpeg derives smaller widths from one downloaded frame,
+using the JPEG decoder's draft mode (libjpeg DCT scaling) so most of the shrink
+happens while decoding rather than on the full size image.  Pillow is only imported
+by can_scale/scale_jpeg, so it is not loaded at plugin start when no camera is published.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+## HomeKit asks for many slightly different widths, tiles, notifications, full screen
+WIDTH_BUCKETS = (320, 480, 640, 1024, 1280, 1920)
+
+
+def width_bucket(width):
+    try:
+        width = int(width)
+    except (TypeError, ValueError):
+        return WIDTH_BUCKETS[-1]
+    for bucket in WIDTH_BUCKETS:
+        if width <= bucket:
+            return bucket
+    return WIDTH_BUCKETS[-1]
+
+
+def can_scale():
+    try:
+        from PIL import Image
+    except:
+        return False
+    return True
+
+
+def scale_jpeg(data, width, quality=80):
+    """JPEG bytes scaled down to width, aspect kept.  Returns data unchanged if already that small."""
+    from PIL import Image
+    img = Image.open(io.BytesIO(data))
+    source_width, source_height = img.size
+    if source_width <= width:
+        return data
+    height = max(1, round(source_height * width / source_width))
+    ## draft picks the largest DCT scale (1/2, 1/4, 1/8) still at least this size - a cheap decode
+    img.draft("RGB", (width, height))
+    img = img.convert("RGB")
+    if img.size[0] != width:
+        img = img.resize((width, height), Image.BILINEAR)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+class SnapshotStore:
+    """LRU of (camera name, width bucket) -> JPEG bytes under a memory cap."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._defaults = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._images)
+
+    def __repr__(self):
+        return f"SnapshotStore({len(self._images)} images, {self.total_bytes / 1048576:.1f} of {self.max_bytes / 1048576:.0f} MB)"
+
+    def put(self, camname, width, data):
+        data = bytes(data)
+        key = (camname, width_bucket(width))
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old)
+            self._images[key] = data
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self.total_bytes -= len(evicted)
+                self.evictions += 1
+
+    def get(self, camname, width):
+        """Image for this camera at the closest width we have - same bucket, else next larger, else largest smaller."""
+        bucket = width_bucket(width)
+        with self._lock:
+            key = (camname, bucket)
+            if key not in self._images:
+                buckets = [b for (name, b) in self._images if name == camname]
+                if not buckets:
+                    self.misses += 1
+                    return None
+                larger = [b for b in buckets if b > bucket]
+                key = (camname, min(larger) if larger else max(buckets))
+            self._images.move_to_end(key)
+            self.hits += 1
+            return self._images[key]
+
+    def set_default(self, camname, data):
+        self._defaults[camname] = bytes(data)
+
+    def get_default(self, camname):
+        return self._defaults.get(camname)
+
+    def remove_camera(self, camname):
+        with self._lock:
+            for key in [key for key in self._images if key[0] == camname]:
+                self.total_bytes -= len(self._images.pop(key))
+            self._defaults.pop(camname, None)
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        return {"images": len(self._images), "bytes": self.total_bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
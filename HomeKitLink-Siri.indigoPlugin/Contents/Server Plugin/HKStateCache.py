@@ -0,0 +1,131 @@
+"""
+Read-through cache of Indigo device objects for the HomeKit getters.
+
+Plugin_getter_callback runs on a bridge's event loop (AccessoryDriver.get_characteristics
+-> char.get_value()), and used to do indigo.devices[id] for every characteristic read -
+a blocking IPC round trip to the Indigo Server.  Opening the Home app with 150 tiles
+was 150+ of those back to back on the loop.
+
+deviceUpdated already hands us a fresh copy of every published device when anything
+changes, so the cache is kept hot from there.  A GET then reads the cached device and
+never leaves the loop.  Entries older than ttl are still returned, but a refresh from
+Indigo is queued on the cache's own small executor (once per device) so the next read
+is current.  Only a device never seen before is fetched inline.
+
+A fetch can start before a deviceUpdated and finish after it, so the result of a fetch
+is only stored if the entry has not been replaced while it ran - otherwise the older
+copy would win with a fresh timestamp and be served until the ttl ran out again.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("Plugin.HomeKit_pyHap")
+
+
+class DeviceStateCache:
+    """Device id -> (Indigo device object, time stored)."""
+
+    def __init__(self, fetch, ttl=300, max_workers=2):
+        self.fetch = fetch     ## fetch(deviceid) -> device, the real Indigo lookup
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self._cache = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def __contains__(self, deviceid):
+        return deviceid in self._cache
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __repr__(self):
+        return f"DeviceStateCache({len(self._cache)} devices, hit rate {self.hit_rate():.1%})"
+
+    def get(self, deviceid):
+        entry = self._cache.get(deviceid)
+        if entry is not None:
+            device, stored = entry
+            if time.monotonic() - stored < self.ttl:
+                self.hits += 1
+            else:
+                self.stale += 1
+                self._schedule_refresh(deviceid)
+            return device
+        ## never seen - has to be fetched now
+        self.misses += 1
+        device = self.fetch(deviceid)
+        self._store_fetched(deviceid, None, device)
+        return device
+
+    def update(self, device):
+        """Store latest copy of device, called from deviceUpdated."""
+        with self._lock:
+            self._cache[device.id] = (device, time.monotonic())
+
+    def _store_fetched(self, deviceid, before, device):
+        """Store a fetched device, unless the entry changed since the fetch began."""
+        with self._lock:
+            if self._cache.get(deviceid) is not before:
+                return False
+            self._cache[deviceid] = (device, time.monotonic())
+            return True
+
+    def remove(self, deviceid):
+        with self._lock:
+            self._cache.pop(deviceid, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def prefetch(self, deviceids):
+        """Warm the cache for devices not yet cached, in the background."""
+        for deviceid in deviceids:
+            if deviceid not in self._cache:
+                self._schedule_refresh(deviceid)
+
+    def _schedule_refresh(self, deviceid):
+        with self._lock:
+            if deviceid in self._refreshing:
+                return
+            self._refreshing.add(deviceid)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="StateCache")
+        self._executor.submit(self._refresh, deviceid)
+
+    def _refresh(self, deviceid):
+        try:
+            before = self._cache.get(deviceid)
+            self._store_fetched(deviceid, before, self.fetch(deviceid))
+            self.refreshes += 1
+        except Exception:
+            self.refresh_errors += 1
+            logger.debug(f"State cache refresh failed for {deviceid}", exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(deviceid)
+
+    def hit_rate(self):
+        total = self.hits + self.stale + self.misses
+        if total == 0:
+            return 0.0
+        return (self.hits + self.stale) / total
+
+    def stats(self):
+        return {"devices": len(self._cache), "hits": self.hits, "stale": self.stale, "misses": self.misses,
+                "hit_rate": self.hit_rate(), "refreshes": self.refreshes, "refresh_errors": self.refresh_errors}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -93,7 +93,7 @@ class Thermostat(HomeAccessory):
             self.indigodeviceid = indigodeviceid
             self.chars = ['CurrentHeatingCoolingState',"TargetHeatingCoolingState","CurrentTemperature", "TargetTemperature" ]
 
-            indigodevice = indigo.devices[indigodeviceid]
+            indigodevice = plugin.state_cache.get(int(indigodeviceid))
 
             ## get temperature unit we are using
             tempSelector = indigodevice.pluginProps.get("HomeKit_tempSelector", False)  ## True if F
@@ -435,7 +435,7 @@ class ThermostatZone(HomeAccessory):
             self.indigodeviceid = indigodeviceid
             self.chars = ['CurrentHeatingCoolingState',"TargetHeatingCoolingState","CurrentTemperature", "TargetTemperature" ]
 
-            indigodevice = indigo.devices[indigodeviceid]
+            indigodevice = plugin.state_cache.get(int(indigodeviceid))
 
             ## get temperature unit we are using
             tempSelector = indigodevice.pluginProps.get("HomeKit_tempSelector", False)  ## True if F
@@ -0,0 +1,311 @@
+"""
+Warm ffmpeg sources for cameras, so live view starts from a buffered keyframe.
+
+Normally start_stream spawns ffmpeg, which has to connect to the RTSP source and wait
+for the next keyframe before HomeKit sees anything - 3 to 6 seconds.
+
+A WarmSource keeps one ffmpeg connected to the camera's RTSP stream, copying it
+(no transcode) to MPEG-TS on stdout.  The TS packets are kept in a small buffer
+starting at the most recent video keyframe, and served on a local TCP port.  When a
+stream starts, its ffmpeg reads tcp://127.0.0.1:port instead of RTSP, gets PAT/PMT
+and the buffered GOP straight away, then the live packets - so the first frame is
+available immediately.
+
+WarmPool holds up to size sources on its own event loop thread.  Pinned cameras
+(doorbells, cameras listed as priority) stay warm.  Others are warmed on demand -
+HomeKit asking for a snapshot means the Home app is open - and stopped after
+idle_timeout seconds without being asked for again or streamed.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger("Plugin.HomeKit_pyHap")
+
+TS_PACKET = 188
+TS_SYNC = 0x47
+VIDEO_STREAM_TYPES = (0x01, 0x02, 0x1b, 0x24)   ## mpeg1/2, h264, hevc
+MAX_GOP_BYTES = 8 * 1024 * 1024
+MAX_CLIENT_BACKLOG = 16 * 1024 * 1024    ## an attached ffmpeg this far behind is dropped
+RESTART_DELAY = 5
+COPY_OUTPUT = ["-map", "0:v:0", "-map", "0:a?", "-c", "copy"]
+
+
+def _pid(packet):
+    return ((packet[1] & 0x1f) << 8) | packet[2]
+
+
+def _payload(packet):
+    """Payload of a TS packet, skipping any adaptation field."""
+    afc = (packet[3] >> 4) & 0x3
+    if afc == 1:
+        return packet[4:]
+    if afc == 3:
+        return packet[5 + packet[4]:]
+    return b""
+
+
+def _random_access(packet):
+    ## adaptation field present, non-empty, random_access_indicator set
+    return (packet[3] & 0x20) and packet[4] > 0 and (packet[5] & 0x40)
+
+
+def _section(packet):
+    if not packet[1] & 0x40:   ## payload_unit_start
+        return None
+    payload = _payload(packet)
+    if not payload:
+        return None
+    return payload[1 + payload[0]:]   ## skip pointer field
+
+
+class WarmSource:
+    """One camera's warm RTSP connection, buffered from the last keyframe."""
+
+    def __init__(self, name, ffmpeg_bin, input_args, pinned=False, output_args=None):
+        self.name = name
+        self.ffmpeg_bin = ffmpeg_bin
+        self.input_args = input_args    ## e.g. ["-rtsp_transport", "tcp", "-i", url]
+        self.output_args = output_args or COPY_OUTPUT
+        self.pinned = pinned
+        self.last_used = time.monotonic()
+        self.port = None
+        self.process = None
+        self.clients = set()
+        self.started = 0
+        self._server = None
+        self._reader = None
+        self._stopping = False
+        self._pat = None
+        self._pmt = None
+        self._pmt_pid = None
+        self._video_pid = None
+        self._gop = []        ## TS packets (as bytes chunks) since last video keyframe
+        self._gop_bytes = 0
+        self._have_keyframe = False
+
+    def __repr__(self):
+        return f"WarmSource({self.name}, port={self.port}, clients={len(self.clients)}, ready={self.ready})"
+
+    @property
+    def ready(self):
+        return self.port is not None and self._have_keyframe and self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._client_connected, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._reader = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        if self._reader is not None:
+            self._reader.cancel()
+        await self._kill()
+        self._drop_clients()
+        if self._server is not None:
+            self._server.close()
+        self.port = None
+
+    async def _kill(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except Exception:
+                pass
+
+    async def _run(self):
+        ## keep ffmpeg connected, restarting it if the camera drops
+        while not self._stopping:
+            cmd = [self.ffmpeg_bin, "-hide_banner", "-nostats", "-loglevel", "error"] + self.input_args + \
+                  self.output_args + ["-f", "mpegts", "pipe:1"]
+            try:
+                self.process = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.DEVNULL,
+                                                                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+                self.started += 1
+                logger.debug(f"[{self.name}] Warm source ffmpeg started - PID {self.process.pid}")
+                await self._read(self.process.stdout)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.debug(f"[{self.name}] Warm source exception", exc_info=True)
+            finally:
+                await self._kill()
+                self._reset_buffer()
+                ## attached streams end too, as they would if reading the camera directly
+                self._drop_clients()
+            if not self._stopping:
+                logger.debug(f"[{self.name}] Warm source ffmpeg ended, restarting in {RESTART_DELAY} seconds")
+                await asyncio.sleep(RESTART_DELAY)
+
+    def _drop_clients(self):
+        for writer in list(self.clients):
+            writer.close()
+        self.clients.clear()
+
+    def _reset_buffer(self):
+        self._gop = []
+        self._gop_bytes = 0
+        self._have_keyframe = False
+
+    async def _read(self, stdout):
+        pending = b""
+        while True:
+            chunk = await stdout.read(TS_PACKET * 256)
+            if not chunk:
+                return
+            data = pending + chunk
+            usable = len(data) - (len(data) % TS_PACKET)
+            pending = data[usable:]
+            for offset in range(0, usable, TS_PACKET):
+                self._packet(data[offset:offset + TS_PACKET])
+            live = data[:usable]
+            for writer in list(self.clients):
+                try:
+                    if writer.transport.get_write_buffer_size() > MAX_CLIENT_BACKLOG:
+                        logger.debug(f"[{self.name}] Attached stream not keeping up, dropping it")
+                        self.clients.discard(writer)
+                        writer.close()
+                        continue
+                    writer.write(live)
+                except Exception:
+                    self.clients.discard(writer)
+
+    def _packet(self, packet):
+        if packet[0] != TS_SYNC:
+            return
+        pid = _pid(packet)
+        if pid == 0:
+            self._pat = packet
+            section = _section(packet)
+            if section and section[0] == 0x00 and len(section) >= 12:
+                self._pmt_pid = ((section[10] & 0x1f) << 8) | section[11]
+            return
+        if pid == self._pmt_pid:
+            self._pmt = packet
+            section = _section(packet)
+            if section and section[0] == 0x02 and self._video_pid is None:
+                self._video_pid = self._parse_video_pid(section)
+            return
+        if pid == self._video_pid and _random_access(packet):
+            ## new GOP starts here
+            self._gop = []
+            self._gop_bytes = 0
+            self._have_keyframe = True
+        if self._have_keyframe:
+            self._gop.append(packet)
+            self._gop_bytes += TS_PACKET
+            if self._gop_bytes > MAX_GOP_BYTES:
+                ## GOP too long to buffer, wait for the next keyframe
+                self._reset_buffer()
+
+    @staticmethod
+    def _parse_video_pid(section):
+        section_length = ((section[1] & 0x0f) << 8) | section[2]
+        end = min(len(section), 3 + section_length - 4)   ## less CRC
+        program_info_length = ((section[10] & 0x0f) << 8) | section[11]
+        offset = 12 + program_info_length
+        while offset + 5 <= end:
+            stream_type = section[offset]
+            es_pid = ((section[offset + 1] & 0x1f) << 8) | section[offset + 2]
+            es_info_length = ((section[offset + 3] & 0x0f) << 8) | section[offset + 4]
+            if stream_type in VIDEO_STREAM_TYPES:
+                return es_pid
+            offset += 5 + es_info_length
+        return None
+
+    async def _client_connected(self, reader, writer):
+        ## new stream: tables, then the buffered GOP from its keyframe, then live
+        self.last_used = time.monotonic()
+        if self._pat is not None and self._pmt is not None:
+            writer.write(self._pat + self._pmt + b"".join(self._gop))
+        self.clients.add(writer)
+        logger.debug(f"[{self.name}] Stream attached to warm source, {self._gop_bytes} bytes buffered, {len(self.clients)} attached")
+        try:
+            await reader.read()    ## returns when ffmpeg disconnects
+        except Exception:
+            pass
+        finally:
+            self.clients.discard(writer)
+            self.last_used = time.monotonic()
+            writer.close()
+
+
+class WarmPool:
+    """Up to size WarmSources on a dedicated event loop thread."""
+
+    def __init__(self, ffmpeg_bin, size=2, idle_timeout=600):
+        self.ffmpeg_bin = ffmpeg_bin
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.sources = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(name="Camera Warm Pool", target=self._run, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._evict_idle(), self.loop)
+
+    def __repr__(self):
+        return f"WarmPool({len(self.sources)}/{self.size} warm: {', '.join(self.sources)})"
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def warm(self, name, input_args, pinned=False):
+        """Make sure this camera has a warm source, if there is room.  Thread safe, returns immediately."""
+        source = self.sources.get(name)
+        if source is not None:
+            source.last_used = time.monotonic()
+            source.pinned = source.pinned or pinned
+            return
+        asyncio.run_coroutine_threadsafe(self._async_warm(name, input_args, pinned), self.loop)
+
+    async def _async_warm(self, name, input_args, pinned):
+        if name in self.sources:
+            return
+        if len(self.sources) >= self.size:
+            ## make room by stopping the least recently used unpinned source nobody is watching
+            idle = [s for s in self.sources.values() if not s.pinned and not s.clients]
+            if not idle:
+                logger.debug(f"[{name}] Warm pool full, not warming")
+                return
+            victim = min(idle, key=lambda s: s.last_used)
+            await self._async_remove(victim.name)
+        source = WarmSource(name, self.ffmpeg_bin, input_args, pinned=pinned)
+        self.sources[name] = source
+        await source.start()
+        logger.debug(f"[{name}] Camera warm source started on port {source.port}")
+
+    def input_for(self, name):
+        """Local input url for this camera if its warm source has a keyframe buffered, else None."""
+        source = self.sources.get(name)
+        if source is None or not source.ready:
+            return None
+        source.last_used = time.monotonic()
+        return f"tcp://127.0.0.1:{source.port}"
+
+    async def _async_remove(self, name):
+        source = self.sources.pop(name, None)
+        if source is not None:
+            await source.stop()
+            logger.debug(f"[{name}] Camera warm source stopped")
+
+    async def _evict_idle(self):
+        while True:
+            await asyncio.sleep(30)
+            now = time.monotonic()
+            for source in list(self.sources.values()):
+                if not source.pinned and not source.clients and now - source.last_used > self.idle_timeout:
+                    await self._async_remove(source.name)
+
+    def shutdown(self, timeout=5):
+        async def _stop_all():
+            for name in list(self.sources):
+                await self._async_remove(name)
+        try:
+            asyncio.run_coroutine_threadsafe(_stop_all(), self.loop).result(timeout)
+        except Exception:
+            logger.debug("Exception stopping warm pool", exc_info=True)
+        self.loop.call_soon_threadsafe(self.loop.stop)
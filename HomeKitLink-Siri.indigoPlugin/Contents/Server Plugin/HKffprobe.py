@@ -0,0 +1,250 @@
+"""
+Camera stream probing with ffprobe - concurrent, and cached on disk.
+
+_run_ffprobe used to probe each camera in turn with two blocking subprocess.run calls
+(stream info and a 5 second GOP sample), 15 seconds timeout each, on the snapshot
+thread - 20 cameras could hold up snapshots for minutes at startup.
+
+FfprobeService runs the probes as asyncio subprocesses, a few cameras at a time, and
+keeps the results (ffprobe_ok, ffprobe_video, ffprobe_audio) in a JSON file keyed by
+stream URL together with a hash of the camera config that affects them.  A camera is
+only probed again if its source or config changed, or the result is older than ttl.
+start_stream reads the cached result through get_video / get_audio.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("Plugin.HomeKit_pyHap")
+
+PROBE_TIMEOUT = 15
+
+## camera config keys that change what the probe result means
+HASHED_KEYS = ("stream_source", "video_codec", "audio_codec", "support_audio")
+
+
+def stream_info_cmd(ffprobe_bin, stream_source):
+    return [
+        ffprobe_bin,
+        "-rtsp_transport", "tcp",
+        "-v", "error",
+        "-show_entries", "stream=index,codec_name,codec_type,width,height,r_frame_rate,pix_fmt,profile,level,sample_rate,channels,channel_layout",
+        "-of", "json",
+        "-i", stream_source,
+    ]
+
+
+def gop_cmd(ffprobe_bin, stream_source):
+    return [
+        ffprobe_bin,
+        "-rtsp_transport", "tcp",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=flags,pts_time,dts_time",
+        "-of", "csv=p=0",
+        "-read_intervals", "%+5",
+        "-i", stream_source,
+    ]
+
+
+def parse_fps(video_stream):
+    v_fps_raw = video_stream.get("r_frame_rate", "0/1")
+    try:
+        num, den = v_fps_raw.split("/")
+        return round(int(num) / int(den), 1) if int(den) else 0.0
+    except Exception:
+        return 0.0
+
+
+def parse_gop(stdout_text, v_fps):
+    """Returns (gop_frames, gop_seconds) from the GOP probe csv, either None if not found."""
+    gop_frames = None
+    gop_seconds = None
+    lines = stdout_text.splitlines()
+    keyframe_indices = []
+    keyframe_times = []
+    for i, line in enumerate(lines):
+        parts = [p.strip() for p in line.split(",")]
+        # CSV order from ffprobe: pts_time, dts_time, flags
+        # Find which part contains the flags (has K or _)
+        flags = ""
+        time_val = None
+        for p in parts:
+            if "K" in p or p.startswith("_"):
+                flags = p
+            else:
+                if time_val is None and p != "N/A":
+                    try:
+                        time_val = float(p)
+                    except (ValueError, TypeError):
+                        pass
+
+        if "K" in flags:
+            keyframe_indices.append(i)
+            if time_val is not None:
+                keyframe_times.append(time_val)
+
+    if len(keyframe_indices) >= 2:
+        gop_frames = keyframe_indices[1] - keyframe_indices[0]
+        if len(keyframe_times) >= 2:
+            gop_seconds = round(keyframe_times[1] - keyframe_times[0], 1)
+        elif v_fps and v_fps > 0:
+            gop_seconds = round(gop_frames / v_fps, 1)
+    elif len(keyframe_indices) == 1 and len(lines) > 1:
+        gop_frames = len(lines)
+        if v_fps and v_fps > 0:
+            gop_seconds = round(len(lines) / v_fps, 1)
+    return gop_frames, gop_seconds
+
+
+class ProbeResult:
+    """Raw output of the two probes for one camera."""
+    __slots__ = ("returncode", "stdout", "stderr", "gop_text", "error")
+
+    def __init__(self):
+        self.returncode = None
+        self.stdout = b""
+        self.stderr = b""
+        self.gop_text = None
+        self.error = None    ## "timeout" or exception text if stream probe didn't run
+
+
+class FfprobeService:
+
+    def __init__(self, cache_path, ttl=24 * 3600, max_workers=4):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                self._cache = json.load(f)
+        except FileNotFoundError:
+            self._cache = {}
+        except Exception:
+            logger.debug("ffprobe cache unreadable, starting empty", exc_info=True)
+            self._cache = {}
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self._cache, indent=1)
+        temp_path = self.cache_path + ".tmp"
+        try:
+            with open(temp_path, "w") as f:
+                f.write(data)
+            os.replace(temp_path, self.cache_path)
+        except Exception:
+            logger.debug("Could not save ffprobe cache", exc_info=True)
+
+    @staticmethod
+    def config_hash(cam):
+        config = {key: cam.get(key) for key in HASHED_KEYS}
+        return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+    def cached(self, cam):
+        """Cached entry for this camera if still valid, else None."""
+        stream_source = cam.get("stream_source", "")
+        with self._lock:
+            entry = self._cache.get(stream_source)
+        if entry is None:
+            return None
+        if entry.get("hash") != self.config_hash(cam):
+            return None
+        if time.time() - entry.get("time", 0) > self.ttl:
+            return None
+        return entry
+
+    def store(self, cam):
+        """Save this camera's ffprobe_* results, as set on cam by the analysis."""
+        stream_source = cam.get("stream_source", "")
+        if not stream_source or not cam.get("ffprobe_ok"):
+            return
+        with self._lock:
+            self._cache[stream_source] = {
+                "hash": self.config_hash(cam),
+                "time": time.time(),
+                "ffprobe_ok": cam.get("ffprobe_ok"),
+                "ffprobe_video": cam.get("ffprobe_video"),
+                "ffprobe_audio": cam.get("ffprobe_audio"),
+            }
+
+    def apply(self, cam):
+        """Set cam's ffprobe_* from cache.  Returns True if it was cached."""
+        entry = self.cached(cam)
+        if entry is None:
+            return False
+        cam["ffprobe_ok"] = entry.get("ffprobe_ok", True)
+        cam["ffprobe_video"] = entry.get("ffprobe_video")
+        cam["ffprobe_audio"] = entry.get("ffprobe_audio")
+        return True
+
+    def get_video(self, cam):
+        entry = self.cached(cam)
+        if entry is not None:
+            return entry.get("ffprobe_video")
+        return cam.get("ffprobe_video")
+
+    def get_audio(self, cam):
+        entry = self.cached(cam)
+        if entry is not None:
+            return entry.get("ffprobe_audio")
+        return cam.get("ffprobe_audio")
+
+    ## probing
+
+    def probe_all(self, ffprobe_bin, cams):
+        """Probe cams concurrently.  Blocks until done, returns {id(cam): ProbeResult}."""
+        if not cams:
+            return {}
+        return asyncio.run(self._probe_all(ffprobe_bin, cams))
+
+    async def _probe_all(self, ffprobe_bin, cams):
+        semaphore = asyncio.Semaphore(self.max_workers)
+        results = await asyncio.gather(*(self._probe_one(semaphore, ffprobe_bin, cam) for cam in cams))
+        return {id(cam): result for cam, result in zip(cams, results)}
+
+    async def _probe_one(self, semaphore, ffprobe_bin, cam):
+        result = ProbeResult()
+        stream_source = cam.get("stream_source", "")
+        cam_name = cam.get("cameraName", cam.get("BI_name", cam.get("SS_name", "Unknown")))
+        async with semaphore:
+            try:
+                result.returncode, result.stdout, result.stderr = await self._run(stream_info_cmd(ffprobe_bin, stream_source))
+            except asyncio.TimeoutError:
+                result.error = "timeout"
+                return result
+            except Exception as ex:
+                result.error = str(ex)
+                return result
+            if result.returncode != 0:
+                return result
+            try:
+                gop_returncode, gop_stdout, _ = await self._run(gop_cmd(ffprobe_bin, stream_source))
+                if gop_returncode == 0:
+                    result.gop_text = gop_stdout.decode(errors="replace").strip()
+            except asyncio.TimeoutError:
+                logger.debug("[%s] GOP probe timed out — skipping GOP detection.", cam_name)
+            except Exception:
+                logger.debug("[%s] GOP probe failed — skipping GOP detection.", cam_name, exc_info=True)
+        return result
+
+    @staticmethod
+    async def _run(cmd):
+        proc = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.DEVNULL,
+                                                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=PROBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise
+        return proc.returncode, stdout, stderr
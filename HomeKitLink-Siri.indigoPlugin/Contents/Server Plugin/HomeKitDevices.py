@@ -3,6 +3,7 @@
 
 import logging
 import math
+import threading
 from typing import Any, cast
 from pyhap.accessory import Accessory, Bridge
 from pyhap.accessory_driver import AccessoryDriver
@@ -34,9 +35,6 @@ import time
 logger = logging.getLogger("Plugin.HomeKit_Devices")
 
 from HKConstants import *
-import base36
-from pyqrcode import QRCode
-import tlv8
 import HKutils
 import base64
 #import HKDevicesCamera
@@ -60,7 +58,12 @@ class HomeDriver(AccessoryDriver):  # type: ignore[misc]
         super().__init__(**kwargs)
         self.indigodeviceid = indigodeviceid
         self.iid_storage = iid_storage
+        ## set once the mDNS service is registered, see HKBridgeStartup
+        self.advertised = threading.Event()
 
+    async def async_start(self):
+        await super().async_start()
+        self.advertised.set()
 
 
 class HomeBridge(Bridge):  # type: ignore[misc]
@@ -73,6 +76,7 @@ class HomeBridge(Bridge):  # type: ignore[misc]
         self.plugin = plugin
 
     def setup_message(self):
+        from pyqrcode import QRCode  ## only needed here, when a bridge starts
         pincode = self.driver.state.pincode.decode()
         xhm_uri = self.xhm_uri()
         logger.debug("New Scan the QR code with your HomeKit app on your iOS device:")
@@ -139,7 +143,7 @@ class TemperatureSensor(HomeAccessory):
         self._char_low_battery = None
         batteryLevel = None
         self._unit =TEMP_CELSIUS
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         ## get temperature unit we are using
         tempSelector = indigodevice.pluginProps.get("HomeKit_tempSelector", False)  ## True if F
         if tempSelector:
@@ -219,7 +223,7 @@ class LightSensor(HomeAccessory):
         self._char_low_battery = None
         batteryLevel = None
         # add battery service to each Sensor - prelim below
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         batterySupported = indigodevice.ownerProps.get("SupportsBatteryLevel", False)
         if batterySupported:
             if "batteryLevel" in indigodevice.states:
@@ -274,7 +278,7 @@ class CarbonDioxideSensor(HomeAccessory):
 
         batteryLevel = None
         # add battery service to each Sensor - prelim below
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         batterySupported = indigodevice.ownerProps.get("SupportsBatteryLevel", False)
         if batterySupported:
             if "batteryLevel" in indigodevice.states:
@@ -331,7 +335,7 @@ class CarbonMonoxideSensor(HomeAccessory):
 
         batteryLevel = None
         # add battery service to each Sensor - prelim below
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         batterySupported = indigodevice.ownerProps.get("SupportsBatteryLevel", False)
         if batterySupported:
             if "batteryLevel" in indigodevice.states:
@@ -390,7 +394,7 @@ class LeakSensor(HomeAccessory):
         self._char_low_battery = None
         batteryLevel = None
         # add battery service to each Sensor - prelim below
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         batterySupported = indigodevice.ownerProps.get("SupportsBatteryLevel", False)
         if batterySupported:
             if "batteryLevel" in indigodevice.states:
@@ -443,7 +447,7 @@ class GenericSensor(HomeAccessory):
         self._char_low_battery = None
         batteryLevel = None
         # add battery service to each Sensor - prelim below
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         batterySupported = indigodevice.ownerProps.get("SupportsBatteryLevel", False)
         if batterySupported:
             if "batteryLevel" in indigodevice.states:
@@ -496,7 +500,7 @@ class HumiditySensor(HomeAccessory):
         self._char_low_battery = None
         batteryLevel = None
         # add battery service to each Sensor - prelim below
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         batterySupported = indigodevice.ownerProps.get("SupportsBatteryLevel", False)
         if batterySupported:
             if "batteryLevel" in indigodevice.states:
@@ -550,7 +554,7 @@ class SmokeSensor(HomeAccessory):
 
         batteryLevel = None
         # add battery service to each Sensor - prelim below
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         batterySupported = indigodevice.ownerProps.get("SupportsBatteryLevel", False)
         if batterySupported:
             if "batteryLevel" in indigodevice.states:
@@ -613,7 +617,7 @@ class OccupancySensor(HomeAccessory):
 
         batteryLevel = None
         # add battery service to each Sensor - prelim below
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         batterySupported = indigodevice.ownerProps.get("SupportsBatteryLevel", False)
         if batterySupported:
             if "batteryLevel" in indigodevice.states:
@@ -676,7 +680,7 @@ class ContactSensor(HomeAccessory):
 
         batteryLevel = None
         # add battery service to each Sensor - prelim below
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         batterySupported = indigodevice.ownerProps.get("SupportsBatteryLevel", False)
         if batterySupported:
             if "batteryLevel" in indigodevice.states:
@@ -1424,7 +1428,7 @@ class HueLightBulb(HomeAccessory):
         self.plugin = plugin
         self.indigodeviceid = indigodeviceid
         self.HomeKitBrightnessLevel = 0
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
 
         supportsRGB = indigodevice.supportsRGB
         supportsWhiteTemperature = indigodevice.supportsWhiteTemperature
@@ -1775,7 +1779,7 @@ class DoorDoor(HomeAccessory):
 
         self.activate_only = self.is_activate(indigodeviceid)
         self.indigodeviceid = indigodeviceid
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
 
         self._inverse = False
         ## get temperature unit we are using
@@ -1990,7 +1994,7 @@ class WindowCovering(HomeAccessory):
 
         self.activate_only = self.is_activate(indigodeviceid)
         self.indigodeviceid = indigodeviceid
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
 
         self._inverse = False
         ## get temperature unit we are using
@@ -2130,7 +2134,7 @@ class Window(HomeAccessory):
 
         self.activate_only = self.is_activate(indigodeviceid)
         self.indigodeviceid = indigodeviceid
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         self._inverse = False
         ## get temperature unit we are using
         inverseSelector = indigodevice.pluginProps.get("HomeKit_inverseSelector", False)  ## True if F
@@ -2276,7 +2280,7 @@ class MotionSensor(HomeAccessory):
 
         batteryLevel = None
         # add battery service to each Sensor - prelim below
-        indigodevice = indigo.devices[indigodeviceid]
+        indigodevice = plugin.state_cache.get(int(indigodeviceid))
         batterySupported = indigodevice.ownerProps.get("SupportsBatteryLevel", False)
         if batterySupported:
             if "batteryLevel" in indigodevice.states:
@@ -15,6 +15,6 @@ Very slight modification to allow pythonpath to be passed.
 
 __version__ = "1.2.1-indigo"
 
-from .proxy import AudioProxy
+from .proxy import AudioProxy, shutdown_daemon
 
-__all__ = ["AudioProxy"]
+__all__ = ["AudioProxy", "shutdown_daemon"]
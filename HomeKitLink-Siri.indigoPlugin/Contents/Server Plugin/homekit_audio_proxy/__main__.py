@@ -4,12 +4,17 @@ from __future__ import annotations
 
 import sys
 
-from ._worker import run_proxy
+from ._worker import run_daemon, run_proxy
+
+if len(sys.argv) == 2 and sys.argv[1] == "--daemon":
+    # Sessions, keys included, arrive as commands on stdin
+    sys.exit(run_daemon(control_fd=sys.stdin.fileno()))
 
 if len(sys.argv) != 4:
     sys.stderr.write(
         f"Usage: {sys.executable} -m homekit_audio_proxy"
         " <dest_addr> <dest_port> <target_clock_rate>\n"
+        f"       {sys.executable} -m homekit_audio_proxy --daemon\n"
     )
     sys.exit(2)
 
@@ -21,5 +26,7 @@ sys.exit(
         dest_port=int(sys.argv[2]),
         srtp_key_b64=_srtp_key,
         target_clock_rate=int(sys.argv[3]),
+        # The parent keeps stdin open, EOF means it has gone
+        parent_fd=sys.stdin.fileno(),
     )
 )
@@ -0,0 +1,184 @@
+"""
+SRTP encryptor check and benchmark.
+
+Run with ``python -m homekit_audio_proxy._benchmark [packets]``. Verifies
+the key derivation and AES-CM keystream against the RFC 3711 Appendix B
+test vectors, checks the encryptor output matches the previous
+per-packet Cipher/HMAC implementation (including a sequence rollover and
+headers longer than the packet),
+then reports packets/second for each.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import sys
+import time
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from ._srtp import SRTPContext, _derive_srtp_key
+
+_UINT32_BE = struct.Struct("!I")
+_UINT16_BE = struct.Struct("!H")
+_UINT16_UINT32_BE = struct.Struct("!HI")
+
+# RFC 3711 Appendix B.3 - key derivation
+_B3_MASTER_KEY = bytes.fromhex("E1F97A0D3E018BE0D64FA32C06DE4139")
+_B3_MASTER_SALT = bytes.fromhex("0EC675AD498AFEEBB6960B3AABE6")
+_B3_CIPHER_KEY = bytes.fromhex("C61E7A93744F39EE10734AFE3FF7A087")
+_B3_CIPHER_SALT = bytes.fromhex("30CBBC08863D8C85D49DB34A9AE1")
+_B3_AUTH_KEY = bytes.fromhex("CEBE321F6FF7716B6FD4AB49AF256A156D38BAA4")
+
+# RFC 3711 Appendix B.2 - AES-CM keystream, SSRC 0, ROC 0, SEQ 0
+_B2_SESSION_KEY = bytes.fromhex("2B7E151628AED2A6ABF7158809CF4F3C")
+_B2_SESSION_SALT = bytes.fromhex("F0F1F2F3F4F5F6F7F8F9FAFBFCFD")
+_B2_KEYSTREAM = bytes.fromhex(
+    "E03EAD0935C95E80E166B16DD92B4EB4"
+    "D23513162B02D0F72A43A2FE4A5F97AB"
+    "41E95B3BB0A2E8DD477901E4FCA894C0"
+)
+
+
+class _PerPacketSRTPContext:
+    """The previous encryptor: new Cipher, encryptor and HMAC per packet."""
+
+    def __init__(self, master_key_b64: str) -> None:
+        key_material = base64.b64decode(master_key_b64)
+        master_key = key_material[:16]
+        master_salt = key_material[16:30]
+        self._session_key = _derive_srtp_key(master_key, master_salt, 0, 16)
+        self._session_auth_key = _derive_srtp_key(master_key, master_salt, 1, 20)
+        self._session_salt = _derive_srtp_key(master_key, master_salt, 2, 14)
+        self._roc = 0
+        self._last_seq = 0
+
+    def encrypt(self, rtp_packet: bytes) -> bytes:
+        header_len = 12 + (rtp_packet[0] & 0x0F) * 4
+        if (rtp_packet[0] >> 4) & 1:
+            ext_length = _UINT16_BE.unpack_from(rtp_packet, header_len + 2)[0]
+            header_len += 4 + ext_length * 4
+        header = rtp_packet[:header_len]
+        payload = rtp_packet[header_len:]
+        ssrc = _UINT32_BE.unpack_from(rtp_packet, 8)[0]
+        seq = _UINT16_BE.unpack_from(rtp_packet, 2)[0]
+        if seq < self._last_seq and (self._last_seq - seq) > 0x8000:
+            self._roc += 1
+        self._last_seq = seq
+        packet_index = (self._roc << 16) | seq
+        iv = bytearray(16)
+        _UINT32_BE.pack_into(iv, 4, ssrc)
+        _UINT16_UINT32_BE.pack_into(
+            iv, 8, packet_index >> 32, packet_index & 0xFFFFFFFF
+        )
+        for i in range(14):
+            iv[i] ^= self._session_salt[i]
+        cipher = Cipher(algorithms.AES(self._session_key), modes.CTR(bytes(iv)))
+        encryptor = cipher.encryptor()
+        encrypted_payload = encryptor.update(payload) + encryptor.finalize()
+        srtp_packet = header + encrypted_payload
+        auth_data = srtp_packet + _UINT32_BE.pack(self._roc)
+        auth_tag = hmac.new(self._session_auth_key, auth_data, hashlib.sha1).digest()[
+            :10
+        ]
+        return srtp_packet + auth_tag
+
+
+def _rtp_packet(seq: int, payload: bytes, ssrc: int = 0x1234ABCD) -> bytes:
+    header = bytearray(12)
+    header[0] = 0x80
+    header[1] = 110
+    _UINT16_BE.pack_into(header, 2, seq & 0xFFFF)
+    _UINT32_BE.pack_into(header, 4, seq * 320)
+    _UINT32_BE.pack_into(header, 8, ssrc)
+    return bytes(header) + payload
+
+
+def _truncated_packets(seq: int) -> list[bytes]:
+    """RTP headers claiming more CSRCs or extension words than they carry."""
+    csrc = bytearray(_rtp_packet(seq, bytes(8)))
+    csrc[0] = 0x8F  # 15 CSRCs, 72 byte header
+    extension = bytearray(_rtp_packet(seq + 1, bytes(8)))
+    extension[0] = 0x90
+    _UINT16_BE.pack_into(extension, 14, 0xFFFF)  # extension length in words
+    return [bytes(csrc), bytes(extension)]
+
+
+def check_vectors() -> None:
+    """Raise AssertionError if the RFC 3711 test vectors don't match."""
+    assert _derive_srtp_key(_B3_MASTER_KEY, _B3_MASTER_SALT, 0, 16) == _B3_CIPHER_KEY
+    assert _derive_srtp_key(_B3_MASTER_KEY, _B3_MASTER_SALT, 2, 14) == _B3_CIPHER_SALT
+    assert _derive_srtp_key(_B3_MASTER_KEY, _B3_MASTER_SALT, 1, 20) == _B3_AUTH_KEY
+
+    # Encrypting zeros with SSRC 0, SEQ 0 leaves the keystream as the payload
+    context = SRTPContext.from_session_keys(
+        _B2_SESSION_KEY, _B2_SESSION_SALT, _B3_AUTH_KEY
+    )
+    packet = _rtp_packet(0, bytes(len(_B2_KEYSTREAM)), ssrc=0)
+    srtp_packet = context.encrypt(packet)
+    assert srtp_packet[12:-10] == _B2_KEYSTREAM
+
+    # Same keystream through the batch path
+    context = SRTPContext.from_session_keys(
+        _B2_SESSION_KEY, _B2_SESSION_SALT, _B3_AUTH_KEY
+    )
+    assert context.encrypt_batch([packet])[0] == srtp_packet
+
+
+def check_against_per_packet(key_b64: str) -> None:
+    """Raise AssertionError if output differs from the previous implementation."""
+    reference = _PerPacketSRTPContext(key_b64)
+    single = SRTPContext(key_b64)
+    batch = SRTPContext(key_b64)
+    # Odd payload sizes, and a sequence number rollover part way, then
+    # headers longer than their packets
+    packets = [
+        _rtp_packet(seq, os.urandom(size))
+        for seq, size in zip(range(65500, 65600), range(1, 1000, 10))
+    ]
+    packets += _truncated_packets(100)
+    packets.append(bytes.fromhex("8f600001") + bytes(16))
+    expected = [reference.encrypt(packet) for packet in packets]
+    assert [single.encrypt(packet) for packet in packets] == expected
+    assert batch.encrypt_batch(packets) == expected
+
+
+def _rate(encrypt, packets: list[bytes]) -> float:
+    start = time.perf_counter()
+    encrypt(packets)
+    return len(packets) / (time.perf_counter() - start)
+
+
+def main(count: int = 50000) -> None:
+    key_b64 = base64.b64encode(os.urandom(30)).decode()
+    check_vectors()
+    check_against_per_packet(key_b64)
+    print("RFC 3711 test vectors and per-packet implementation: OK")
+
+    # Typical HomeKit audio packet, 12 byte header and ~160 byte Opus frame
+    packets = [_rtp_packet(seq, os.urandom(160)) for seq in range(count)]
+    reference = _PerPacketSRTPContext(key_b64)
+    single = SRTPContext(key_b64)
+    batch = SRTPContext(key_b64)
+
+    rates = {
+        "per-packet Cipher/HMAC": _rate(
+            lambda p: [reference.encrypt(x) for x in p], packets
+        ),
+        "SRTPContext.encrypt": _rate(lambda p: [single.encrypt(x) for x in p], packets),
+        "SRTPContext.encrypt_batch (32)": _rate(
+            lambda p: [batch.encrypt_batch(p[i : i + 32]) for i in range(0, len(p), 32)],
+            packets,
+        ),
+    }
+    base = rates["per-packet Cipher/HMAC"]
+    for name, rate in rates.items():
+        print(f"{name:32} {rate:12,.0f} packets/s  {rate / base:5.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
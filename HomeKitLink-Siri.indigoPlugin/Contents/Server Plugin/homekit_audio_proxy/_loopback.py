@@ -0,0 +1,199 @@
+"""
+Loopback benchmark for the audio proxy worker.
+
+Run with ``python -m homekit_audio_proxy._loopback [capture.pcap]``.
+Starts the worker subprocess exactly as AudioProxy does and replays Opus
+RTP to it over 127.0.0.1, receiving the SRTP output on the destination
+port. Reports:
+
+- flood: every packet sent back to back, packets/s through the worker
+- paced: packets sent at their capture timing (or every 20 ms), the
+  per-packet latency from send to SRTP received, matched by sequence number
+
+The capture is a classic pcap (Ethernet, BSD loopback or raw IP) of the
+RTP stream FFmpeg sends to the proxy, e.g. from
+``tcpdump -i lo0 -w opus.pcap udp``. Without one, synthetic 20 ms Opus
+packets are used.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+_UINT16_BE = struct.Struct("!H")
+_UINT32_BE = struct.Struct("!I")
+_LINKTYPE_NULL = 0
+_LINKTYPE_ETHERNET = 1
+_LINKTYPE_RAW = 101
+_OPUS_FRAME_SECONDS = 0.020
+
+
+def read_pcap(path: str) -> list[tuple[float, bytes]]:
+    """(capture time, UDP payload) of every RTP v2 packet in a pcap file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic = _UINT32_BE.unpack_from(data, 0)[0]
+    endian = "<" if magic in (0xD4C3B2A1, 0x4D3CB2A1) else ">"
+    nanos = magic in (0xA1B23C4D, 0x4D3CB2A1)
+    header = struct.Struct(endian + "IHHiIII")
+    record = struct.Struct(endian + "IIII")
+    linktype = header.unpack_from(data, 0)[6] & 0x0FFFFFFF
+    link_len = {_LINKTYPE_NULL: 4, _LINKTYPE_ETHERNET: 14, _LINKTYPE_RAW: 0}[
+        linktype
+    ]
+
+    packets = []
+    offset = header.size
+    while offset + record.size <= len(data):
+        seconds, fraction, captured, _ = record.unpack_from(data, offset)
+        offset += record.size
+        frame = data[offset : offset + captured]
+        offset += captured
+        ip = frame[link_len:]
+        if len(ip) < 20 or ip[0] >> 4 != 4 or ip[9] != socket.IPPROTO_UDP:
+            continue
+        udp = ip[(ip[0] & 0x0F) * 4 :]
+        payload = udp[8:]
+        if len(payload) >= 12 and payload[0] >> 6 == 2:
+            timestamp = seconds + fraction / (1e9 if nanos else 1e6)
+            packets.append((timestamp, payload))
+    return packets
+
+
+def synthetic_packets(count: int, size: int = 80) -> list[tuple[float, bytes]]:
+    """20 ms Opus frames, 48 kHz RTP clock as FFmpeg sends them."""
+    packets = []
+    ssrc = 0x5EED0001
+    for i in range(count):
+        header = struct.pack("!BBHII", 0x80, 110, i & 0xFFFF, i * 960, ssrc)
+        packets.append((i * _OPUS_FRAME_SECONDS, header + os.urandom(size)))
+    return packets
+
+
+def _start_worker(dest_port: int) -> tuple[subprocess.Popen, int]:
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=package_parent)
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "homekit_audio_proxy",
+            "127.0.0.1",
+            str(dest_port),
+            "16000",
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        env=env,
+    )
+    process.stdin.write(base64.b64encode(os.urandom(30)) + b"\n")
+    process.stdin.flush()
+    return process, int(process.stdout.readline())
+
+
+def _receive(sock: socket.socket, expected: int, arrivals: dict[int, float]) -> None:
+    buffer = bytearray(2048)
+    sock.settimeout(1.0)
+    while len(arrivals) < expected:
+        try:
+            nbytes = sock.recv_into(buffer)
+        except TimeoutError:
+            return
+        if nbytes >= 12:
+            arrivals[_UINT16_BE.unpack_from(buffer, 2)[0]] = time.perf_counter()
+
+
+def _run(packets: list[tuple[float, bytes]], paced: bool) -> tuple[dict, dict, float]:
+    # The worker sends from 0.0.0.0:dest_port, the receiver binds the more
+    # specific 127.0.0.1:dest_port so it gets the traffic
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    receiver.bind(("127.0.0.1", 0))
+    dest_port = receiver.getsockname()[1]
+    process, proxy_port = _start_worker(dest_port)
+
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = ("127.0.0.1", proxy_port)
+    # Sequence numbers must be unique to match packets up
+    packets = packets[:65536]
+    arrivals: dict[int, float] = {}
+    sent: dict[int, float] = {}
+    thread = threading.Thread(
+        target=_receive, args=(receiver, len(packets), arrivals)
+    )
+    thread.start()
+    try:
+        start = time.perf_counter()
+        first = packets[0][0]
+        for when, payload in packets:
+            if paced:
+                delay = start + (when - first) - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            sent[_UINT16_BE.unpack_from(payload, 2)[0]] = time.perf_counter()
+            sender.sendto(payload, target)
+        thread.join()
+    finally:
+        process.stdin.close()
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        sender.close()
+        receiver.close()
+    return sent, arrivals, start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("capture", nargs="?", help="pcap of FFmpeg's Opus RTP")
+    parser.add_argument(
+        "--flood", type=int, default=20000, help="packets for the flood run"
+    )
+    parser.add_argument(
+        "--paced", type=int, default=500, help="packets for the paced run"
+    )
+    args = parser.parse_args()
+
+    if args.capture:
+        packets = read_pcap(args.capture)
+        print(f"{len(packets)} RTP packets from {args.capture}")
+    else:
+        packets = synthetic_packets(max(args.flood, args.paced))
+        print(f"{len(packets)} synthetic Opus packets")
+
+    flood = packets[: args.flood]
+    sent, arrivals, start = _run(flood, paced=False)
+    if arrivals:
+        elapsed = max(arrivals.values()) - start
+        print(
+            f"flood: {len(arrivals)}/{len(sent)} received, "
+            f"{len(arrivals) / elapsed:,.0f} packets/s"
+        )
+
+    sent, arrivals, _ = _run(packets[: args.paced], paced=True)
+    latencies = sorted(
+        (arrivals[seq] - sent[seq]) * 1e6 for seq in arrivals if seq in sent
+    )
+    if latencies:
+        def percentile(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        print(
+            f"paced: {len(latencies)}/{len(sent)} received, latency us "
+            f"p50 {percentile(0.5):.0f}  p90 {percentile(0.9):.0f}  "
+            f"p99 {percentile(0.99):.0f}  max {latencies[-1]:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
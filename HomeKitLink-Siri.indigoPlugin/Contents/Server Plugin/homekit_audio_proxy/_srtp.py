@@ -1,20 +1,30 @@
-"""SRTP encryption for AES_CM_128_HMAC_SHA1_80."""
+"""SRTP encryption for AES_CM_128_HMAC_SHA1_80.
+
+The AES key schedule and HMAC key are set up once per context. AES-CM
+keystream is produced by a single long-lived AES-ECB encryptor over the
+packet's counter blocks (RFC 3711 Section 4.1.1), so there is no Cipher
+object per packet, and a batch of packets needs one AES call. The HMAC is
+keyed once and cloned with ``.copy()`` for each packet.
+"""
 
 from __future__ import annotations
 
 import base64
-import hashlib
 import hmac
 import struct
+from collections.abc import Iterable
 
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
 _UINT32_BE = struct.Struct("!I")
 _UINT16_BE = struct.Struct("!H")
-_UINT16_UINT32_BE = struct.Struct("!HI")
 _MIN_RTP_HEADER_SIZE = 12
 _SEQ_ROLLOVER_THRESHOLD = 0x8000
 _AUTH_TAG_LENGTH = 10
+_BLOCK_SIZE = 16
+_BUFFER_SIZE = 2048 + _AUTH_TAG_LENGTH
+# Low 16 bits of the counter block, enough blocks for any UDP payload
+_COUNTER_SUFFIXES = tuple(i.to_bytes(2, "big") for i in range(4096))
 
 
 def _derive_srtp_key(
@@ -31,6 +41,15 @@ def _derive_srtp_key(
     return (encryptor.update(b"\x00" * length) + encryptor.finalize())[:length]
 
 
+def _rtp_header_length(rtp_packet: bytes) -> int:
+    """Length of the RTP header including CSRCs and any extension."""
+    header_len = _MIN_RTP_HEADER_SIZE + (rtp_packet[0] & 0x0F) * 4
+    if (rtp_packet[0] >> 4) & 1:  # Extension bit
+        ext_length = _UINT16_BE.unpack_from(rtp_packet, header_len + 2)[0]
+        header_len += 4 + ext_length * 4
+    return header_len
+
+
 class SRTPContext:
     """SRTP encryption context for AES_CM_128_HMAC_SHA1_80."""
 
@@ -45,24 +64,42 @@ class SRTPContext:
         master_key = key_material[:16]
         master_salt = key_material[16:30]
 
-        self._session_key = _derive_srtp_key(master_key, master_salt, 0, 16)
-        self._session_auth_key = _derive_srtp_key(master_key, master_salt, 1, 20)
-        self._session_salt = _derive_srtp_key(master_key, master_salt, 2, 14)
+        self._init_session(
+            _derive_srtp_key(master_key, master_salt, 0, 16),
+            _derive_srtp_key(master_key, master_salt, 2, 14),
+            _derive_srtp_key(master_key, master_salt, 1, 20),
+        )
+
+    @classmethod
+    def from_session_keys(
+        cls, session_key: bytes, session_salt: bytes, session_auth_key: bytes
+    ) -> SRTPContext:
+        """Create a context from already derived session keys (e.g. test vectors)."""
+        context = cls.__new__(cls)
+        context._init_session(session_key, session_salt, session_auth_key)
+        return context
+
+    def _init_session(
+        self, session_key: bytes, session_salt: bytes, session_auth_key: bytes
+    ) -> None:
+        self._session_key = session_key
+        self._session_auth_key = session_auth_key
+        self._session_salt = session_salt
+        self._salt_int = int.from_bytes(session_salt, "big")
+        # AES-CM is AES-ECB of the counter blocks, so one encryptor serves
+        # every packet for the life of the session
+        self._ecb = Cipher(algorithms.AES(session_key), modes.ECB()).encryptor()
+        self._auth = hmac.new(session_auth_key, digestmod="sha1")
+        self._buffer = bytearray(_BUFFER_SIZE)
         self._roc: int = 0
         self._last_seq: int = 0
 
-    def encrypt(self, rtp_packet: bytes) -> bytes:
-        """Encrypt an RTP packet to produce an SRTP packet."""
-        header_len = _MIN_RTP_HEADER_SIZE
-        cc = rtp_packet[0] & 0x0F
-        header_len += cc * 4
-        if (rtp_packet[0] >> 4) & 1:  # Extension bit
-            ext_length = _UINT16_BE.unpack_from(rtp_packet, header_len + 2)[0]
-            header_len += 4 + ext_length * 4
-
-        header = rtp_packet[:header_len]
-        payload = rtp_packet[header_len:]
-
+    def _next_counter(self, rtp_packet: bytes) -> tuple[int, bytes, int]:
+        """Advance the ROC; return header length, counter prefix and ROC."""
+        # A header claiming more CSRCs or extension than the packet holds
+        # covers the whole packet, leaving an empty payload, as the
+        # per-packet encryptor did by slicing
+        header_len = min(_rtp_header_length(rtp_packet), len(rtp_packet))
         ssrc = _UINT32_BE.unpack_from(rtp_packet, 8)[0]
         seq = _UINT16_BE.unpack_from(rtp_packet, 2)[0]
 
@@ -71,23 +108,84 @@ class SRTPContext:
         self._last_seq = seq
 
         packet_index = (self._roc << 16) | seq
-
-        iv = bytearray(16)
-        _UINT32_BE.pack_into(iv, 4, ssrc)
-        _UINT16_UINT32_BE.pack_into(
-            iv, 8, packet_index >> 32, packet_index & 0xFFFFFFFF
-        )
-        for i in range(14):
-            iv[i] ^= self._session_salt[i]
-
-        cipher = Cipher(algorithms.AES(self._session_key), modes.CTR(bytes(iv)))
-        encryptor = cipher.encryptor()
-        encrypted_payload = encryptor.update(payload) + encryptor.finalize()
-
-        srtp_packet = header + encrypted_payload
-        auth_data = srtp_packet + _UINT32_BE.pack(self._roc)
-        auth_tag = hmac.new(self._session_auth_key, auth_data, hashlib.sha1).digest()[
+        # IV = (salt * 2^16) XOR (SSRC * 2^64) XOR (index * 2^16), less
+        # its low 16 bits, which are the block counter
+        prefix = (self._salt_int ^ (ssrc << 48) ^ packet_index).to_bytes(14, "big")
+        return header_len, prefix, self._roc
+
+    @staticmethod
+    def _counter_blocks(prefix: bytes, payload_len: int) -> bytes:
+        blocks = -(-payload_len // _BLOCK_SIZE)
+        return b"".join([prefix + suffix for suffix in _COUNTER_SUFFIXES[:blocks]])
+
+    def _write(
+        self,
+        rtp_packet: bytes,
+        header_len: int,
+        keystream: bytes,
+        roc: int,
+        out: memoryview,
+    ) -> int:
+        packet_len = len(rtp_packet)
+        payload_len = packet_len - header_len
+        out[:header_len] = rtp_packet[:header_len]
+        if payload_len:
+            payload = int.from_bytes(rtp_packet[header_len:], "big")
+            key = int.from_bytes(keystream[:payload_len], "big")
+            out[header_len:packet_len] = (payload ^ key).to_bytes(payload_len, "big")
+        auth = self._auth.copy()
+        auth.update(out[:packet_len])
+        auth.update(_UINT32_BE.pack(roc))
+        out[packet_len : packet_len + _AUTH_TAG_LENGTH] = auth.digest()[
             :_AUTH_TAG_LENGTH
         ]
+        return packet_len + _AUTH_TAG_LENGTH
 
-        return srtp_packet + auth_tag
+    def encrypt_into(self, rtp_packet: bytes, out: bytearray | memoryview) -> int:
+        """Encrypt an RTP packet into ``out``, returning the SRTP packet length.
+
+        ``out`` must have room for the packet plus the 10 byte auth tag.
+        """
+        header_len, prefix, roc = self._next_counter(rtp_packet)
+        keystream = self._ecb.update(
+            self._counter_blocks(prefix, len(rtp_packet) - header_len)
+        )
+        return self._write(rtp_packet, header_len, keystream, roc, memoryview(out))
+
+    def encrypt(self, rtp_packet: bytes) -> bytes:
+        """Encrypt an RTP packet to produce an SRTP packet."""
+        if len(rtp_packet) + _AUTH_TAG_LENGTH > len(self._buffer):
+            self._buffer = bytearray(len(rtp_packet) + _AUTH_TAG_LENGTH)
+        view = memoryview(self._buffer)
+        length = self.encrypt_into(rtp_packet, view)
+        return view[:length].tobytes()
+
+    def encrypt_batch(self, rtp_packets: Iterable[bytes]) -> list[bytes]:
+        """Encrypt several RTP packets, in order, with one AES call for all."""
+        packets = list(rtp_packets)
+        counters = []
+        blocks = []
+        for rtp_packet in packets:
+            header_len, prefix, roc = self._next_counter(rtp_packet)
+            counter = self._counter_blocks(prefix, len(rtp_packet) - header_len)
+            counters.append((header_len, roc, len(counter)))
+            blocks.append(counter)
+        keystream = memoryview(self._ecb.update(b"".join(blocks)))
+
+        results = []
+        offset = 0
+        view = memoryview(self._buffer)
+        for rtp_packet, (header_len, roc, counter_len) in zip(packets, counters):
+            if len(rtp_packet) + _AUTH_TAG_LENGTH > len(self._buffer):
+                self._buffer = bytearray(len(rtp_packet) + _AUTH_TAG_LENGTH)
+                view = memoryview(self._buffer)
+            length = self._write(
+                rtp_packet,
+                header_len,
+                keystream[offset : offset + counter_len],
+                roc,
+                view,
+            )
+            results.append(view[:length].tobytes())
+            offset += counter_len
+        return results
@@ -4,11 +4,33 @@ Subprocess worker for the audio proxy.
 This module is invoked as ``python -m homekit_audio_proxy`` and runs the
 blocking UDP recv/send loop. The SRTP key is read from stdin to avoid
 exposing it in process arguments.
+
+The loop waits on a selector for either the RTP socket or stdin. The
+parent keeps stdin open for the life of the proxy, so EOF there means the
+parent closed it or died. When the socket is readable, every queued
+datagram (up to a batch) is read with ``recv_into`` into a preallocated
+buffer, and its timestamp rewritten and SRTP encrypted in place.
+
+``python -m homekit_audio_proxy --daemon`` runs the same loop for many
+sessions in one process. Sessions are added and removed with JSON lines
+on stdin, each answered by a JSON line on stdout:
+
+    {"op": "add", "id": 1, "dest_addr": "...", "dest_port": 5000,
+     "srtp_key": "...", "target_clock_rate": 16000}
+        -> {"id": 1, "port": 54321}
+    {"op": "remove", "id": 1}
+        -> {"id": 1}
+
+Failures are answered with ``{"id": ..., "error": "..."}``. A session
+whose socket fails is closed and reported with ``{"id": ..., "closed":
+"..."}``.
 """
 
 from __future__ import annotations
 
+import json
 import os
+import selectors
 import socket
 import struct
 import sys
@@ -18,9 +40,100 @@ from ._srtp import SRTPContext
 
 SRTP_OPUS_CLOCK_RATE = 48000
 _UINT32_BE = struct.Struct("!I")
-_RECV_TIMEOUT_SECONDS = 5.0
+_UINT16_BE = struct.Struct("!H")
+_PARENT_CHECK_SECONDS = 5.0
 _MIN_RTP_HEADER_SIZE = 12
 _UDP_MAX_READ = 2048
+_AUTH_TAG_LENGTH = 10
+_BATCH_SIZE = 32
+_PARENT = "parent"
+
+
+def _header_fits(view: memoryview, nbytes: int) -> bool:
+    """Whether the RTP header, with its CSRCs and extension, is inside the datagram."""
+    header_len = _MIN_RTP_HEADER_SIZE + (view[0] & 0x0F) * 4
+    if view[0] & 0x10:  # Extension bit
+        if header_len + 4 > nbytes:
+            return False
+        header_len += 4 + _UINT16_BE.unpack_from(view, header_len + 2)[0] * 4
+    return header_len <= nbytes
+
+
+class _Session:
+    """One audio stream: plain RTP from FFmpeg in, SRTP to the client out."""
+
+    def __init__(
+        self,
+        dest_addr: str,
+        dest_port: int,
+        srtp_key_b64: str,
+        target_clock_rate: int,
+    ) -> None:
+        self.srtp = SRTPContext(srtp_key_b64)
+        self.target_clock_rate = target_clock_rate
+        self.dest = (dest_addr, dest_port)
+        self.packets_forwarded = 0
+        self.allowed_sender: tuple[str, int] | None = None
+
+        self.recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.recv_sock.setblocking(False)
+            self.recv_sock.bind(("127.0.0.1", 0))
+            self.local_port = self.recv_sock.getsockname()[1]
+        except OSError:
+            self.recv_sock.close()
+            raise
+
+        self.send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            # SO_REUSEADDR allows quick rebind if a previous proxy just released
+            # the port (e.g. stream restart)
+            self.send_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # Bind to 0.0.0.0 so the kernel picks the correct source IP
+            # for the route to the HomeKit client
+            self.send_sock.bind(("0.0.0.0", dest_port))  # noqa: S104
+        except OSError:
+            self.send_sock.close()
+            self.recv_sock.close()
+            raise
+
+    def forward(self, view: memoryview) -> None:
+        """Forward what is queued on the socket, up to a batch, using ``view``."""
+        for _ in range(_BATCH_SIZE):
+            try:
+                nbytes, sender = self.recv_sock.recvfrom_into(view, _UDP_MAX_READ)
+            except BlockingIOError:
+                return
+            if nbytes < _MIN_RTP_HEADER_SIZE or not _header_fits(view, nbytes):
+                continue
+
+            # Lock to the first sender (FFmpeg) to prevent other local
+            # processes from injecting audio into the stream.
+            if self.allowed_sender is None:
+                self.allowed_sender = sender
+            elif sender != self.allowed_sender:
+                continue
+
+            # Convert timestamp from 48000 Hz to negotiated sample rate
+            ts = _UINT32_BE.unpack_from(view, 4)[0]
+            new_ts = (
+                ts * self.target_clock_rate // SRTP_OPUS_CLOCK_RATE
+            ) & 0xFFFFFFFF
+            _UINT32_BE.pack_into(view, 4, new_ts)
+
+            length = self.srtp.encrypt_into(view[:nbytes], view)
+            self.send_sock.sendto(view[:length], self.dest)
+            self.packets_forwarded += 1
+
+    def close(self) -> None:
+        self.recv_sock.close()
+        self.send_sock.close()
+
+
+def _packet_buffer() -> memoryview:
+    # Room for the largest datagram plus the SRTP auth tag, so each packet
+    # is encrypted where it was received
+    return memoryview(bytearray(_UDP_MAX_READ + _AUTH_TAG_LENGTH))
 
 
 def run_proxy(
@@ -28,88 +141,156 @@ def run_proxy(
     dest_port: int,
     srtp_key_b64: str,
     target_clock_rate: int,
+    parent_fd: int | None = None,
 ) -> int:
     """
     Run the audio proxy loop (blocking, for subprocess use).
 
+    ``parent_fd`` is a pipe from the parent that reaches EOF when the
+    parent goes away (normally stdin). Without it the parent pid is
+    checked every few seconds instead.
+
     Returns exit code: 0 for clean shutdown, 1 for error.
     """
-    try:
-        srtp = SRTPContext(srtp_key_b64)
-    except Exception:
-        traceback.print_exc(file=sys.stderr)
-        return 1
-
     parent_pid = os.getppid()
-
-    recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
-        recv_sock.settimeout(_RECV_TIMEOUT_SECONDS)
-        recv_sock.bind(("127.0.0.1", 0))
-        local_port = recv_sock.getsockname()[1]
-    except OSError:
-        traceback.print_exc(file=sys.stderr)
-        recv_sock.close()
-        return 1
-
-    send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    try:
-        # SO_REUSEADDR allows quick rebind if a previous proxy just released
-        # the port (e.g. stream restart)
-        send_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        # Bind to 0.0.0.0 so the kernel picks the correct source IP
-        # for the route to the HomeKit client
-        send_sock.bind(("0.0.0.0", dest_port))  # noqa: S104
-    except OSError:
+        session = _Session(dest_addr, dest_port, srtp_key_b64, target_clock_rate)
+    except Exception:
         traceback.print_exc(file=sys.stderr)
-        send_sock.close()
-        recv_sock.close()
         return 1
 
     # Signal the local port to the parent process
-    sys.stdout.write(f"{local_port}\n")
+    sys.stdout.write(f"{session.local_port}\n")
     sys.stdout.flush()
 
-    dest = (dest_addr, dest_port)
-    packets_forwarded = 0
-    allowed_sender: tuple[str, int] | None = None
+    selector = selectors.DefaultSelector()
+    selector.register(session.recv_sock, selectors.EVENT_READ, session)
+    if parent_fd is not None:
+        selector.register(parent_fd, selectors.EVENT_READ, _PARENT)
+
+    view = _packet_buffer()
+    running = True
     try:
-        while True:
-            try:
-                data, sender = recv_sock.recvfrom(_UDP_MAX_READ)
-            except TimeoutError:
-                # Check if parent process is still alive to avoid orphaning
+        while running:
+            events = selector.select(_PARENT_CHECK_SECONDS)
+            if not events:
+                # Fallback if there is no parent pipe, avoid orphaning
                 if os.getppid() != parent_pid:
                     break
                 continue
-            if len(data) < _MIN_RTP_HEADER_SIZE:
-                continue
-
-            # Lock to the first sender (FFmpeg) to prevent other local
-            # processes from injecting audio into the stream.
-            if allowed_sender is None:
-                allowed_sender = sender
-            elif sender != allowed_sender:
-                continue
-
-            # Convert timestamp from 48000 Hz to negotiated sample rate
-            ts = _UINT32_BE.unpack_from(data, 4)[0]
-            new_ts = (ts * target_clock_rate // SRTP_OPUS_CLOCK_RATE) & 0xFFFFFFFF
-            packet = bytearray(data)
-            _UINT32_BE.pack_into(packet, 4, new_ts)
-
-            srtp_packet = srtp.encrypt(bytes(packet))
-            send_sock.sendto(srtp_packet, dest)
-            packets_forwarded += 1
+            for key, _ in events:
+                if key.data == _PARENT:
+                    if not os.read(parent_fd, 64):
+                        running = False
+                    continue
+                session.forward(view)
     except OSError as err:
         sys.stderr.write(
-            f"Audio proxy socket error after {packets_forwarded} packets: {err}\n"
+            f"Audio proxy socket error after {session.packets_forwarded} packets: {err}\n"
         )
     except Exception:
         traceback.print_exc(file=sys.stderr)
         return 1
     finally:
-        recv_sock.close()
-        send_sock.close()
+        selector.close()
+        session.close()
 
     return 0
+
+
+def _reply(message: dict) -> None:
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def run_daemon(control_fd: int) -> int:
+    """
+    Run the multi-session proxy loop (blocking, for subprocess use).
+
+    Commands are read from ``control_fd`` (stdin), replies written to
+    stdout. Returns 0 when ``control_fd`` reaches EOF.
+    """
+    selector = selectors.DefaultSelector()
+    selector.register(control_fd, selectors.EVENT_READ, _PARENT)
+    sessions: dict[int, _Session] = {}
+    view = _packet_buffer()
+    pending = b""
+
+    def remove(session_id: int) -> None:
+        if (session := sessions.pop(session_id, None)) is not None:
+            selector.unregister(session.recv_sock)
+            session.close()
+
+    def control(command: dict) -> dict:
+        session_id = command.get("id")
+        try:
+            if command["op"] == "add":
+                session = _Session(
+                    command["dest_addr"],
+                    int(command["dest_port"]),
+                    command["srtp_key"],
+                    int(command["target_clock_rate"]),
+                )
+                remove(session_id)
+                sessions[session_id] = session
+                selector.register(
+                    session.recv_sock, selectors.EVENT_READ, session_id
+                )
+                return {"id": session_id, "port": session.local_port}
+            if command["op"] == "remove":
+                remove(session_id)
+                return {"id": session_id}
+            return {"id": session_id, "error": f"unknown op {command['op']}"}
+        except Exception as err:
+            return {"id": session_id, "error": f"{type(err).__name__}: {err}"}
+
+    try:
+        while True:
+            for key, _ in selector.select():
+                if key.data == _PARENT:
+                    chunk = os.read(control_fd, 65536)
+                    if not chunk:
+                        return 0
+                    pending += chunk
+                    while b"\n" in pending:
+                        line, pending = pending.split(b"\n", 1)
+                        if not line.strip():
+                            continue
+                        try:
+                            command = json.loads(line)
+                        except ValueError:
+                            _reply({"id": None, "error": "invalid command"})
+                            continue
+                        _reply(control(command))
+                    continue
+                session_id = key.data
+                session = sessions.get(session_id)
+                if session is None:
+                    # Removed by a control command from this same select()
+                    continue
+                try:
+                    session.forward(view)
+                except Exception as err:
+                    # One session failing must not end the daemon and
+                    # every other camera's audio with it
+                    packets = session.packets_forwarded
+                    remove(session_id)
+                    if isinstance(err, OSError):
+                        sys.stderr.write(
+                            f"Audio proxy session {session_id} socket error"
+                            f" after {packets} packets: {err}\n"
+                        )
+                    else:
+                        sys.stderr.write(
+                            f"Audio proxy session {session_id} failed"
+                            f" after {packets} packets:\n"
+                        )
+                        traceback.print_exc(file=sys.stderr)
+                    _reply({"id": session_id, "closed": f"{type(err).__name__}: {err}"})
+    except Exception:
+        traceback.print_exc(file=sys.stderr)
+        return 1
+    finally:
+        for session_id in list(sessions):
+            remove(session_id)
+        selector.close()
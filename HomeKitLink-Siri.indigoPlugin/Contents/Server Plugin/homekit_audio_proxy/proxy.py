@@ -3,20 +3,137 @@
 from __future__ import annotations
 
 import asyncio
+import concurrent.futures
+import itertools
+import json
 import logging
 import os
+import subprocess
 import sys
+import threading
 
 from ._worker import SRTP_OPUS_CLOCK_RATE
 
 _LOGGER = logging.getLogger(__name__)
 
+_CONTROL_TIMEOUT_SECONDS = 10.0
+
+
+class _ProxyDaemon:
+    """
+    The shared ``python -m homekit_audio_proxy --daemon`` process.
+
+    One per interpreter path, started on first use and restarted if it has
+    died. Talked to from any thread or event loop: requests return
+    concurrent futures resolved by a reader thread.
+    """
+
+    _instances: dict[str, _ProxyDaemon] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, python_path: str) -> None:
+        self._process = subprocess.Popen(  # noqa: S603
+            [python_path, "-m", "homekit_audio_proxy", "--daemon"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self._write_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending: dict[int, concurrent.futures.Future] = {}
+        threading.Thread(
+            target=self._read_replies, name="AudioProxy replies", daemon=True
+        ).start()
+        threading.Thread(
+            target=self._log_stderr, name="AudioProxy stderr", daemon=True
+        ).start()
+        _LOGGER.debug(
+            "Audio proxy daemon started (PID %d): %s", self._process.pid, python_path
+        )
+
+    @classmethod
+    def get(cls, python_path: str) -> _ProxyDaemon:
+        with cls._instances_lock:
+            daemon = cls._instances.get(python_path)
+            if daemon is None or not daemon.alive:
+                daemon = cls._instances[python_path] = cls(python_path)
+            return daemon
+
+    @classmethod
+    def shutdown_all(cls) -> None:
+        with cls._instances_lock:
+            for daemon in cls._instances.values():
+                daemon.close()
+            cls._instances.clear()
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    def request(self, command: dict) -> concurrent.futures.Future:
+        """Send a command (with an id from new_id); the future resolves to the reply."""
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._write_lock:
+            self._pending[command["id"]] = future
+            try:
+                self._process.stdin.write(json.dumps(command).encode() + b"\n")
+                self._process.stdin.flush()
+            except OSError as err:
+                self._pending.pop(command["id"], None)
+                future.set_exception(err)
+        return future
+
+    def new_id(self) -> int:
+        return next(self._ids)
+
+    def _read_replies(self) -> None:
+        for line in self._process.stdout:
+            try:
+                reply = json.loads(line)
+            except ValueError:
+                continue
+            if "closed" in reply:
+                _LOGGER.warning(
+                    "Audio proxy session %s closed: %s", reply.get("id"), reply["closed"]
+                )
+                continue
+            future = self._pending.pop(reply.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(reply)
+        # Daemon has exited, nothing pending will be answered
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Audio proxy daemon exited"))
+        self._pending.clear()
+
+    def _log_stderr(self) -> None:
+        for line in self._process.stderr:
+            _LOGGER.warning(
+                "Audio proxy: %s", line.decode(errors="replace").rstrip()
+            )
+
+    def close(self) -> None:
+        # EOF on its stdin is the daemon's signal to close every session
+        try:
+            self._process.stdin.close()
+            self._process.wait(5)
+        except (OSError, subprocess.TimeoutExpired):
+            self._process.kill()
+
+
+def shutdown_daemon() -> None:
+    """Stop the shared proxy daemon, ending every session it serves."""
+    _ProxyDaemon.shutdown_all()
+
 
 class AudioProxy:
     """
     Proxy that converts FFmpeg's Opus RTP timestamps for HomeKit.
 
     Runs as a subprocess to keep crypto work off the caller's event loop.
+    By default all sessions share one long-lived proxy process, and
+    starting a session is a control message to it rather than a new
+    interpreter. ``multiplexed=False`` starts a process per session.
     """
 
     def __init__(
@@ -26,6 +143,7 @@ class AudioProxy:
         srtp_key_b64: str,
         target_clock_rate: int,
         python_path: str | None = None,
+        multiplexed: bool = True,
     ) -> None:
         """Initialize the audio proxy.
 
@@ -34,6 +152,8 @@ class AudioProxy:
                 subprocess. Defaults to sys.executable. Indigo and other
                 embedded hosts should pass the real Python 3 path here
                 (e.g. sys.prefix + "/bin/python3").
+            multiplexed: Serve this session from the shared proxy daemon
+                rather than a process of its own.
         """
         self._dest_addr = dest_addr
         self._dest_port = dest_port
@@ -42,10 +162,13 @@ class AudioProxy:
         self._python_path = python_path or sys.executable
         self._process: asyncio.subprocess.Process | None = None
         self._stderr_task: asyncio.Task[None] | None = None
+        self._multiplexed = multiplexed
+        self._daemon: _ProxyDaemon | None = None
+        self._session_id: int | None = None
         self.local_port: int = 0
 
     async def async_start(self) -> None:
-        """Start the proxy subprocess."""
+        """Start the proxy session."""
         python = self._python_path
         # Verify the interpreter exists before spawning
         if not os.path.isfile(python):
@@ -53,6 +176,53 @@ class AudioProxy:
                 "Audio proxy python interpreter not found: %s", python
             )
             return
+        if self._multiplexed:
+            await self._async_start_session(python)
+        else:
+            await self._async_start_process(python)
+
+    async def _async_start_session(self, python: str) -> None:
+        """Add this session to the shared proxy daemon."""
+        try:
+            daemon = _ProxyDaemon.get(python)
+            session_id = daemon.new_id()
+            reply = await asyncio.wait_for(
+                asyncio.wrap_future(
+                    daemon.request(
+                        {
+                            "op": "add",
+                            "id": session_id,
+                            "dest_addr": self._dest_addr,
+                            "dest_port": self._dest_port,
+                            "srtp_key": self._srtp_key_b64,
+                            "target_clock_rate": self._target_clock_rate,
+                        }
+                    )
+                ),
+                timeout=_CONTROL_TIMEOUT_SECONDS,
+            )
+        except Exception as err:
+            _LOGGER.error("Audio proxy daemon did not start the session: %s", err)
+            return
+        if "error" in reply:
+            _LOGGER.error("Audio proxy session failed to start: %s", reply["error"])
+            return
+
+        self._daemon = daemon
+        self._session_id = session_id
+        self.local_port = int(reply["port"])
+        _LOGGER.debug(
+            "Audio proxy session %d started on port %d -> %s:%d (clock %d->%d)",
+            session_id,
+            self.local_port,
+            self._dest_addr,
+            self._dest_port,
+            SRTP_OPUS_CLOCK_RATE,
+            self._target_clock_rate,
+        )
+
+    async def _async_start_process(self, python: str) -> None:
+        """Start a proxy subprocess for this session alone."""
 
         _LOGGER.debug(
             "Audio proxy launching subprocess: %s -m homekit_audio_proxy %s %s %s",
@@ -73,11 +243,12 @@ class AudioProxy:
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
-        # Pass SRTP key via stdin to avoid exposing it in process args
+        # Pass SRTP key via stdin to avoid exposing it in process args.
+        # stdin then stays open: the worker exits when it sees EOF, which
+        # also happens if this process dies
         if self._process.stdin:
             self._process.stdin.write(self._srtp_key_b64.encode() + b"\n")
             await self._process.stdin.drain()
-            self._process.stdin.close()
 
         if self._process.stdout is None:
             _LOGGER.error("Audio proxy subprocess has no stdout")
@@ -129,7 +300,20 @@ class AudioProxy:
             )
 
     async def async_stop(self) -> None:
-        """Stop the proxy subprocess and wait for port release."""
+        """Stop the proxy session and wait for port release."""
+        if self._daemon is not None:
+            daemon, self._daemon = self._daemon, None
+            try:
+                await asyncio.wait_for(
+                    asyncio.wrap_future(
+                        daemon.request({"op": "remove", "id": self._session_id})
+                    ),
+                    timeout=_CONTROL_TIMEOUT_SECONDS,
+                )
+            except Exception as err:
+                _LOGGER.debug("Audio proxy session %s stop: %s", self._session_id, err)
+            self._session_id = None
+            self.local_port = 0
         if self._stderr_task and not self._stderr_task.done():
             self._stderr_task.cancel()
             try:
@@ -138,6 +322,8 @@ class AudioProxy:
                 pass
             self._stderr_task = None
         if self._process is not None:
+            if self._process.stdin and not self._process.stdin.is_closing():
+                self._process.stdin.close()
             if self._process.returncode is None:
                 self._process.kill()
                 await self._process.wait()
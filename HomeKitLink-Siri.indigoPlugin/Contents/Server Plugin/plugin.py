@@ -11,12 +11,17 @@ try:
 except:
     pass
 
+## -X importtime style timing of everything below, logged at debug at the end of startup()
+from HKImports import ImportTimer, LazyModule
+import_timer = ImportTimer().install()
+
 import preflight  # This runs the dependency checks immediately upon import
 import os
 from os import path
 from pathlib import Path
 
 import asyncio
+import functools
 import threading
 import subprocess
 import traceback
@@ -34,10 +39,8 @@ from logging.handlers import TimedRotatingFileHandler
 
 import socket
 
-try:
-    import requests
-except:
-    pass
+## only the camera setup uses requests, imported then
+requests = LazyModule("requests")
 
 import time as t
 import platform
@@ -54,11 +57,10 @@ from os import listdir
 from os.path import isfile, join
 from pyhap.accessory import Accessory, Bridge
 from pyhap.accessory_driver import AccessoryDriver
-from pyhap.iid_manager import HomeIIDManager, AccessoryIIDStorage
+from pyhap.iid_manager import HomeIIDManager, AccessoryIIDStorage, SqliteAccessoryIIDStorage
 from zeroconf.asyncio import AsyncZeroconf, IPVersion, Zeroconf, InterfaceChoice
 
 from packaging import version
-from homekitlink_ffmpeg import get_ffmpeg_binary
 
 try:
     import indigo
@@ -76,10 +78,23 @@ from HomeKitDevices import HomeAccessory, HomeDriver, HomeBridge
 import HKSecuritySystem
 import HomeKitDevices
 import HKConstants
-import HKDevicesCamera
-import HKDevicesCameraSecuritySpy
-import HKThermostat
+## Accessory types with their own stacks are imported when the first one is set up
+HKDevicesCamera = LazyModule("HKDevicesCamera")
+HKDevicesCameraSecuritySpy = LazyModule("HKDevicesCameraSecuritySpy")
+HKThermostat = LazyModule("HKThermostat")
+homekit_audio_proxy = LazyModule("homekit_audio_proxy")
+HKSnapshotFetcher = LazyModule("HKSnapshotFetcher")
+import HKffprobe
+from HKWarmPool import WarmPool
+from HKSharedStream import SharedStreams
 import HKutils
+from HKDeviceRegistry import DeviceRegistry
+import HKDeviceSnapshot
+from HKBridgeLoop import BridgeLoop
+from HKBridgeStartup import BridgeStartup
+from HKStateCache import DeviceStateCache
+from HKDeviceCatalog import DeviceCatalog
+from HKSnapshotStore import SnapshotStore
 
 _HAS_IPV6 = hasattr(socket, "AF_INET6")
 MAX_NAME_LENGTH = 64
@@ -87,6 +102,8 @@ MAX_SERIAL_LENGTH = 64
 MAX_MODEL_LENGTH = 64
 MAX_VERSION_LENGTH = 64
 MAX_MANUFACTURER_LENGTH = 64
+BRIDGE_RESTART_ATTEMPTS = 5  ## failed starts in a row before a bridge is no longer restarted
+BRIDGE_RESTART_BACKOFF_MAX = 300
 
 ################################################################################
 # New Indigo Log Handler - display more useful info when debug logging
@@ -158,10 +175,94 @@ class IndigoAsyncZeroconf(AsyncZeroconf):
         """Fake method to avoid bridges closing it."""
     indigo_async_close = AsyncZeroconf.async_close
 
+################################################################################
+# One zeroconf responder shared by every bridge
+################################################################################
+class SharedZeroconfResponder:
+    """
+    Single process wide zeroconf instance that registers, updates and unregisters
+    the _hap._tcp service for every bridge driver.
+    Given to each driver as async_zeroconf_instance - it has the AsyncZeroconf methods the
+    driver uses, but runs the thread safe sync Zeroconf calls in the calling loop's executor,
+    so each bridge loop never has to share zeroconf's own loop.
+    """
+    def __init__(self, ip_version=None, interfaces=None):
+        self.logger = logging.getLogger("Plugin.HomeKit_pyHap")
+        zc_args = {}
+        if interfaces is not None:
+            zc_args["interfaces"] = interfaces
+        elif ip_version is not None:
+            zc_args["ip_version"] = ip_version
+        self.zc = IndigoZeroconf(**zc_args)
+        self.services = {}   ## service name -> ServiceInfo currently registered
+        self._lock = threading.Lock()
+        self._reannounce_thread = None
+        self.logger.debug(f"mDNS Shared Zeroconf responder created with {zc_args=}")
+
+    def __repr__(self):
+        return f"SharedZeroconfResponder({len(self.services)} services)"
+
+    async def async_register_service(self, info, cooperating_responders=False, **kwargs):
+        with self._lock:
+            self.services[info.name] = info
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self.zc.register_service, info, cooperating_responders=cooperating_responders, **kwargs))
+
+    async def async_update_service(self, info):
+        with self._lock:
+            self.services[info.name] = info
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.zc.update_service, info)
+
+    async def async_unregister_service(self, info):
+        with self._lock:
+            self.services.pop(info.name, None)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.zc.unregister_service, info)
+
+    async def async_close(self):
+        """Bridges stopping don't close the shared responder, plugin shutdown does."""
+
+    def reannounce_all(self, drivers, refresh_address=True, batch_size=4, batch_delay=1.0):
+        """
+        Re-announce every registered bridge, a few at a time so the LAN isn't flooded. Runs in its own thread.
+        Each bridge rebuilds its ServiceInfo on its own loop, after looking up its addresses again
+        if refresh_address (no address set in the advanced config), so the new addresses are announced.
+        """
+        if self._reannounce_thread is not None and self._reannounce_thread.is_alive():
+            self.logger.debug("mDNS Re-announce already running.")
+            return
+        self._reannounce_thread = threading.Thread(target=self._reannounce, args=(list(drivers), refresh_address, batch_size, batch_delay), name="mDNS Reannounce", daemon=True)
+        self._reannounce_thread.start()
+
+    def _reannounce(self, drivers, refresh_address, batch_size, batch_delay):
+        with self._lock:
+            drivers = [driver for driver in drivers if driver.mdns_service_info != None and driver.mdns_service_info.name in self.services]
+        self.logger.debug(f"mDNS Re-announcing {len(drivers)} bridges in batches of {batch_size}")
+        for start in range(0, len(drivers), batch_size):
+            for driver in drivers[start:start + batch_size]:
+                try:
+                    ## driver state belongs to the bridge's loop, both run there in this order
+                    if refresh_address:
+                        driver.loop.call_soon_threadsafe(driver.async_refresh_addresses)
+                    driver.update_advertisement()
+                    self.logger.debug(f"mDNS Re-announcing Bridge {getattr(driver, 'indigodeviceid', '')}")
+                except:
+                    self.logger.debug(f"mDNS Re-announce failed for Bridge {getattr(driver, 'indigodeviceid', '')}", exc_info=True)
+            t.sleep(batch_delay)
+
+    def close(self):
+        try:
+            self.zc.unregister_all_services()
+        except:
+            self.logger.debug("mDNS Exception unregistering shared services", exc_info=True)
+        self.zc.indigo_close()
+
 ################################################################################
 class Plugin(indigo.PluginBase):
     def __init__(self, pluginId, pluginDisplayName, pluginVersion, pluginPrefs):
         indigo.PluginBase.__init__(self, pluginId, pluginDisplayName, pluginVersion, pluginPrefs)
+        self.plugin_start_time = t.monotonic()
         self.packages_installed = False
         ################################################################################
         # Setup Logging
@@ -199,12 +300,10 @@ class Plugin(indigo.PluginBase):
         '''
         Okay - naming dataset
         self.device_list = is set of all devices that seemed to be marked for publishing to Homekit.  Every one. From the device pluginprops HomeKit_publish
-        self.device_list_internal = is list of dicts - including HomeKit accessory class object reference for all RUNNING devices with Turned on bridges
+        self.device_list_internal = DeviceRegistry of dicts, keyed by Indigo device id - including HomeKit accessory class object reference for all RUNNING devices with Turned on bridges
         Issue here is some bridges disabled etc.. so this list only includes up and going HomeKit accessories
-        Finally:
-        self_device_list_internal_idonly = should be the same as above, exactly, but only ID numbers.  Faster checking against deviceUpdate match, probably only
-        picoseconds - but still..
-        Menu item Show internal List published the results of 2 of these to to log.
+        Indexed by device id (and by bridge id and subtype) so deviceUpdated/getter lookups are a dict hit, not a walk of every published device
+        Menu item Show internal List published the results of this to to log.
         '''
 
         ## below not used
@@ -214,8 +313,11 @@ class Plugin(indigo.PluginBase):
         # Thread if Camera accessories, started elsewhere.
         self.cameraSnapShots = threading.Thread(target=self.thread_cameraSnapShots, daemon=True)
         self.device_list = set()
-        self.device_list_internal = []
-        self.device_list_internal_idonly = []
+        self.device_list_internal = DeviceRegistry()
+        self.device_snapshot = None  ## device id -> HKDeviceSnapshot.DeviceRecord, from update_deviceList
+        ## deviceUpdated dispatch table; subtype -> handler chain and the states each handler watches
+        self.deviceUpdated_dispatch = self.build_deviceUpdated_dispatch()
+        self.deviceUpdated_compiled = {}
         self.pluginStartingUp = True
         self.pluginDisplayName = pluginDisplayName
         self.pluginId = pluginId
@@ -271,11 +373,10 @@ class Plugin(indigo.PluginBase):
         self.logger.info("{0:<30} {1}".format("Silicon version:", str(platform.machine()) ))
 
 
-        self.ffmpeg_command_line = get_ffmpeg_binary()
+        self._ffmpeg_command_line = None  ## found when first needed, see ffmpeg_command_line
 
         self.logger.info("{0:<30} {1}".format("Python version:", sys.version.replace('\n', '')))
         self.logger.info("{0:<30} {1}".format("Python Directory:", sys.prefix.replace('\n', '')))
-        self.logger.info(u"{0:<30} {1}".format("FFmpeg :", self.ffmpeg_command_line.replace('\n', '')))
         self.logger.info("")
         self.pluginprefDirectory = '{}/Preferences/Plugins/com.GlennNZ.indigoplugin.HomeKitLink-Siri'.format(indigo.server.getInstallFolderPath())
 
@@ -302,6 +403,38 @@ class Plugin(indigo.PluginBase):
         self.camera_refresh_max_time = int(self.pluginPrefs.get("cameratime",30))
         self.camera_passive_width = int(self.pluginPrefs.get("cameraupdate_width", 720))
         self.camera_passive_time = int(self.pluginPrefs.get("cameraupdate", 30))
+        try:
+            self.camera_fetch_workers = int(self.pluginPrefs.get("cameraFetchWorkers", 4))
+        except:
+            self.camera_fetch_workers = 4
+        self.snapshot_fetcher = None
+        ## Latest snapshots in memory, served by the cameras async_get_snapshot.  Disk copy optional
+        try:
+            snapshot_cache_mb = int(self.pluginPrefs.get("cameraSnapshotCacheMB", 32))
+        except:
+            snapshot_cache_mb = 32
+        self.snapshot_store = SnapshotStore(max_bytes=snapshot_cache_mb * 1024 * 1024)
+        self.camera_snapshots_to_disk = self.pluginPrefs.get("cameraSnapshotDisk", False)
+        self.camera_snapshot_variants = self.pluginPrefs.get("cameraSnapshotVariants", True)
+        self.default_snapshot = None
+        try:
+            ffprobe_cache_hours = float(self.pluginPrefs.get("ffprobeCacheHours", 24))
+        except:
+            ffprobe_cache_hours = 24
+        ## Optional warm ffmpeg sources so doorbell / priority cameras start live view from a buffered keyframe
+        self.camera_warm_pool_enabled = self.pluginPrefs.get("cameraWarmPool", False)
+        try:
+            self.camera_warm_pool_size = int(self.pluginPrefs.get("cameraWarmPoolSize", 2))
+            self.camera_warm_pool_idle = int(self.pluginPrefs.get("cameraWarmPoolIdleMins", 10)) * 60
+        except:
+            self.camera_warm_pool_size = 2
+            self.camera_warm_pool_idle = 600
+        self.camera_warm_priority = [name.strip() for name in self.pluginPrefs.get("cameraWarmPriority", "").split(",") if name.strip()]
+        self.camera_warm_pool = None
+        ## One ffmpeg per camera feeding every viewer, rather than one per iPhone / iPad / Apple TV
+        self.camera_shared_streams_enabled = self.pluginPrefs.get("cameraSharedStreams", False)
+        self.camera_shared_streams = None
+        self.ffprobe_service = HKffprobe.FfprobeService(os.path.join(self.pluginprefDirectory, "ffprobe_cache.json"), ttl=ffprobe_cache_hours * 3600)
 
         self.debugDeviceid = -3  ## always set this to not on after restart.
 
@@ -410,6 +543,34 @@ class Plugin(indigo.PluginBase):
                     self.logger.warning(f"It would seem that your IP address running HomeKit ({self.HAPServeripaddress}) is not in the advertised IP addresses.  This will likely cause issues, I would suggest you add {self.HAPServeripaddress} to the list of advertised interfaces in advanced config")
         self.logClientConnected = self.pluginPrefs.get("logClientConnected", True)
 
+        ## One zeroconf responder for all bridges, created when first bridge starts
+        self.use_shared_zeroconf = self.pluginPrefs.get("mDNSsharedResponder", False)
+        self.shared_zeroconf = None
+        self.shared_zeroconf_lock = threading.Lock()
+        self.network_addresses = None
+        self.network_check_time = t.time()
+
+        ## All bridges on one event loop thread with one bounded executor, rather than a thread+loop each
+        self.use_bridge_loop = self.pluginPrefs.get("consolidatedBridgeLoop", False)
+        try:
+            self.bridge_loop_workers = int(self.pluginPrefs.get("bridgeLoopWorkers", 8))
+        except:
+            self.bridge_loop_workers = 8
+        self.bridge_loop = None
+        self.bridge_loop_devices = {}  ## bridge uniqueID -> Indigo device id, for restarting a failed bridge
+        self.bridge_restart_failures = {}  ## Indigo device id -> failed starts in a row, for restart backoff
+        ## bridges are built side by side at startup, each with a readiness event
+        self.bridge_startup = BridgeStartup(started=self.plugin_start_time)
+        self.bridge_start_lock = threading.RLock()
+
+        ## Getters read Indigo devices from here, kept hot by deviceUpdated, rather than indigo.devices[] on the event loop
+        try:
+            state_cache_ttl = int(self.pluginPrefs.get("stateCacheTTL", 300))
+        except:
+            state_cache_ttl = 300
+        self.device_catalog = DeviceCatalog()  ## config dialog menus and detectHomeKitType
+        self.state_cache = DeviceStateCache(fetch=lambda deviceid: indigo.devices[deviceid], ttl=state_cache_ttl)
+
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
 
@@ -567,7 +728,9 @@ class Plugin(indigo.PluginBase):
         if int(checkid) not in self.deviceBridgeNumber:
             self.deviceBridgeNumber.append(int(checkid))
 
-        self.update_deviceList()
+        ## at startup every bridge works from the snapshot startup() just took
+        if not self.pluginStartingUp or self.device_snapshot == None:
+            self.update_deviceList()
         self.create_deviceList_internal()
 
         device.replacePluginPropsOnServer(newProps)
@@ -576,9 +739,13 @@ class Plugin(indigo.PluginBase):
         if device.enabled:
             device.updateStateOnServer(key="Status", value="Starting Up")
             device.updateStateImageOnServer(indigo.kStateImageSel.PowerOff)
-            self.startsingleBridge(device, uniqueID=checkid)
-            # def startsingleBridge(self, device, uniqueID):
+            if self.pluginStartingUp:
+                ## built on the startup pool alongside the other bridges, runConcurrentThread waits on it
+                self.bridge_startup.submit(device.id, device.name, functools.partial(self.startsingleBridge, device, uniqueID=checkid))
+            else:
+                self.startsingleBridge(device, uniqueID=checkid)
         else:
+            self.bridge_startup.forget(device.id)
             device.updateStateOnServer(key="Status", value="Disabled")
             device.updateStateImageOnServer(indigo.kStateImageSel.PowerOff)
 
@@ -625,7 +792,10 @@ class Plugin(indigo.PluginBase):
                             drivertobedeleted = driver
                             self.logger.debug(f"Found Driver to stop Driver Id: {driver.indigodeviceid}")
                             try:
-                                driver.stop()
+                                if self.bridge_loop != None:
+                                    self.bridge_loop.stop_driver(driver)
+                                else:
+                                    driver.stop()
                             except RuntimeError:
                                 self.logger.debug("Expected when restarting as Daemon threads already closed")
                                 pass
@@ -670,15 +840,11 @@ class Plugin(indigo.PluginBase):
                         except ValueError:
                             bridgeID = 99
                         if bridgeID == checkid:  ## Current shutting down Bridge ID number
-                            if device.id in self.device_list_internal_idonly:
+                            if device.id in self.device_list_internal:
                                 # It's one we care about
-                                checkindex = next((i for i, item in enumerate(self.device_list_internal) if item["deviceid"] == device.id), None)
-                                if checkindex != None:
-                                    self.logger.debug("Removing item:{}".format(self.device_list_internal[checkindex]))
-                                    del self.device_list_internal[checkindex]
-                                    # it should be in this below list as should match above only containing IDs
-                                    if device.id in self.device_list_internal_idonly:
-                                        self.device_list_internal_idonly.remove(device.id)
+                                removed_item = self.device_list_internal.remove(device.id)
+                                if removed_item != None:
+                                    self.logger.debug("Removing item:{}".format(removed_item))
                                     if device.id in self.running_deviceids:
                                         self.running_deviceids.remove(device.id)
                     except:
@@ -740,14 +906,16 @@ class Plugin(indigo.PluginBase):
     def runConcurrentThread(self):
         # Periodically check to see that the subscription hasn't expired and that the reflector is still working.
         try:
-            self.sleep(1)
-            # move below to individual deviceStart as part of now major refactoring to multiple bridges.
-            # self.startBridge()
+            ## wait for every bridge to be advertised rather than a fixed time, self.sleep so a stop still gets through
+            deadline = t.monotonic() + self.bridge_startup.advertise_timeout + 30
+            while not self.bridge_startup.all_ready() and t.monotonic() < deadline:
+                self.sleep(0.25)
+            if not self.bridge_startup.all_ready():
+                self.logger.info(f"Not all Bridges started in time: {self.bridge_startup}")
             if len(self.listofenabledcameras) > 0:
                 self.logger.debug("Camera Accessory Found, starting single thread to manage images.")
                 self.start_CameraSnapshots()
 
-            self.sleep(5)
             self.pluginStartingUp = False
             self.logger.info('A total of {} devices are currently selected to be published to HomeKit'.format(self.count))
             self.logger.info("{} Home Kit Accessories are now Started.".format(self.runningAccessoryCount))
@@ -756,16 +924,20 @@ class Plugin(indigo.PluginBase):
                 self.logger.info('Given this difference, please review devices by Menu Item, Show Device Publications & Identity Devices Running for more information.')
                 self.logger.info("See Troubleshooting Menu items 1,2 and 3 from Plugin Menu for further aid")
 
-            self.sleep(10)
-
             while True:
                 self.sleep(5)
+                if self.shared_zeroconf != None and t.time() - self.network_check_time > 60:
+                    self.network_check_time = t.time()
+                    self.check_network_change()
 
         except self.StopThread:
             ## stop the homekit drivers
             for driver in self.driver_multiple:
                 if driver != None:
-                    driver.stop()
+                    if self.bridge_loop != None:
+                        self.bridge_loop.stop_driver(driver)
+                    else:
+                        driver.stop()
             for bridge in self.bridge_multiple:
                 if bridge != None:
                     bridge.stop()
@@ -775,6 +947,9 @@ class Plugin(indigo.PluginBase):
                     self.logger.debug("{} Thread is still alive. Timeout occured. Killing.".format(threads.name))
                     self.logger.info("Restarting Plugin as thread not behaving.")
                     self.restartPlugin()
+            if self.bridge_loop != None:
+                self.bridge_loop.shutdown()
+                self.bridge_loop = None
             self.logger.info("Completing full Bridge Shutdown ...")
 
         except:
@@ -782,7 +957,10 @@ class Plugin(indigo.PluginBase):
             ## stop the homekit driver
             for driver in self.driver_multiple:
                 if driver != None:
-                    driver.stop()
+                    if self.bridge_loop != None:
+                        self.bridge_loop.stop_driver(driver)
+                    else:
+                        driver.stop()
             for bridge in self.bridge_multiple:
                 if bridge != None:
                     bridge.stop()
@@ -792,6 +970,9 @@ class Plugin(indigo.PluginBase):
                     self.logger.debug("{} Thread is still alive. Timeout occured. Killing.".format(threads.name))
                     self.logger.info("Restarting Plugin as thread not behaving.")
                     self.restartPlugin()
+            if self.bridge_loop != None:
+                self.bridge_loop.shutdown()
+                self.bridge_loop = None
             self.logger.info("Completing full Bridge Shutdown ...")
 
             self.logger.info("Completing full Bridge(s) Shutdown...")
@@ -806,100 +987,23 @@ class Plugin(indigo.PluginBase):
         self.logger.debug("create Device List Internal called")
         #  ? Can't delete list as everydevice startup
         # self.device_list_internal = []
-        # self.device_list_internal_idonly = []
 
+        ## records come from update_deviceList's snapshot, only ids published since then are looked up
         for item in self.device_list:
             try:
-                # self.logger.debug("{}".format(item))
-                ## just a list of item numbers all goodies stored in deviceProps
-                device = self.return_deviceorAG(item)  # indigo.devices[item]
-                if device == None:
-                    self.logger.error("Error with this device ID {}.  Skipping.".format(item))
-                    continue
-                device_props = dict(device.pluginProps)
-                devicename = device_props.get("homekit-name", "")
-                deviceType = device_props.get("HomeKit_deviceSubtype", "")
-                deviceSensor = device_props.get("HomeKit_deviceSensor","")
-                # Move to subtype reflecting plugins belief as to type of Accessory
-                # Currently Lightbulb can reflect Lightbulb_switch, HueLightBulb and now ColorTempLightBulb
-                # May be others eg. Fan -- I should look at.  Again this subtype reflects the HK Accessory plugin creates
-                # Change Subtype to reflect this and then do not check again.
-                if str(deviceType) == "LightBulb":
-                    supportsRGB = False  ## Defaulting to lamp model
-                    supportsWhiteTemperature = False
-                    if hasattr(device, "supportsRGB"):
-                        supportsRGB = device.supportsRGB
-                    if hasattr(device,"supportsWhiteTemperature"):
-                        supportsWhiteTemperature = device.supportsWhiteTemperature
-                    if supportsRGB and supportsWhiteTemperature:
-                        deviceType = "ColorTempLightBulb"  ## Modify the internal list subtype
-                    elif supportsRGB and not supportsWhiteTemperature:
-                        deviceType = "HueLightBulb"
-                    elif "brightnessLevel" in device.states and "brightness" in dir(device):
-                        deviceType = "LightBulb"   ## Dimmer variety
-                    elif type(device) == indigo.DimmerDevice:
-                        deviceType = "LightBulb"  ## Dimmer variety
-                    else:
-                        ## simple switch
-                        deviceType = "LightBulb_switch"
-                    if self.debug1:
-                        self.logger.debug("LightBulb Device Found and assessed.  Accessory will be a {} type of LightBulb".format(deviceType))
-                if str(deviceType) == "Fan":
-                    if type(device) == indigo.SpeedControlDevice:
-                        deviceType = "Fan"
-                    elif "brightnessLevel" in device.states:
-                        deviceType = "Fan"
-                    else:
-                        deviceType = "Fan_switch"
-                devicesensor = device_props.get("HomeKit_deviceSensor", "")
-                try:
-                    deviceBridgeID = int(device_props.get("HomeKit_bridgeUniqueID", 99)  )
-                except ValueError:
-                    deviceBridgeID = 99
-                if type(device) == indigo.ActionGroup:
-                    devicemodel = "Action Group"
-                    manufacturerName = "Indigo Domotics"
-                else:
-                    if device.protocol == indigo.kProtocol.ZWave:
-                        devicemodel = device.ownerProps.get("zwModelName", "Zwave Model")
-                    else:
-                        devicemodel = device.model
-
-                    if device.pluginId == "com.perceptiveautomation.indigoplugin.devicecollection":
-                        manufacturerName = "Indigo Domotics"
-                    elif "manufacturerName" in device.ownerProps:
-                        manufacturerName = device.ownerProps["manufacturerName"]
-                    elif "manufactureName" in device.ownerProps:
-                        manufacturerName = device.ownerProps["manufactureName"]
-                    else:
-                        if device.protocol == indigo.kProtocol.ZWave:
-                            manufacturerName = device.ownerProps.get("zwManufactureName", "Zwave")
-                        # elif
-                        else:
-                            manufacturerName = device.pluginId  ## truncate device name...device.pluginId
-                if self.debug1:
-                    self.logger.debug("Device: {},  ID: {}  Model: {} Type: {}  Sensor  {}   ManufacturerName: {}".format(devicename, item, devicemodel, deviceType, devicesensor, manufacturerName))
+                record = self.device_snapshot.get(item)
+                if record == None:
+                    device = self.return_deviceorAG(item)  # indigo.devices[item]
+                    if device == None:
+                        self.logger.error("Error with this device ID {}.  Skipping.".format(item))
+                        continue
+                    record = HKDeviceSnapshot.record(device, self.debug1)
+                    self.device_snapshot[item] = record
                 # self.logger.debug("DeviceBridge Found ={}, and contents of self.deviceBridgeNumber {}".format(deviceBridgeID, self.deviceBridgeNumber))
-
-                ## santise names ## max length of all = 64
-                devicename = HKutils.cleanup_name_for_homekit(devicename)
-                devicemodel = HKutils.cleanup_name_for_homekit(devicemodel)
-                manufacturerName = HKutils.cleanup_name_for_homekit(manufacturerName)
-
-                if deviceBridgeID != 99 and int(deviceBridgeID) in self.deviceBridgeNumber:
-                    checkexists = next((i for i, itemtocheck in enumerate(self.device_list_internal) if itemtocheck["deviceid"] == item), None)
-                    if checkexists == None:  ## remove those devices that don't have bridge device ID, or arent started
+                if record.bridgeID != 99 and record.bridgeID in self.deviceBridgeNumber:
+                    if int(item) not in self.device_list_internal:  ## remove those devices that don't have bridge device ID, or arent started
                         ## only add item if doesn't exist
-                        self.device_list_internal.append({"deviceid": int(item),
-                                                          "devicename": devicename,
-                                                          "accessory": None,
-                                                          "aid": int(item),
-                                                          "subtype": deviceType,
-                                                          "bridgeID": int(deviceBridgeID),
-                                                          "devicemodel": devicemodel,
-                                                          "devicesensor": devicesensor,
-                                                          "manufacturername": manufacturerName})
-                        self.device_list_internal_idonly.append(int(item))
+                        self.device_list_internal.append(record.entry())
             except:
                 self.logger.exception("Caught Exception with device_list:  Hopefully still adding other devices..")
 
@@ -910,12 +1014,17 @@ class Plugin(indigo.PluginBase):
         try:
             extend_device_list = []
             self.logger.debug(f"get_bridge_multiple called and self.device_list_internal length {len(self.device_list_internal)}")
-            for item in self.device_list_internal:
+            ## warm the getter cache in the background before HomeKit starts asking
+            self.state_cache.prefetch(int(item["deviceid"]) for item in self.device_list_internal.for_bridge(bridgenumber))
+            for item in self.device_list_internal.for_bridge(bridgenumber):
                 if int(item["bridgeID"]) == int(bridgenumber):
                     # self.logger.info("Matching Bridge Found setting up Accessory.")
                     # self.sleep(0.01)
                     self.logger.debug(f"Item :{item} exisits for this bridge {bridge}")
-                    indigodevice = self.return_deviceorAG(item["deviceid"])
+                    if int(item["deviceid"]) in self.state_cache:
+                        indigodevice = self.state_cache.get(int(item["deviceid"]))
+                    else:
+                        indigodevice = self.return_deviceorAG(item["deviceid"])
                     deviceAID = int(str(bridgenumber) + str(item["deviceid"]))
                     if self.debug1:
                         self.logger.debug("Adding Accessory Name: {},  ID  {} , Type: {}".format(item['devicename'], deviceAID, item['subtype']))
@@ -999,7 +1108,6 @@ class Plugin(indigo.PluginBase):
                                                        "manufacturername": "Blue Iris Linked"
                                                        }
                                                       )
-                            self.device_list_internal_idonly.append(int(device_add_id))
                     elif item['subtype'] == "SecuritySpyCamera":
                         cameraoptions = self.get_CameraOptions(item["deviceid"])
                         if cameraoptions == None:
@@ -1028,7 +1136,6 @@ class Plugin(indigo.PluginBase):
                                                        "manufacturername": "Security Spy Linked"
                                                        }
                                                       )
-                            self.device_list_internal_idonly.append(int(device_add_id))
                     elif item['subtype'] == "Valve":
                         accessory = HomeKitDevices.Valve(driver, self, item["deviceid"], item['devicename'], aid=deviceAID)
                     elif item['subtype'] == "Irrigation":
@@ -1054,7 +1161,7 @@ class Plugin(indigo.PluginBase):
 
                     # self.runningAccessoryCount = self.runningAccessoryCount +1
                     bridge.set_info_service(firmware_revision=firmware_version, manufacturer="Indigo " + self.pluginIndigoVersion, model="HomeKitLink Bridge " + str(bridgenumber), serial_number=str(bridgenumber) + "1244")
-            self.device_list_internal = self.device_list_internal + extend_device_list
+            self.device_list_internal.extend(extend_device_list)
 
             # self.logger.debug("Self.Device_list_internal:\n\n{}\n".format(self.device_list_internal))
             return bridge
@@ -1080,9 +1187,10 @@ class Plugin(indigo.PluginBase):
         # except TypeError as e:
         #     raise Exception("I'm not in a good shape") from e
 
-        if self.cameraSnapShots.is_alive() == False:
-            self.logger.info("Camera Thread is being spooled up to manage camera images")
-            self.cameraSnapShots.start()
+        with self.bridge_start_lock:  ## bridges starting side by side may all ask
+            if self.cameraSnapShots.is_alive() == False and self.cameraSnapShots.ident == None:
+                self.logger.info("Camera Thread is being spooled up to manage camera images")
+                self.cameraSnapShots.start()
 
     def thread_cameraSnapShots(self):
         ## with cameras open constantly pulling images and with my example of 21 enabled cameras getting now peeak CPU of about 9-10%
@@ -1118,219 +1226,48 @@ class Plugin(indigo.PluginBase):
                 if self.debug7:
                     self.logger.debug(f"{CameraName} ---------Using Snapshot Image {snapshot_path}")
                 shutil.copy(snapshot_path, path)
+                with open(snapshot_path, 'rb') as f:
+                    self.snapshot_store.set_default(CameraName, f.read())
                 if self.debug7:
                     self.logger.debug("Startup Refresh Snapshots images to Default for Camera: {}".format(path))
 
-            # Probe all camera streams in background (debug-level output)
-            self._run_ffprobe(debug_only=True)
-            session = requests.Session()
-            cameracheck = {}
+            self.start_camera_warm_pool()
+            if self.camera_shared_streams_enabled and self.camera_shared_streams == None:
+                self.camera_shared_streams = SharedStreams(str(self.ffmpeg_command_line))
+                self.logger.info("Camera shared streams enabled, viewers of the same camera share one ffmpeg source.")
+            # Probe all camera streams in background (debug-level output), own thread so snapshots aren't held up
+            threading.Thread(target=self._run_ffprobe, kwargs={"debug_only": True}, name="ffprobe", daemon=True).start()
+            ## downloads themselves happen in SnapshotFetcher - parallel, single-flight and backoff per camera
+            ## this thread only hands requests over, so no one camera can hold up the others
+            if self.snapshot_fetcher == None:
+                self.snapshot_fetcher = HKSnapshotFetcher.SnapshotFetcher(self.cameraimagePath, store=self.snapshot_store, write_to_disk=self.camera_snapshots_to_disk,
+                                                        max_workers=self.camera_fetch_workers, debug=self.debug7,
+                                                        derive_variants=self.camera_snapshot_variants)
             while True:
                 try:
-                    self.sleep(0.05)  ## this made huge difference to CPU... would think would block below..
-                    # self.listofenabledcameras
                     (cameraRequested, image_width) = self.camera_snapShot_Requested_que.get(block=True, timeout=int(self.camera_passive_time * 60))  ## blocks here
                     ## use tuple for que
                     if self.debug7:
                         self.logger.debug("Got request Image for this camera {} & currently {} items in que".format(cameraRequested, self.camera_snapShot_Requested_que.qsize()))
-## Download as requested.
+                    self.snapshot_fetcher.debug = self.debug7
                     for camera in self.listofenabledcameras:
-                        if "BI_name" in camera:
-                            # self.logger.info("cameraREquested:{}  and canName:{}".format(cameraRequested, camera["BI_name"]))
-                            if camera["BI_name"] == cameraRequested:
-                                if self.debug7:
-                                    self.logger.debug("Found matching Camera {} = {}".format(camera["BI_name"], cameraRequested))
-
-                                # add time check for slowing down downloading.
-                                # remember timing of each image for each camera
-                                # currently set to 30 seconds - is plugin thread - so may make manually adjustable
-
-                                if camera["BI_name"] in cameracheck:  # key in dict
-                                    timecheck = cameracheck[cameraRequested]  # requested=BI_name here ##value
-                                    if self.debug7:
-                                        self.logger.debug("Found Camera name:{} in camera check with timevalue:{}".format(cameraRequested, timecheck))
-                                    if t.time() - timecheck < int(self.camera_refresh_max_time):  ## Plugin Config setting
-                                        if self.debug7:
-                                            self.logger.debug(" Skipping update as to soon, requested at timecheck difference {}".format(t.time() - timecheck))
-                                        break
-                                        # dont update timing
-                                else:
-                                    # cameracheck[cameraRequested] = t.time() ## new set the time and continue
-                                    if self.debug7:
-                                        self.logger.debug("Update Time for Camera {} to {}".format(cameraRequested, t.time()))
-
-                                cameracheck[cameraRequested] = t.time()
-                                camName = camera["BI_name"]
-                                theURL = camera["BI_imageURL"] + "?w=" + str(image_width)
-                                username = camera["BI_username"]
-                                password = camera["BI_password"]
-                                start = t.time()
-                                path = self.cameraimagePath + '/' + camName + '.jpg'
-                                if self.debug7:
-                                    self.logger.debug("{}".format(path))
-                                # r = r.get(theURL, auth=(str(username), str(password)), stream=True, timeout=10)
-                                r = session.get(theURL, auth=(str(username), str(password)), stream=True, timeout=10)
-                                # with open(path,"wb") as f:
-                                #     f.write(r.content)
-                                #     f.close()
-
-                                if r.status_code == 200:
-                                    with open(path, 'wb') as f:
-                                        for chunk in r.iter_content(1024):
-                                            f.write(chunk)
-                                            if t.time() > (start + 10):
-                                                self.logger.debug(u' Download Image Taking to long.  Aborted.')
-                                                break
-                                else:
-                                    self.logger.debug("Camera Unavailable returning, Status Code:{}".format(r.status_code))
-                                    self.logger.debug("Will pause downloading thread here for a few seconds")
-                                    self.sleep(3)
-                                if self.debug7:
-                                    self.logger.debug("Downloaded Image for {}, with URL \n{}".format(camName, theURL))
-                        elif "SS_name" in camera:
-                            # self.logger.info("cameraREquested:{}  and canName:{}".format(cameraRequested, camera["BI_name"]))
-                            if camera["SS_name"] == cameraRequested:
-                                if self.debug7:
-                                    self.logger.debug("Found matching Camera {} = {}".format(camera["SS_name"], cameraRequested))
-
-                                # add time check for slowing down downloading.
-                                # remember timing of each image for each camera
-                                # currently set to 30 seconds - is plugin thread - so may make manually adjustable
-
-                                if camera["SS_name"] in cameracheck:  # key in dict
-                                    timecheck = cameracheck[cameraRequested]  # requested=BI_name here ##value
-                                    if self.debug7:
-                                        self.logger.debug("Found Camera name:{} in camera check with timevalue:{}".format(cameraRequested, timecheck))
-                                    if t.time() - timecheck < 30:  ## 30 seconds update
-                                        if self.debug7:
-                                            self.logger.debug(" Skipping update as to soon, requested at timecheck difference {}".format(t.time() - timecheck))
-                                        break
-                                        # dont update timing
-                                else:
-                                    # cameracheck[cameraRequested] = t.time() ## new set the time and continue
-                                    if self.debug7:
-                                        self.logger.debug("Update Time for Camera {} to {}".format(cameraRequested, t.time()))
-
-                                cameracheck[cameraRequested] = t.time()
-                                camName = camera["SS_name"]
-                                start = t.time()
-                                path = self.cameraimagePath + '/' + camName + '.jpg'
-                                if self.debug7:
-                                    self.logger.debug("{}".format(path))
-
-                                if 'auth=' in camera["SS_imageURL"]:
-                                    theURL = camera['SS_imageURL']
-
-                                    parsed_theURL = urllib.parse.urlparse(theURL)
-                                    if self.debug7:
-                                        self.logger.debug(f"Parsed URL {parsed_theURL}")
-                                    params_theURL = urllib.parse.parse_qs(parsed_theURL.query)
-                                    if self.debug7:
-                                        self.logger.debug(f"Parsed query {params_theURL}")
-                                    # Update Width
-                                    params_theURL['width'] = [str(image_width)]
-                                    ## Remove Height - hopefully auto adjusts aspect
-                                    params_theURL.pop('height', None)
-                                    new_query_theURL = urllib.parse.urlencode(params_theURL, doseq=True)
-                                    new_url = urllib.parse.urlunparse((parsed_theURL.scheme, parsed_theURL.netloc, parsed_theURL.path,
-                                                                       parsed_theURL.params, new_query_theURL, parsed_theURL.fragment))
-                                    if self.debug7:
-                                        self.logger.debug(f"Using Auth for Camera Image.  {new_url}")
-                                    r = session.get(new_url, stream=True, timeout=10)
-                                else:
-                                    theURL = camera["SS_imageURL"] + "&width=" + str(image_width)
-                                    username = camera["SS_username"]
-                                    password = camera["SS_password"]
-                                    r = session.get(theURL, auth=(str(username), str(password)), stream=True,
-                                                    timeout=10)
-
-
-                                # r = r.get(theURL, auth=(str(username), str(password)), stream=True, timeout=10)
-                              #  r = session.get(theURL, auth=(str(username), str(password)), stream=True, timeout=10)
-                                # with open(path,"wb") as f:
-                                #     f.write(r.content)
-                                #     f.close()
-
-
-                                if r.status_code == 200:
-                                    with open(path, 'wb') as f:
-                                        for chunk in r.iter_content(1024):
-                                            f.write(chunk)
-                                            if t.time() > (start + 10):
-                                                self.logger.debug(u' Download Image Taking to long.  Aborted.')
-                                                break
-                                else:
-                                    self.logger.debug("Error Downloading Camera Snashot, given Status Code:{}".format(r.status_code))
-                                    self.logger.debug("Quite likely camera or Security Spy offline.  Having a slight pause for effect.")
-                                    self.sleep(3)
-                                if self.debug7:
-                                    self.logger.debug("Downloaded Image for {}, with URL \n{}".format(camName, theURL))
+                        if HKSnapshotFetcher.camera_name(camera) == cameraRequested:
+                            ## Blue Iris uses the Plugin Config setting, SecuritySpy has always been 30 seconds
+                            min_interval = int(self.camera_refresh_max_time) if "BI_name" in camera else 30
+                            self.snapshot_fetcher.request(camera, image_width, min_interval=min_interval)
+                            break
                 except Empty:
-                    ## Nothing downloaded for an hour update all images
+                    ## Nothing requested for a while update all images
                     if self.debug7:
                         self.logger.debug(f"Nothing in Camera Que for {int(self.camera_passive_time * 60)} seconds.  Updating Images...")
                     for camera in self.listofenabledcameras:
                         try:
-                            if self.debug7:
-                                self.logger.debug(f"Updating Images for {camera}")
-                            image_width = self.camera_passive_width
-                            if "BI_name" in camera:
-                                # self.logger.info("cameraREquested:{}  and canName:{}".format(cameraRequested, camera["BI_name"]))
-                                cameraRequested = camera["BI_name"]
-                                cameracheck[cameraRequested] = t.time()
-                                camName = camera["BI_name"]
-                                theURL = camera["BI_imageURL"] + "?w=" + str(image_width)
-                                username = camera["BI_username"]
-                                password = camera["BI_password"]
-                                start = t.time()
-                                path = self.cameraimagePath + '/' + camName + '.jpg'
-                                if self.debug7:
-                                    self.logger.debug("{}".format(path))
-                                r = session.get(theURL, auth=(str(username), str(password)), stream=True, timeout=10)
-                                if r.status_code == 200:
-                                    with open(path, 'wb') as f:
-                                        for chunk in r.iter_content(1024):
-                                            f.write(chunk)
-                                            if t.time() > (start + 10):
-                                                self.logger.debug(u' Download Image Taking to long.  Aborted.')
-                                                break
-                                else:
-                                    self.logger.debug("Camera Unavailable returning, Status Code:{}".format(r.status_code))
-                                    self.logger.debug("Will pause downloading thread here for a few seconds")
-                                    self.sleep(3)
-                                if self.debug7:
-                                    self.logger.debug("Downloaded Image for {}, with URL \n{}".format(camName, theURL))
-
-                            elif "SS_name" in camera:
-                                cameracheck[cameraRequested] = t.time()
-                                cameraRequested = camera["SS_name"]
-                                camName = camera["SS_name"]
-                                theURL = camera["SS_imageURL"] + "&width=" + str(image_width)
-                                username = camera["SS_username"]
-                                password = camera["SS_password"]
-                                start = t.time()
-                                path = self.cameraimagePath + '/' + camName + '.jpg'
-                                if self.debug7:
-                                    self.logger.debug("{}".format(path))
-                                r = session.get(theURL, auth=(str(username), str(password)), stream=True, timeout=10)
-                                if r.status_code == 200:
-                                    with open(path, 'wb') as f:
-                                        for chunk in r.iter_content(1024):
-                                            f.write(chunk)
-                                            if t.time() > (start + 10):
-                                                self.logger.debug(u' Download Image Taking to long.  Aborted.')
-                                                break
-                                else:
-                                    self.logger.debug("Error Downloading Camera Snashot, given Status Code:{}".format(r.status_code))
-                                    self.logger.debug("Quite likely camera or Security Spy offline.  Having a slight pause for effect.")
-                                    self.sleep(3)
-                                if self.debug7:
-                                    self.logger.debug("Downloaded Image for {}, with URL \n{}".format(camName, theURL))
+                            self.snapshot_fetcher.request(camera, self.camera_passive_width)
                         except:
                             self.logger.debug("Exception Caught with one camera",exc_info=True)
-                            pass
                     self.sleep(0.1)
-
+                except self.StopThread:
+                    raise
                 except:
                     self.logger.debug("exception in camera snapshots", exc_info=True)
         except self.StopThread:
@@ -1342,14 +1279,17 @@ class Plugin(indigo.PluginBase):
     ####################################################################################################################
 
     def startsingleBridge(self, device, uniqueID):
+        ## Returns the bridge's driver, None if it failed.  Bridges start side by side at startup (HKBridgeStartup)
+        ## so this works on its own driver and bridge, shared lists, ports and loop are only touched holding bridge_start_lock
         try:
             self.logger.debug(f"Attempting to start a single Bridge:  Bridge {device.name} and ID {uniqueID}")
-            ## Use list syntax -1 to use the last item added to list...
-            ## Should allow lists to be added/removed and restarted....
             persist_file_location = os.path.join(self.pluginprefDirectory, 'busy_home_' + str(uniqueID) + '.state')
             # add port in use check
             # currentPortNumber - has now become starting portNumber - shoudl
-            nextport = int(HKutils._find_next_available_port(self.startingPortNumber, self.portsinUse))
+            with self.bridge_start_lock:
+                nextport = int(HKutils._find_next_available_port(self.startingPortNumber, self.portsinUse))
+                self.portsinUse.add(nextport)
+                bridge_loop = self.get_bridge_loop()
             self.logger.debug("Next Port available:{}".format(nextport))
            # self.zc = IndigoZeroconf(ip_version=self.select_ip_version, interfaces=self.select_interfaces, apple_p2p=self.apple_2p2)
            # self.logger.debug(f"\nmDNS Self.zc Setup: {self.select_interfaces=} {self.select_ip_version=} {self.apple_2p2=}")
@@ -1366,23 +1306,34 @@ class Plugin(indigo.PluginBase):
                 f"\n  zeroconf_interfaces           = {self.select_interfaces}"
             )
             #self.driver_multiple.append(HomeDriver(indigodeviceid=str(uniqueID),iid_storage=self.plugin_iidstorage, port=int(nextport), persist_file=persist_file_location, zeroconf_server=f"HomeKitLinkSiri-{uniqueID}-hap.local" , interface_choice=self.select_ip_version, zeroconf_interfaces=self.select_interfaces, address=self.HAPServeripaddress, advertised_address=self.HAPAdvertised_ipaddress))
-            self.driver_multiple.append(
-                HomeDriver(indigodeviceid=str(uniqueID), iid_storage=self.plugin_iidstorage, port=int(nextport),
+            driver = HomeDriver(indigodeviceid=str(uniqueID), iid_storage=self.plugin_iidstorage, port=int(nextport),
                            persist_file=persist_file_location, zeroconf_server=f"HomeKitLinkSiri-{uniqueID}-hap.local",
                            interface_choice=self.select_ip_version, zeroconf_interfaces=self.select_interfaces,
                            listen_address=effective_listen_address, address=self.HAPServeripaddress,
-                           advertised_address=self.HAPAdvertised_ipaddress))
+                           advertised_address=self.HAPAdvertised_ipaddress,
+                           async_zeroconf_instance=self.get_shared_zeroconf(),
+                           loop=bridge_loop)
             #self.driver_multiple.append(HomeDriver(indigodeviceid=str(uniqueID),iid_storage=self.plugin_iidstorage, port=int(nextport), persist_file=persist_file_location, zeroconf_server=f"HomeKitLinkSiri-{uniqueID}-hap.local", async_zeroconf_instance=self.async_zeroconf_instance, address=self.HAPServeripaddress, advertised_address=self.HAPAdvertised_ipaddress))
            #self.driver_multiple.append(HomeDriver(indigodeviceid=str(uniqueID), iid_storage=self.plugin_iidstorage, port=int(nextport), persist_file=persist_file_location))
 
-            self.portsinUse.add(nextport)
             self.logger.debug("Sets of Ports Currently in Use: {}".format(self.portsinUse))
-            self.bridge_multiple.append(HomeBridge(driver=self.driver_multiple[-1], plugin=self, indigodeviceid=uniqueID, display_name='HomeKitLink Bridge ' + str(uniqueID), iid_manager=HomeIIDManager(self.plugin_iidstorage, self.debug9)))
-            self.driver_multiple[-1].add_accessory(accessory=self.get_bridge_multiple(self.driver_multiple[-1], self.bridge_multiple[-1], uniqueID))
-            self.driverthread_multiple.append(threading.Thread(name=str(uniqueID), target=self.driver_multiple[-1].start, daemon=True))
-            self.driverthread_multiple[-1].start()
+            bridge = HomeBridge(driver=driver, plugin=self, indigodeviceid=uniqueID, display_name='HomeKitLink Bridge ' + str(uniqueID), iid_manager=HomeIIDManager(self.plugin_iidstorage, self.debug9))
+            with self.bridge_start_lock:
+                self.driver_multiple.append(driver)
+                self.bridge_multiple.append(bridge)
+            driver.add_accessory(accessory=self.get_bridge_multiple(driver, bridge, uniqueID))
+            ## all accessories for this bridge have their IIDs now, write them out once
+            self.plugin_iidstorage.flush()
+            if bridge_loop != None:
+                self.bridge_loop_devices[str(uniqueID)] = device.id
+                self.bridge_loop.start_driver(driver)
+            else:
+                driverthread = threading.Thread(name=str(uniqueID), target=driver.start, daemon=True)
+                with self.bridge_start_lock:
+                    self.driverthread_multiple.append(driverthread)
+                driverthread.start()
 
-            returned = self.bridge_multiple[-1].setup_message()
+            returned = bridge.setup_message()
             self.logger.debug("Bridge {} Setup and Running.".format(uniqueID))
             updatedStates = [
                 {'key': 'pincode', 'value': returned[1]},
@@ -1391,15 +1342,16 @@ class Plugin(indigo.PluginBase):
             ]
             device.updateStatesOnServer(updatedStates)
             device.updateStateImageOnServer(indigo.kStateImageSel.PowerOn)
-            self.sleep(0.5)
             if len(self.listofenabledcameras) > 0:
                 self.logger.debug("Camera Accessory Found, checking single thread is alive to manage images.")
                 self.start_CameraSnapshots()
+            return driver
         except:
             self.logger.exception("Exception in single Bridge Startup")
             device.updateStatesOnServer(key="status", value="Error")
             device.updateStateImageOnServer(indigo.kStateImageSel.PowerOff)
             device.setErrorStateOnServer("Failure to Start Bridge.")
+            return None
 
     # Get XML child element from dom
     # Thanks Colorado4Wheeler - https://github.com/Colorado4Wheeler/HomeKit-Bridge/blob/master/EPS%20HomeKit%20Bridge.indigoPlugin/Contents/Server%20Plugin/plugin.py
@@ -1648,32 +1600,13 @@ class Plugin(indigo.PluginBase):
             return None  ## move to Camera Init
 
     def update_deviceList(self):
-        self.count = 0
-        listid = []
-        for dev in indigo.devices:
-            if dev.pluginProps.get("HomeKit_publishDevice", False):
-                try:
-                    self.count += 1
-                    if (dev.id in listid) == False:
-                        listid.append(dev.id)
-                        self.device_list.add(dev.id)
-                        # self.logger.debug(u"... '{}' published".format(dev.name))
-                    else:
-                        self.logger.error("Duplicate ID Skipped")
-                except:
-                    self.logger.exception("Startup Publish.")
-        for dev in indigo.actionGroups:
-            if dev.pluginProps.get("HomeKit_publishDevice", False):
-                try:
-                    self.count += 1
-                    if (dev.id in listid) == False:
-                        listid.append(dev.id)
-                        self.device_list.add(dev.id)
-                        # self.logger.debug(u"... Action Group: '{}' published".format(dev.name))
-                    else:
-                        self.logger.error("Duplicate ID Skipped")
-                except:
-                    self.logger.exception("Startup Publish.")
+        ## one pass over indigo.devices and indigo.actionGroups, create_deviceList_internal works from the same snapshot
+        self.device_snapshot, published, self.count = HKDeviceSnapshot.build(self.debug1)
+        self.device_list.update(published)
+        ## bridges building accessories read the devices from the state cache rather than Indigo
+        for record in self.device_snapshot.values():
+            if type(record.device) != indigo.ActionGroup:
+                self.state_cache.update(record.device)
 
     def _check_cameraDir(self):
         if not os.path.exists(self.pluginprefDirectory):
@@ -1717,11 +1650,128 @@ class Plugin(indigo.PluginBase):
         indigo.devices.subscribeToChanges()
         self.create_deviceList_internal()
 
-        self.plugin_iidstorage = AccessoryIIDStorage(self.pluginId, self.pluginprefDirectory+str("/AccessoryIIDStorage.storage"), self.debug9 )
+        ## sqlite store loads allocations per accessory and only inserts new ones, existing JSON store is migrated on first use
+        if self.pluginPrefs.get("iidStorageBackend", "json") == "sqlite":
+            self.plugin_iidstorage = SqliteAccessoryIIDStorage(self.pluginId, self.pluginprefDirectory+str("/AccessoryIIDStorage.storage"), self.debug9 )
+        else:
+            self.plugin_iidstorage = AccessoryIIDStorage(self.pluginId, self.pluginprefDirectory+str("/AccessoryIIDStorage.storage"), self.debug9 )
         self.plugin_iidstorage.startup()
 
+        ## every enabled bridge gets a readiness event before deviceStartComm starts any of them
+        for device in indigo.devices.iter("self"):
+            if device.enabled:
+                self.bridge_startup.expect(device.id)
+
+        import_timer.uninstall()
+        import_timer.report(self.logger)
+
+    @property
+    def ffmpeg_command_line(self):
+        ## homekitlink_ffmpeg is only imported once a camera needs it
+        if self._ffmpeg_command_line == None:
+            from homekitlink_ffmpeg import get_ffmpeg_binary
+            self._ffmpeg_command_line = get_ffmpeg_binary()
+            self.logger.info(u"{0:<30} {1}".format("FFmpeg :", self._ffmpeg_command_line.replace('\n', '')))
+        return self._ffmpeg_command_line
+
+    def get_bridge_loop(self):
+        ## Returns shared loop for the driver if consolidated mode selected, else None and driver makes its own
+        if not self.use_bridge_loop:
+            return None
+        if self.bridge_loop == None or not self.bridge_loop.thread.is_alive():
+            self.bridge_loop = BridgeLoop(max_workers=self.bridge_loop_workers, on_failure=self.restart_failed_bridge, on_started=self.bridge_started)
+            self.logger.info(f"Running all Bridges on one shared event loop, with {self.bridge_loop_workers} worker threads.")
+        return self.bridge_loop.loop
+
+    def restart_failed_bridge(self, driver):
+        ## Called by BridgeLoop when a single bridge fails to start - restart only that bridge device
+        ## Backs off 4, 8, 16.. seconds between attempts, and gives up after BRIDGE_RESTART_ATTEMPTS in a row
+        try:
+            deviceid = self.bridge_loop_devices.get(str(driver.indigodeviceid))
+            if deviceid == None or deviceid not in indigo.devices:
+                return
+            devicename = indigo.devices[deviceid].name
+            failures = self.bridge_restart_failures.get(deviceid, 0) + 1
+            self.bridge_restart_failures[deviceid] = failures
+            if failures > BRIDGE_RESTART_ATTEMPTS:
+                self.logger.error(f"Bridge {devicename} has failed to start {failures} times in a row.  No longer restarting it, please check its port and network interface settings and restart it manually.")
+                return
+            delay = min(BRIDGE_RESTART_BACKOFF_MAX, 4 * (2 ** (failures - 1)))
+            self.logger.info(f"Restarting Bridge {devicename} after failure {failures} of {BRIDGE_RESTART_ATTEMPTS}, in {delay} seconds.  Other Bridges unaffected.")
+            indigo.device.enable(deviceid, value=False)
+            self.sleep(delay)
+            indigo.device.enable(deviceid, value=True)
+        except:
+            self.logger.debug("Exception restarting failed bridge", exc_info=True)
+
+    def bridge_started(self, driver):
+        ## Called by BridgeLoop once a bridge has started, it gets a fresh set of restart attempts
+        deviceid = self.bridge_loop_devices.get(str(driver.indigodeviceid))
+        if deviceid != None:
+            self.bridge_restart_failures.pop(deviceid, None)
+
+    def get_shared_zeroconf(self):
+        ## Returns shared responder if selected in advanced config, else None and each driver creates its own
+        if not self.use_shared_zeroconf:
+            return None
+        with self.shared_zeroconf_lock:
+            if self.shared_zeroconf == None:
+                self.shared_zeroconf = SharedZeroconfResponder(ip_version=self.select_ip_version, interfaces=self.select_interfaces)
+                self.network_addresses = self._network_address_snapshot()
+                self.logger.info("mDNS: Using one shared Zeroconf responder for all Bridges.")
+        return self.shared_zeroconf
+
+    def _network_address_snapshot(self):
+        addresses = set()
+        try:
+            for adapter in ifaddr.get_adapters():
+                for ip in adapter.ips:
+                    if isinstance(ip.ip, str):
+                        addresses.add(ip.ip)
+        except:
+            self.logger.debug("Exception getting network adapters", exc_info=True)
+        return frozenset(addresses)
+
+    def check_network_change(self):
+        ## If this Mac's addresses changed, re-announce all bridges on the shared responder
+        try:
+            addresses = self._network_address_snapshot()
+            if self.network_addresses != None and addresses != self.network_addresses:
+                self.logger.info("Network change detected, re-announcing all HomeKit Bridges.")
+                self.logger.debug(f"Addresses were {sorted(self.network_addresses)} now {sorted(addresses)}")
+                ## addresses set in advanced config stay as they are, otherwise each bridge takes the new local address
+                refresh_address = self.HAPAdvertised_ipaddress == None and self.HAPServeripaddress == None
+                self.shared_zeroconf.reannounce_all(self.driver_multiple, refresh_address=refresh_address)
+            self.network_addresses = addresses
+        except:
+            self.logger.debug("Exception in check_network_change", exc_info=True)
+
     def shutdown(self):
         self.logger.info("Shutting down HomeKitLink")
+        try:
+            if self.shared_zeroconf != None:
+                self.shared_zeroconf.close()
+                self.shared_zeroconf = None
+        except:
+            self.logger.debug("Exception closing shared Zeroconf", exc_info=True)
+        try:
+            self.state_cache.shutdown()
+            self.bridge_startup.shutdown()
+            if self.snapshot_fetcher != None:
+                self.snapshot_fetcher.shutdown()
+            if self.camera_shared_streams != None:
+                self.camera_shared_streams.shutdown()
+            if homekit_audio_proxy.loaded:
+                homekit_audio_proxy.shutdown_daemon()
+            if self.camera_warm_pool != None:
+                self.camera_warm_pool.shutdown()
+        except:
+            pass
+        try:
+            if self.plugin_iidstorage != None:
+                self.plugin_iidstorage.shutdown()
+        except:
+            self.logger.debug("Exception flushing IID storage at shutdown", exc_info=True)
 
     ### Subscription Changes
     ########################################
@@ -1733,21 +1783,27 @@ class Plugin(indigo.PluginBase):
     The plugin side is doing most of the data checking - but limiting factor would be deviceUpdated catching everything even if could async off
     '''
 
+    ########################################
+    def deviceCreated(self, new_device):
+        super(Plugin, self).deviceCreated(new_device)
+        try:
+            self.device_catalog.updated(new_device)
+        except:
+            self.logger.debug("Exception in deviceCreated", exc_info=True)
+
     ########################################
     def deviceDeleted(self, deleted_device):
         # Watch for any devices that we care about and see if we need to push a change up to HomeKit
         super(Plugin, self).deviceDeleted(deleted_device)
 
         try:
-            if deleted_device.id in self.device_list_internal_idonly:
+            self.state_cache.remove(deleted_device.id)
+            self.device_catalog.remove(deleted_device.id)
+            if deleted_device.id in self.device_list_internal:
                 # It's one we care about
-                checkindex = next((i for i, item in enumerate(self.device_list_internal) if item["deviceid"] == deleted_device.id), None)
-                if checkindex != None:
-                    self.logger.info("Deleting item:{}".format(self.device_list_internal[checkindex]))
-                    del self.device_list_internal[checkindex]
-                    # it should be in this below list as should match above only containing IDs
-                    if deleted_device.id in self.device_list_internal_idonly:
-                        self.device_list_internal_idonly.remove(deleted_device.id)
+                removed_item = self.device_list_internal.remove(deleted_device.id)
+                if removed_item != None:
+                    self.logger.info("Deleting item:{}".format(removed_item))
                 self.logger.error("Device: {} ,just deleted published and has active accessory within Homekit currently (!)".format(deleted_device.name))
                 try:
                     bridgeID = int(deleted_device.pluginProps.get("HomeKit_bridgeUniqueID", 99))
@@ -1775,573 +1831,656 @@ class Plugin(indigo.PluginBase):
 
     ########################################
 
+    def build_deviceUpdated_dispatch(self):
+        ## Table of subtype -> chain of (handler, watched states, watched device attributes)
+        ## Handlers in chain run in order, a handler returning True ends the chain (as the old return statements did)
+        ## "devicesensor" in watched states is swapped for the device's selected sensor state; None watches every state
+        onoff = (self._updated_onoff, ("onOffState",), ())
+        brightness = (self._updated_brightness, ("brightnessLevel",), ())
+        colour = (self._updated_colour, ("redLevel", "greenLevel", "blueLevel", "whiteTemperature", "colorMode"), ())
+        analog_sensor = (self._updated_analog_sensor, ("devicesensor", "batteryLevel"), ())
+        binary_sensor = (self._updated_binary_sensor, ("devicesensor", "batteryLevel"), ())
+        valve = (self._updated_valve, ("onOffState",), ())
+        covering = (self._updated_covering, ("brightnessLevel", "onOffState"), ())
+
+        dispatch = {
+            "Thermostat": ((self._updated_thermostat, ("hvacHeaterIsOn", "hvacCoolerIsOn", "setpointCool", "setpointHeat"), ("temperatures", "hvacMode")), onoff),
+            "Lock": ((self._updated_lock, ("onOffState", "lastChangedVia"), ()), onoff),
+            "Security": ((self._updated_security, None, ()), onoff),
+            "GarageDoor": ((self._updated_garagedoor, ("doorState", "onOffState", "binaryInput1"), ()),),
+            "Linked-DoorBell": ((self._updated_linked_doorbell, ("onOffState",), ()),),
+            "BlueIrisCamera": ((self._updated_bi_camera, ("Motion",), ()), onoff),
+            "SecuritySpyCamera": ((self._updated_ss_camera, ("event_on",), ()), onoff),
+            "Fan": ((self._updated_fan, ("brightnessLevel",), ("speedLevel",)), onoff),
+            "HueLightBulb": (brightness, colour, onoff),
+            "ColorTempLightBulb": (brightness, colour, onoff),
+            "LightBulb": (brightness, onoff),
+        }
+        for subtype in ("TemperatureSensor", "HumiditySensor", "LightSensor"):
+            dispatch[subtype] = (analog_sensor,)
+        for subtype in ("LeakSensor", "OccupancySensor", "SmokeSensor", "ContactSensor", "CarbonMonoxideSensor", "MotionSensor", "CarbonDioxideSensor"):
+            dispatch[subtype] = (binary_sensor, onoff)
+        for subtype in ("Valve", "Irrigation", "Showerhead", "Faucet"):
+            dispatch[subtype] = (valve, onoff)
+        for subtype in ("Blind", "Window", "Door"):
+            dispatch[subtype] = (covering,)
+        ## Anything else - Switch, Outlet, LightBulb_switch, Fan_switch etc. only needs onOffState
+        self.deviceUpdated_default_chain = (onoff,)
+        return dispatch
+
+    def get_deviceUpdated_chain(self, entry):
+        ## Compile once per registry entry - swaps in devicesensor and freezes watched keys
+        cached = self.deviceUpdated_compiled.get(entry["deviceid"])
+        if cached is not None and cached[0] is entry:
+            return cached[1]
+        compiled = []
+        for handler, states, attrs in self.deviceUpdated_dispatch.get(str(entry["subtype"]), self.deviceUpdated_default_chain):
+            if states is not None:
+                states = tuple(entry["devicesensor"] if state == "devicesensor" else state for state in states)
+                states = tuple(state for state in states if state not in ("", None))
+            compiled.append((handler, states, attrs))
+        compiled = tuple(compiled)
+        self.deviceUpdated_compiled[entry["deviceid"]] = (entry, compiled)
+        return compiled
+
     def deviceUpdated(self, original_device, updated_device):
 
         ## Below checks for device in device list and if device updated, then update its states
-        #  Question is whether I send this quickly back to Accessory to 'process' in a async fashion
-        #  May be quicker?  May be less customisable/selectable though, errors in Accessory harder to trace/tend to crash
-        #  Plugin here still will have to receive device updates.. so very marginally checking happening
+        #  Each subtype has a chain of handlers (see build_deviceUpdated_dispatch) which only watch the states they use
+        #  Noisy devices (energy meters, zwave reports etc) that change nothing watched return before any subtype work
         #
 
         try:
             super(Plugin, self).deviceUpdated(original_device, updated_device)
+            self.device_catalog.updated(updated_device)
+
+            if original_device.id in self.device_list_internal:
+                self.state_cache.update(updated_device)
 
             if self.pluginStartingUp:
                 self.logger.debug("Still starting up. Ignoring device update")
                 return
-            if original_device.id not in self.device_list_internal_idonly:
+            entry = self.device_list_internal.get(original_device.id)
+            if entry is None:
                 return
 
             this_is_debug_device = False
-            checkindex = next((i for i, item in enumerate(self.device_list_internal) if item["deviceid"] == original_device.id), None)
+            ## Debug Device Update Found.
+            if self.debugDeviceid == original_device.id:
+                self.logger.warning("{0:=^130}".format(" Device Selected for Logging "))
+                self.logger.warning(f"Original Device States:\n{original_device.states} ")
+                self.logger.warning(f"Updated Device States: \n{updated_device.states} ")
+                this_is_debug_device = True
+
+            original_states = original_device.states
+            updated_states = updated_device.states
+            to_run = []
+            for handler, states, attrs in self.get_deviceUpdated_chain(entry):
+                if states is None:
+                    changed = updated_states != original_states
+                else:
+                    changed = any(updated_states.get(state) != original_states.get(state) for state in states)
+                if not changed and attrs:
+                    changed = any(getattr(updated_device, attr, None) != getattr(original_device, attr, None) for attr in attrs)
+                if changed:
+                    to_run.append(handler)
+
+            if not to_run:
+                if this_is_debug_device:
+                    self.logger.warning("No watched states changed for this device type, nothing to send to HomeKit.")
+                return
 
-            if checkindex != None:
-                if self.debug2:
-                    self.logger.debug("Device Changed that interested in...{}".format(original_device.name))
-                    self.logger.debug("Device Found in Device List. CheckIndex Key Exists :{}".format(checkindex))
+            if self.debug2:
+                self.logger.debug("Device Changed that interested in...{}".format(original_device.name))
+                self.logger.debug("Subtype:{}, and type(original_device):{} & devicesensor:{}".format(entry["subtype"], type(original_device), entry["devicesensor"]))
+                self.logger.debug("Handlers to run: {}".format([handler.__name__ for handler in to_run]))
+
+            for handler in to_run:
+                if handler(entry, original_device, updated_device, this_is_debug_device):
+                    return
+
+        except (AttributeError):
+            self.logger.info(f"HomekitLink Published Device: {original_device.name} caused a Nonetype error, this usually means device, or entire bridge has not correctly started.")
+            self.logger.debug("Caught exception in Device Update", exc_info=True)
+        except:
+            self.logger.debug("Caught exception in Device Update", exc_info=True)
+
+    def _updated_thermostat(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Thermostat: temperatures, hvacMode, heater/cooler and setpoints
+        if self.debug2:
+            self.logger.debug("Found Thermostat Matching Device...")
+        if this_is_debug_device:
+            self.logger.info("Found Thermostat Matching Device...")
+        if hasattr(updated_device, "temperatures"):  ## double check here in
+            if original_device.temperatures != updated_device.temperatures:
+                listtemps = updated_device.temperatures
+                if isinstance(listtemps, list):
+                    temptosend = sum(listtemps) / len(listtemps)  ##average of all values
+                elif isinstance(listtemps, (float, int)):
+                    temptosend = listtemps
+                else:
+                    temptosend = 1.3
                 if self.debug2:
-                    self.logger.debug("Subtype:{}, and type(original_device):{} & devicesensor:{}".format(
-                        self.device_list_internal[checkindex]["subtype"], type(original_device),
-                        self.device_list_internal[checkindex]["devicesensor"]))
-                ## Debug Device Update Found.
-                if self.debugDeviceid == original_device.id:
-                    self.logger.warning("{0:=^130}".format(" Device Selected for Logging "))
-                    self.logger.warning(f"Original Device States:\n{original_device.states} ")
-                    self.logger.warning(f"Updated Device States: \n{updated_device.states} ")
-                    this_is_debug_device = True
-
-                updateddevice_subtype = self.device_list_internal[checkindex]["subtype"]
-
-                if str(updateddevice_subtype) == "Thermostat":
+                    self.logger.debug("Updating Temperature to {}".format(temptosend))
+                if this_is_debug_device:
+                    self.logger.warning("Updating Temperature to {}".format(temptosend))
+                # add conversion for F disable to test TODO big
+                entry["accessory"].set_temperature(HKutils.convert_to_float(temptosend), "current")
+                # entry["accessory"].char_current_temp.set_value(HKutils.convert_to_float(temptosend))
+
+        if hasattr(updated_device, "hvacMode"):  ## double check here in
+            if original_device.hvacMode != updated_device.hvacMode:
+                ## set target mode when hvacMode changes
+                newmode = updated_device.hvacMode
+                listHvacModes = {indigo.kHvacMode.Off: 0,
+                                 indigo.kHvacMode.Heat: 1,
+                                 indigo.kHvacMode.Cool: 2,
+                                 indigo.kHvacMode.HeatCool: 3}
+                homekitModeWished = listHvacModes[newmode]
+                entry["accessory"].char_target_heat_cool.set_value(homekitModeWished)
+
+                ## Mode has been changed need to update target and range for HomeKit
+                if 'setpointCool' in updated_device.states:
+                    setpointcool = updated_device.states['setpointCool']
+                    setpointheat = updated_device.states['setpointHeat']
+                    if updated_device.hvacMode == indigo.kHvacMode.Off:
+                        pass
+                    elif updated_device.hvacMode == indigo.kHvacMode.Heat:
+                        ## set targettemp to setpointHeat
+                        entry["accessory"].set_temperature(HKutils.convert_to_float(setpointheat), "target")
+                    elif updated_device.hvacMode == indigo.kHvacMode.Cool:
+                        ## set targettemp to setpointHeat
+                        entry["accessory"].set_temperature(HKutils.convert_to_float(setpointcool), "target")
+                    elif updated_device.hvacMode == indigo.kHvacMode.HeatCool:
+                        ## set targettemp to setpointHeat
+                        entry["accessory"].set_temperature(HKutils.convert_to_float(setpointcool), "coolthresh")
+                        entry["accessory"].set_temperature(HKutils.convert_to_float(setpointheat), "heatthresh")
+                ## Given mode change also change the current setting depending on heater cooler mode immediately
+                if updated_device.hvacMode == indigo.kHvacMode.Off:
                     if self.debug2:
-                        self.logger.debug("Found Thermostat Matching Device...")
-                    if this_is_debug_device:
-                        self.logger.info("Found Thermostat Matching Device...")
-                    if hasattr(updated_device, "temperatures"):  ## double check here in
-                        if original_device.temperatures != updated_device.temperatures:
-                            listtemps = updated_device.temperatures
-                            if isinstance(listtemps, list):
-                                temptosend = sum(listtemps) / len(listtemps)  ##average of all values
-                            elif isinstance(listtemps, (float, int)):
-                                temptosend = listtemps
-                            else:
-                                temptosend = 1.3
-                            if self.debug2:
-                                self.logger.debug("Updating Temperature to {}".format(temptosend))
-                            if this_is_debug_device:
-                                self.logger.warning("Updating Temperature to {}".format(temptosend))
-                            # add conversion for F disable to test TODO big
-                            self.device_list_internal[checkindex]["accessory"].set_temperature(HKutils.convert_to_float(temptosend), "current")
-                            # self.device_list_internal[checkindex]["accessory"].char_current_temp.set_value(HKutils.convert_to_float(temptosend))
-
-                    if hasattr(updated_device, "hvacMode"):  ## double check here in
-                        if original_device.hvacMode != updated_device.hvacMode:
-                            ## set target mode when hvacMode changes
-                            newmode = updated_device.hvacMode
-                            listHvacModes = {indigo.kHvacMode.Off: 0,
-                                             indigo.kHvacMode.Heat: 1,
-                                             indigo.kHvacMode.Cool: 2,
-                                             indigo.kHvacMode.HeatCool: 3}
-                            homekitModeWished = listHvacModes[newmode]
-                            self.device_list_internal[checkindex]["accessory"].char_target_heat_cool.set_value(homekitModeWished)
-
-                            ## Mode has been changed need to update target and range for HomeKit
-                            if 'setpointCool' in updated_device.states:
-                                setpointcool = updated_device.states['setpointCool']
-                                setpointheat = updated_device.states['setpointHeat']
-                                if updated_device.hvacMode == indigo.kHvacMode.Off:
-                                    pass
-                                elif updated_device.hvacMode == indigo.kHvacMode.Heat:
-                                    ## set targettemp to setpointHeat
-                                    self.device_list_internal[checkindex]["accessory"].set_temperature(HKutils.convert_to_float(setpointheat), "target")
-                                elif updated_device.hvacMode == indigo.kHvacMode.Cool:
-                                    ## set targettemp to setpointHeat
-                                    self.device_list_internal[checkindex]["accessory"].set_temperature(HKutils.convert_to_float(setpointcool), "target")
-                                elif updated_device.hvacMode == indigo.kHvacMode.HeatCool:
-                                    ## set targettemp to setpointHeat
-                                    self.device_list_internal[checkindex]["accessory"].set_temperature(HKutils.convert_to_float(setpointcool), "coolthresh")
-                                    self.device_list_internal[checkindex]["accessory"].set_temperature(HKutils.convert_to_float(setpointheat), "heatthresh")
-                            ## Given mode change also change the current setting depending on heater cooler mode immediately
-                            if updated_device.hvacMode == indigo.kHvacMode.Off:
-                                if self.debug2:
-                                    self.logger.debug(f"hvacMode == Off")
-                                self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(0)
-                            elif updated_device.hvacMode == indigo.kHvacMode.Heat:
-                                ## set targettemp to setpointHeat
-                                if self.debug2:
-                                    self.logger.debug(f"hvacMode == Heat and current Heater is {updated_device.states['hvacHeaterIsOn']}")
-                                if 'hvacHeaterIsOn' in updated_device.states:
-                                    if updated_device.states["hvacHeaterIsOn"]==True:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(1)
-                                    else:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(0)
-                            elif updated_device.hvacMode == indigo.kHvacMode.Cool:
-                                if self.debug2:
-                                    self.logger.debug(f"hvacMode == Cool and current Cooler is {updated_device.states['hvacCoolerIsOn']}")
-                                if 'hvacCoolerIsOn' in updated_device.states:
-                                    if updated_device.states["hvacCoolerIsOn"] == True:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(2)
-                                    else:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(0)  #cooling
-                            elif updated_device.hvacMode == indigo.kHvacMode.HeatCool:
-                                ## set targettemp to setpointHeat
-                                if self.debug2:
-                                    self.logger.debug(f"hvacMode == HeatCool and current Cooler is {updated_device.states['hvacCoolerIsOn']}, and Heater is {updated_device.states['hvacHeaterIsOn']}")
-                                if 'hvacCoolerIsOn' in updated_device.states:
-                                    if updated_device.states["hvacCoolerIsOn"] == True:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(2)
-                                    elif updated_device.states["hvacHeaterIsOn"] == True:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(1)  #cooling
-                                    else:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(0)
-                            if this_is_debug_device:
-                                self.logger.warning("Setting Target and Current Mode of Hvac. Mode Wished. {}".format(homekitModeWished))
-                            if self.debug2:
-                                self.logger.debug("Thermostat Device has been changed, updating all temp targets/setpoints")
+                        self.logger.debug(f"hvacMode == Off")
+                    entry["accessory"].char_current_heat_cool.set_value(0)
+                elif updated_device.hvacMode == indigo.kHvacMode.Heat:
+                    ## set targettemp to setpointHeat
+                    if self.debug2:
+                        self.logger.debug(f"hvacMode == Heat and current Heater is {updated_device.states['hvacHeaterIsOn']}")
+                    if 'hvacHeaterIsOn' in updated_device.states:
+                        if updated_device.states["hvacHeaterIsOn"]==True:
+                            entry["accessory"].char_current_heat_cool.set_value(1)
+                        else:
+                            entry["accessory"].char_current_heat_cool.set_value(0)
+                elif updated_device.hvacMode == indigo.kHvacMode.Cool:
+                    if self.debug2:
+                        self.logger.debug(f"hvacMode == Cool and current Cooler is {updated_device.states['hvacCoolerIsOn']}")
+                    if 'hvacCoolerIsOn' in updated_device.states:
+                        if updated_device.states["hvacCoolerIsOn"] == True:
+                            entry["accessory"].char_current_heat_cool.set_value(2)
+                        else:
+                            entry["accessory"].char_current_heat_cool.set_value(0)  #cooling
+                elif updated_device.hvacMode == indigo.kHvacMode.HeatCool:
+                    ## set targettemp to setpointHeat
+                    if self.debug2:
+                        self.logger.debug(f"hvacMode == HeatCool and current Cooler is {updated_device.states['hvacCoolerIsOn']}, and Heater is {updated_device.states['hvacHeaterIsOn']}")
+                    if 'hvacCoolerIsOn' in updated_device.states:
+                        if updated_device.states["hvacCoolerIsOn"] == True:
+                            entry["accessory"].char_current_heat_cool.set_value(2)
+                        elif updated_device.states["hvacHeaterIsOn"] == True:
+                            entry["accessory"].char_current_heat_cool.set_value(1)  #cooling
+                        else:
+                            entry["accessory"].char_current_heat_cool.set_value(0)
+                if this_is_debug_device:
+                    self.logger.warning("Setting Target and Current Mode of Hvac. Mode Wished. {}".format(homekitModeWished))
+                if self.debug2:
+                    self.logger.debug("Thermostat Device has been changed, updating all temp targets/setpoints")
 
-                        if 'hvacHeaterIsOn' in updated_device.states and 'hvacCoolerIsOn' in updated_device.states:
-                            if updated_device.states["hvacHeaterIsOn"] != original_device.states["hvacHeaterIsOn"] or updated_device.states["hvacCoolerIsOn"] != original_device.states["hvacCoolerIsOn"] :
-                                ## current allowed 0,1,2 only
-                                ## target allowed
-                                if self.debug2:
-                                    self.logger.debug("Thermostat Device Heater On or Cooler On has changed.  Updating.")
-                                '''
-                                Current
-                                     "Cool": 2,
-                                     "Heat": 1,
-                                     "Off": 0
-                                Target
-                                    "Auto": 3,
-                                    "Cool": 2,
-                                    "Heat": 1,
-                                    "Off": 0
-                                '''
-                                # if homekitModeWished != 3:
-                                #     # if not auto set to heat or cool or 0
-                                #     self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(homekitModeWished)
-                                #     # Crashed Home Kit with no error message
-                                #     # add ability for fan idle if temp reached - well attempt to.  Seems from this and below code block doesn't occur in auto modes
-                                #
-                                # else:
-                                    # if auto - is the hvac heating or cooling currently..  Use Image selector...
-                                if updated_device.hvacMode == indigo.kHvacMode.Off:
-                                    if self.debug2:
-                                        self.logger.debug(f"hvacMode == Off")
-                                    self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(0)
-                                elif updated_device.hvacMode == indigo.kHvacMode.Heat:
-                                    ## set targettemp to setpointHeat
-                                    if self.debug2:
-                                        self.logger.debug(f"hvacMode == Heat and current Heater is {updated_device.states['hvacHeaterIsOn']}")
-                                    if updated_device.states["hvacHeaterIsOn"]==False:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(0)
-                                    else:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(1)
-                                elif updated_device.hvacMode == indigo.kHvacMode.Cool:
-                                    if self.debug2:
-                                        self.logger.debug(f"hvacMode == Cool and current Cooler is {updated_device.states['hvacCoolerIsOn']}")
-                                    if updated_device.states["hvacCoolerIsOn"] == False:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(0)
-                                    else:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(2)  #cooling
-                                elif updated_device.hvacMode == indigo.kHvacMode.HeatCool:
-                                    ## set targettemp to setpointHeat
-                                    if self.debug2:
-                                        self.logger.debug(f"hvacMode == HeatCool and current Cooler is {updated_device.states['hvacCoolerIsOn']}, and Heater is {updated_device.states['hvacHeaterIsOn']}")
-                                    if updated_device.states["hvacCoolerIsOn"] == True:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(2)
-                                    elif updated_device.states["hvacHeaterIsOn"] == True:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(1)  #cooling
-                                    else:
-                                        self.device_list_internal[checkindex]["accessory"].char_current_heat_cool.set_value(0)
+            if 'hvacHeaterIsOn' in updated_device.states and 'hvacCoolerIsOn' in updated_device.states:
+                if updated_device.states["hvacHeaterIsOn"] != original_device.states["hvacHeaterIsOn"] or updated_device.states["hvacCoolerIsOn"] != original_device.states["hvacCoolerIsOn"] :
+                    ## current allowed 0,1,2 only
+                    ## target allowed
+                    if self.debug2:
+                        self.logger.debug("Thermostat Device Heater On or Cooler On has changed.  Updating.")
+                    '''
+                    Current
+                         "Cool": 2,
+                         "Heat": 1,
+                         "Off": 0
+                    Target
+                        "Auto": 3,
+                        "Cool": 2,
+                        "Heat": 1,
+                        "Off": 0
+                    '''
+                    # if homekitModeWished != 3:
+                    #     # if not auto set to heat or cool or 0
+                    #     entry["accessory"].char_current_heat_cool.set_value(homekitModeWished)
+                    #     # Crashed Home Kit with no error message
+                    #     # add ability for fan idle if temp reached - well attempt to.  Seems from this and below code block doesn't occur in auto modes
+                    #
+                    # else:
+                        # if auto - is the hvac heating or cooling currently..  Use Image selector...
+                    if updated_device.hvacMode == indigo.kHvacMode.Off:
+                        if self.debug2:
+                            self.logger.debug(f"hvacMode == Off")
+                        entry["accessory"].char_current_heat_cool.set_value(0)
+                    elif updated_device.hvacMode == indigo.kHvacMode.Heat:
+                        ## set targettemp to setpointHeat
+                        if self.debug2:
+                            self.logger.debug(f"hvacMode == Heat and current Heater is {updated_device.states['hvacHeaterIsOn']}")
+                        if updated_device.states["hvacHeaterIsOn"]==False:
+                            entry["accessory"].char_current_heat_cool.set_value(0)
+                        else:
+                            entry["accessory"].char_current_heat_cool.set_value(1)
+                    elif updated_device.hvacMode == indigo.kHvacMode.Cool:
+                        if self.debug2:
+                            self.logger.debug(f"hvacMode == Cool and current Cooler is {updated_device.states['hvacCoolerIsOn']}")
+                        if updated_device.states["hvacCoolerIsOn"] == False:
+                            entry["accessory"].char_current_heat_cool.set_value(0)
+                        else:
+                            entry["accessory"].char_current_heat_cool.set_value(2)  #cooling
+                    elif updated_device.hvacMode == indigo.kHvacMode.HeatCool:
+                        ## set targettemp to setpointHeat
+                        if self.debug2:
+                            self.logger.debug(f"hvacMode == HeatCool and current Cooler is {updated_device.states['hvacCoolerIsOn']}, and Heater is {updated_device.states['hvacHeaterIsOn']}")
+                        if updated_device.states["hvacCoolerIsOn"] == True:
+                            entry["accessory"].char_current_heat_cool.set_value(2)
+                        elif updated_device.states["hvacHeaterIsOn"] == True:
+                            entry["accessory"].char_current_heat_cool.set_value(1)  #cooling
+                        else:
+                            entry["accessory"].char_current_heat_cool.set_value(0)
 
 
-                    if "setpointCool" in updated_device.states:
-                        if self.debug2:
-                            self.logger.debug(f"setpointCool Found: Original: {original_device.states['setpointCool']} and updated:  {updated_device.states['setpointCool']} ")
-                        if original_device.states["setpointCool"] != updated_device.states["setpointCool"]:
-                            setpointCool = updated_device.states["setpointCool"]
+        if "setpointCool" in updated_device.states:
+            if self.debug2:
+                self.logger.debug(f"setpointCool Found: Original: {original_device.states['setpointCool']} and updated:  {updated_device.states['setpointCool']} ")
+            if original_device.states["setpointCool"] != updated_device.states["setpointCool"]:
+                setpointCool = updated_device.states["setpointCool"]
+                if self.debug2:
+                    self.logger.debug("Updating setpointCool to {}".format(setpointCool))
+                if this_is_debug_device:
+                    self.logger.warning("Updating setpointCool to {}".format(setpointCool))
+                entry["accessory"].set_temperature(HKutils.convert_to_float(setpointCool), "setpointCool")
+        if "setpointHeat" in updated_device.states:
+            if original_device.states["setpointHeat"] != updated_device.states["setpointHeat"]:
+                setpointHeat = updated_device.states["setpointHeat"]
+                if self.debug2:
+                    self.logger.debug("Updating setpointHeat to {}".format(setpointHeat))
+                if this_is_debug_device:
+                    self.logger.warning("Updating setpointHeat to {}".format(setpointHeat))
+                entry["accessory"].set_temperature(HKutils.convert_to_float(setpointHeat), "setpointHeat")
+
+    def _updated_analog_sensor(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Temperature, Humidity and Light sensors: selected sensor state or sensorValue, plus battery
+        if type(original_device) == indigo.SensorDevice:
+            sensortouse = entry["devicesensor"]
+            if sensortouse != "sensorValue":
+                if sensortouse != "":
+                    if sensortouse in updated_device.states:
+                        ## add below check for this state after changed
+                        if updated_device.states[sensortouse] != original_device.states[sensortouse]:
+                            sensorvalue = HKutils.convert_to_float(updated_device.states[sensortouse])
+                            if type(sensorvalue) in (float, int):
+                                if sensorvalue > 100000:  ## should be hit by LightSensor or really really hot days...
+                                    sensorvalue = 100000
                             if self.debug2:
-                                self.logger.debug("Updating setpointCool to {}".format(setpointCool))
+                                self.logger.debug("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
                             if this_is_debug_device:
-                                self.logger.warning("Updating setpointCool to {}".format(setpointCool))
-                            self.device_list_internal[checkindex]["accessory"].set_temperature(HKutils.convert_to_float(setpointCool), "setpointCool")
-                    if "setpointHeat" in updated_device.states:
-                        if original_device.states["setpointHeat"] != updated_device.states["setpointHeat"]:
-                            setpointHeat = updated_device.states["setpointHeat"]
-                            if self.debug2:
-                                self.logger.debug("Updating setpointHeat to {}".format(setpointHeat))
+                                self.logger.warning("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
+
+                            if entry["subtype"] == "TemperatureSensor":
+                                if this_is_debug_device:
+                                    self.logger.warning("Temperature Sensor found, sending to HKAccessory to convert.  Current Sensorvalue {}".format(sensorvalue))
+                                entry["accessory"].set_temperature(HKutils.convert_to_float(sensorvalue))
+                            else:
+                                if this_is_debug_device:
+                                    self.logger.warning("Humidty or Light Sensor found, Sending Sensorvalue {}".format(sensorvalue))
+                                entry["accessory"].char_temp.set_value(HKutils.convert_to_float(sensorvalue))
+            else:
+                if "sensorValue" in updated_device.states:
+                    if original_device.states["sensorValue"] != updated_device.states["sensorValue"]:
+                        sensorvalue = HKutils.convert_to_float(updated_device.states["sensorValue"])
+                        if type(sensorvalue) in (float, int):
+                            if sensorvalue > 100000:  ## should be hit by LightSensor or really really hot days...
+                                sensorvalue = 100000
+                        if self.debug2:
+                            self.logger.debug("Device {} + SensorValue:{} + type(sensorValue) {}".format(
+                                updated_device.name, sensorvalue, type(sensorvalue)))
+                        if this_is_debug_device:
+                            self.logger.warning("Device {} + SensorValue:{} + type(sensorValue) {}".format(
+                                updated_device.name, sensorvalue, type(sensorvalue)))
+                        if self.debug1:
+                            self.logger.debug("Found a Sensor value, using that")
+                        if entry["subtype"] == "TemperatureSensor":
                             if this_is_debug_device:
-                                self.logger.warning("Updating setpointHeat to {}".format(setpointHeat))
-                            self.device_list_internal[checkindex]["accessory"].set_temperature(HKutils.convert_to_float(setpointHeat), "setpointHeat")
-
-                elif str(updateddevice_subtype) in ("TemperatureSensor", "HumiditySensor", "LightSensor"):  # , "OccupancySensor", "ContactSensor", "CarbonDioxideSensor"):  ## example of one way sesnor
-                    if type(original_device) == indigo.SensorDevice:
-                        sensortouse = self.device_list_internal[checkindex]["devicesensor"]
-                        if sensortouse != "sensorValue":
-                            if sensortouse != "":
-                                if sensortouse in updated_device.states:
-                                    ## add below check for this state after changed
-                                    if updated_device.states[sensortouse] != original_device.states[sensortouse]:
-                                        sensorvalue = HKutils.convert_to_float(updated_device.states[sensortouse])
-                                        if type(sensorvalue) in (float, int):
-                                            if sensorvalue > 100000:  ## should be hit by LightSensor or really really hot days...
-                                                sensorvalue = 100000
-                                        if self.debug2:
-                                            self.logger.debug("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
-                                        if this_is_debug_device:
-                                            self.logger.warning("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
-
-                                        if str(updateddevice_subtype) == "TemperatureSensor":
-                                            if this_is_debug_device:
-                                                self.logger.warning("Temperature Sensor found, sending to HKAccessory to convert.  Current Sensorvalue {}".format(sensorvalue))
-                                            self.device_list_internal[checkindex]["accessory"].set_temperature(HKutils.convert_to_float(sensorvalue))
-                                        else:
-                                            if this_is_debug_device:
-                                                self.logger.warning("Humidty or Light Sensor found, Sending Sensorvalue {}".format(sensorvalue))
-                                            self.device_list_internal[checkindex]["accessory"].char_temp.set_value(HKutils.convert_to_float(sensorvalue))
-                        else:
-                            if "sensorValue" in updated_device.states:
-                                if original_device.states["sensorValue"] != updated_device.states["sensorValue"]:
-                                    sensorvalue = HKutils.convert_to_float(updated_device.states["sensorValue"])
-                                    if type(sensorvalue) in (float, int):
-                                        if sensorvalue > 100000:  ## should be hit by LightSensor or really really hot days...
-                                            sensorvalue = 100000
-                                    if self.debug2:
-                                        self.logger.debug("Device {} + SensorValue:{} + type(sensorValue) {}".format(
-                                            updated_device.name, sensorvalue, type(sensorvalue)))
-                                    if this_is_debug_device:
-                                        self.logger.warning("Device {} + SensorValue:{} + type(sensorValue) {}".format(
-                                            updated_device.name, sensorvalue, type(sensorvalue)))
-                                    if self.debug1:
-                                        self.logger.debug("Found a Sensor value, using that")
-                                    if str(updateddevice_subtype) == "TemperatureSensor":
-                                        if this_is_debug_device:
-                                            self.logger.warning("Temperature Sensor found, sending to HKAccessory to convert.  Current Sensorvalue {}".format(sensorvalue))
-                                        self.device_list_internal[checkindex]["accessory"].set_temperature(HKutils.convert_to_float(sensorvalue))
-                                    else:
-                                        if this_is_debug_device:
-                                            self.logger.warning("Humidty or Light Sensor found, Sending Sensorvalue {}".format(sensorvalue))
-                                        self.device_list_internal[checkindex]["accessory"].char_temp.set_value(HKutils.convert_to_float(sensorvalue))
-
-                                    #self.device_list_internal[checkindex]["accessory"].char_temp.set_value(sensorvalue)  ##CurrentTemperature is chartemp
-                        ## else check internal list for sensor State that we wish to return back
-                    else:
-                        sensortouse = self.device_list_internal[checkindex]["devicesensor"]
-                        if sensortouse != "":
-                            if sensortouse in updated_device.states:
-                                if updated_device.states[sensortouse] != original_device.states[sensortouse]:
-                                    sensorvalue = HKutils.convert_to_float(updated_device.states[sensortouse])
-                                    if type(sensorvalue) in (float, int):
-                                        if sensorvalue > 100000:  ## should be hit by LightSensor or really really hot days...
-                                            sensorvalue = 100000
-                                    if self.debug2:
-                                        self.logger.debug(
-                                            "Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(
-                                                updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
-
-                                    if this_is_debug_device:
-                                        self.logger.debug("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(
-                                            updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
-                                    if str(updateddevice_subtype) == "TemperatureSensor":
-                                        if this_is_debug_device:
-                                            self.logger.warning("Temperature Sensor found, sending to HKAccessory to convert.  Current Sensorvalue {}".format(sensorvalue))
-                                        self.device_list_internal[checkindex]["accessory"].set_temperature(HKutils.convert_to_float(sensorvalue))
-                                    else:
-                                        if this_is_debug_device:
-                                            self.logger.warning("Humidty or Light Sensor found, Sending Sensorvalue {}".format(sensorvalue))
-                                        self.device_list_internal[checkindex]["accessory"].char_temp.set_value(HKutils.convert_to_float(sensorvalue))
-
-                    # sensor type updated and check Battery
-                    if "batteryLevel" in updated_device.states:
-                        if not self.device_list_internal[checkindex]["accessory"]._char_battery or not self.device_list_internal[checkindex]["accessory"]._char_low_battery:
-                            if updated_device.states["batteryLevel"] != original_device["batteryLevel"]:
-                                batteryLevel = HKutils.convert_to_float(updated_device.states["batteryLevel"])
-                                if batteryLevel is not None:
-                                    self.device_list_internal[checkindex]["accessory"]._char_battery.set_value(batteryLevel)
-                                    is_low_battery = 1 if batteryLevel < self.low_battery_threshold else 0
-                                    self._char_low_battery.set_value(is_low_battery)
-                                    if self.debug2:
-                                        self.logger.debug( "{}: Updated battery level to {}".format(updated_device.name, batteryLevel) )
-
-
-                elif str(updateddevice_subtype) in ("LeakSensor", "OccupancySensor", "SmokeSensor", "ContactSensor", "CarbonMonoxideSensor", "MotionSensor", "CarbonDioxideSensor"):  ## example of one way sesnor
-                    if type(original_device) == indigo.SensorDevice:
-                        sensortouse = self.device_list_internal[checkindex]["devicesensor"]
-                        if sensortouse != "sensorValue":
-                            if sensortouse != "":
-                                if sensortouse in updated_device.states:
-                                    if updated_device.states[sensortouse] != original_device.states[sensortouse]:
-                                        sensorvalue = updated_device.states[sensortouse]
-                                        if self.debug2:
-                                            self.logger.debug("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
-                                        if this_is_debug_device:
-                                            self.logger.warning("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
-                                        self.device_list_internal[checkindex]["accessory"].char_on.set_value(sensorvalue)
+                                self.logger.warning("Temperature Sensor found, sending to HKAccessory to convert.  Current Sensorvalue {}".format(sensorvalue))
+                            entry["accessory"].set_temperature(HKutils.convert_to_float(sensorvalue))
                         else:
-                            if "sensorValue" in updated_device.states:
-                                if original_device.states["sensorValue"] != updated_device.states["sensorValue"]:
-                                    sensorvalue = updated_device.states["sensorValue"]
-                                    if self.debug2:
-                                        self.logger.debug("Device {} + sensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensorvalue, type(sensorvalue)))
-                                    if this_is_debug_device:
-                                        self.logger.warning("Device {} + sensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensorvalue, type(sensorvalue)))
-
-                                    self.device_list_internal[checkindex]["accessory"].char_on.set_value(sensorvalue)  ##CurrentTemperature is chartemp
-                        ## else check internal list for sensor State that we wish to return back
-                    else:
-                        sensortouse = self.device_list_internal[checkindex]["devicesensor"]
-                        if sensortouse != "":
-                            if sensortouse in updated_device.states:
-                                if updated_device.states[sensortouse] != original_device.states[sensortouse]:
-                                    sensorvalue = updated_device.states[sensortouse]
-                                    if self.debug2:
-                                        self.logger.debug("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
-                                    if this_is_debug_device:
-                                        self.logger.warning("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
-
-                                    self.device_list_internal[checkindex]["accessory"].char_on.set_value(sensorvalue)
-                    # sensor type updated and check Battery
-                    if "batteryLevel" in updated_device.states:
-                        if not self.device_list_internal[checkindex]["accessory"]._char_battery or not self.device_list_internal[checkindex]["accessory"]._char_low_battery:
-                            if updated_device.states["batteryLevel"] != original_device["batteryLevel"]:
-                                batteryLevel = HKutils.convert_to_float(updated_device.states["batteryLevel"])
-                                if batteryLevel is not None:
-                                    self.device_list_internal[checkindex]["accessory"]._char_battery.set_value(batteryLevel)
-                                    is_low_battery = 1 if batteryLevel < self.low_battery_threshold else 0
-                                    self._char_low_battery.set_value(is_low_battery)
-                                    if self.debug2:
-                                        self.logger.debug( "{}: Updated battery level to {}".format(updated_device.name, batteryLevel) )
-
-                elif str(updateddevice_subtype) == "Lock" :  ## example of one way sesnor
-                    # if type(original_device) == indigo.RelayDevice:
-                    if updated_device.states['onOffState'] != original_device.states['onOffState']:
-                        newstate = updated_device.states["onOffState"]
+                            if this_is_debug_device:
+                                self.logger.warning("Humidty or Light Sensor found, Sending Sensorvalue {}".format(sensorvalue))
+                            entry["accessory"].char_temp.set_value(HKutils.convert_to_float(sensorvalue))
+
+                        #entry["accessory"].char_temp.set_value(sensorvalue)  ##CurrentTemperature is chartemp
+            ## else check internal list for sensor State that we wish to return back
+        else:
+            sensortouse = entry["devicesensor"]
+            if sensortouse != "":
+                if sensortouse in updated_device.states:
+                    if updated_device.states[sensortouse] != original_device.states[sensortouse]:
+                        sensorvalue = HKutils.convert_to_float(updated_device.states[sensortouse])
+                        if type(sensorvalue) in (float, int):
+                            if sensorvalue > 100000:  ## should be hit by LightSensor or really really hot days...
+                                sensorvalue = 100000
                         if self.debug2:
-                            self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+                            self.logger.debug(
+                                "Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(
+                                    updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
+
                         if this_is_debug_device:
-                            self.logger.warning("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
-                        self.device_list_internal[checkindex]["accessory"].char_target_state.set_value(newstate)
-                        self.device_list_internal[checkindex]["accessory"].char_current_state.set_value(newstate)
-                        return
-                    elif "lastChangedVia" in updated_device.states and updated_device.states['lastChangedVia'] != original_device.states['lastChangedVia']:
-                        ## Locks send Onoffstate, and then lastchangedvia update.
-                        ## homekit appears to like some time between target and current
-                        ## below here - resend back to homekit update on this other trigger.
-                        newstate = updated_device.states["onOffState"]
+                            self.logger.debug("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(
+                                updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
+                        if entry["subtype"] == "TemperatureSensor":
+                            if this_is_debug_device:
+                                self.logger.warning("Temperature Sensor found, sending to HKAccessory to convert.  Current Sensorvalue {}".format(sensorvalue))
+                            entry["accessory"].set_temperature(HKutils.convert_to_float(sensorvalue))
+                        else:
+                            if this_is_debug_device:
+                                self.logger.warning("Humidty or Light Sensor found, Sending Sensorvalue {}".format(sensorvalue))
+                            entry["accessory"].char_temp.set_value(HKutils.convert_to_float(sensorvalue))
+
+        # sensor type updated and check Battery
+        if "batteryLevel" in updated_device.states:
+            if not entry["accessory"]._char_battery or not entry["accessory"]._char_low_battery:
+                if updated_device.states["batteryLevel"] != original_device["batteryLevel"]:
+                    batteryLevel = HKutils.convert_to_float(updated_device.states["batteryLevel"])
+                    if batteryLevel is not None:
+                        entry["accessory"]._char_battery.set_value(batteryLevel)
+                        is_low_battery = 1 if batteryLevel < self.low_battery_threshold else 0
+                        self._char_low_battery.set_value(is_low_battery)
+                        if self.debug2:
+                            self.logger.debug( "{}: Updated battery level to {}".format(updated_device.name, batteryLevel) )
+
+    def _updated_binary_sensor(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Leak, Occupancy, Smoke, Contact, CO, CO2 and Motion sensors: selected sensor state or sensorValue, plus battery
+        if type(original_device) == indigo.SensorDevice:
+            sensortouse = entry["devicesensor"]
+            if sensortouse != "sensorValue":
+                if sensortouse != "":
+                    if sensortouse in updated_device.states:
+                        if updated_device.states[sensortouse] != original_device.states[sensortouse]:
+                            sensorvalue = updated_device.states[sensortouse]
+                            if self.debug2:
+                                self.logger.debug("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
+                            if this_is_debug_device:
+                                self.logger.warning("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
+                            entry["accessory"].char_on.set_value(sensorvalue)
+            else:
+                if "sensorValue" in updated_device.states:
+                    if original_device.states["sensorValue"] != updated_device.states["sensorValue"]:
+                        sensorvalue = updated_device.states["sensorValue"]
                         if self.debug2:
-                            self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+                            self.logger.debug("Device {} + sensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensorvalue, type(sensorvalue)))
                         if this_is_debug_device:
-                            self.logger.warning("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
-                        self.device_list_internal[checkindex]["accessory"].char_target_state.set_value(newstate)
-                        self.device_list_internal[checkindex]["accessory"].char_current_state.set_value(newstate)
+                            self.logger.warning("Device {} + sensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensorvalue, type(sensorvalue)))
 
-                elif str(updateddevice_subtype) == "Security":
-                    if updated_device.states != original_device.states:
+                        entry["accessory"].char_on.set_value(sensorvalue)  ##CurrentTemperature is chartemp
+            ## else check internal list for sensor State that we wish to return back
+        else:
+            sensortouse = entry["devicesensor"]
+            if sensortouse != "":
+                if sensortouse in updated_device.states:
+                    if updated_device.states[sensortouse] != original_device.states[sensortouse]:
+                        sensorvalue = updated_device.states[sensortouse]
                         if self.debug2:
-                            self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, updated_device.states))
+                            self.logger.debug("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
                         if this_is_debug_device:
-                            self.logger.warning("NewState of Device:{} & State: {} ".format(updated_device.name, updated_device.states))
+                            self.logger.warning("Device {} ,SensortoUse {} SensorValue:{} + type(sensorValue) {}".format(updated_device.name, sensortouse, sensorvalue, type(sensorvalue)))
+
+                        entry["accessory"].char_on.set_value(sensorvalue)
+        # sensor type updated and check Battery
+        if "batteryLevel" in updated_device.states:
+            if not entry["accessory"]._char_battery or not entry["accessory"]._char_low_battery:
+                if updated_device.states["batteryLevel"] != original_device["batteryLevel"]:
+                    batteryLevel = HKutils.convert_to_float(updated_device.states["batteryLevel"])
+                    if batteryLevel is not None:
+                        entry["accessory"]._char_battery.set_value(batteryLevel)
+                        is_low_battery = 1 if batteryLevel < self.low_battery_threshold else 0
+                        self._char_low_battery.set_value(is_low_battery)
+                        if self.debug2:
+                            self.logger.debug( "{}: Updated battery level to {}".format(updated_device.name, batteryLevel) )
+
+    def _updated_lock(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Lock: onOffState, resent on lastChangedVia
+        # if type(original_device) == indigo.RelayDevice:
+        if updated_device.states['onOffState'] != original_device.states['onOffState']:
+            newstate = updated_device.states["onOffState"]
+            if self.debug2:
+                self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+            if this_is_debug_device:
+                self.logger.warning("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+            entry["accessory"].char_target_state.set_value(newstate)
+            entry["accessory"].char_current_state.set_value(newstate)
+            return True
+        elif "lastChangedVia" in updated_device.states and updated_device.states['lastChangedVia'] != original_device.states['lastChangedVia']:
+            ## Locks send Onoffstate, and then lastchangedvia update.
+            ## homekit appears to like some time between target and current
+            ## below here - resend back to homekit update on this other trigger.
+            newstate = updated_device.states["onOffState"]
+            if self.debug2:
+                self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+            if this_is_debug_device:
+                self.logger.warning("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+            entry["accessory"].char_target_state.set_value(newstate)
+            entry["accessory"].char_current_state.set_value(newstate)
+
+    def _updated_security(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Security System: any state change passed to accessory
+        if updated_device.states != original_device.states:
+            if self.debug2:
+                self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, updated_device.states))
+            if this_is_debug_device:
+                self.logger.warning("NewState of Device:{} & State: {} ".format(updated_device.name, updated_device.states))
+
+            if entry['manufacturername'] == "com.frightideas.indigoplugin.dscAlarm":
+                if "state" in updated_device.states:
+                    if updated_device.states['state'] != original_device.states['state']:  # focusing only on changes of 'state' (not LED, Time etc)
+                        entry["accessory"].set_fromdeviceUpdate(updated_device.states)
+            else:
+                entry["accessory"].set_fromdeviceUpdate(updated_device.states)
+            return True
 
-                        if self.device_list_internal[checkindex]['manufacturername'] == "com.frightideas.indigoplugin.dscAlarm":
-                            if "state" in updated_device.states:
-                                if updated_device.states['state'] != original_device.states['state']:  # focusing only on changes of 'state' (not LED, Time etc)
-                                    self.device_list_internal[checkindex]["accessory"].set_fromdeviceUpdate(updated_device.states)
-                        else:
-                            self.device_list_internal[checkindex]["accessory"].set_fromdeviceUpdate(updated_device.states)
-                        return
-
-                elif str(updateddevice_subtype) == "GarageDoor":
-                    for stateName in ("doorState", "onOffState", "binaryInput1"):  # ordered by preference
-                        # doorState:    0 -> open, 1 -> closed, 2 -> opening, 3 -> closing, 4 -> stopped, 5 -> reversing
-                        # onOffState:   0 -> open, 1 -> closed
-                        # binaryInput1: 0 -> open, 1 -> closed
-                        if stateName in updated_device.states:  # choose the first match
-                            oldstate = original_device.states[stateName]
-                            newstate = updated_device.states[stateName]
-                            if newstate != oldstate:  # state has changed
-
-                                if self.debug2:
-                                    self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
-                                if this_is_debug_device:
-                                    self.logger.warning("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
-                                accessory = self.device_list_internal[checkindex]["accessory"]
+    def _updated_garagedoor(self, entry, original_device, updated_device, this_is_debug_device):
+        ## GarageDoor: doorState / onOffState / binaryInput1 in order of preference
+        for stateName in ("doorState", "onOffState", "binaryInput1"):  # ordered by preference
+            # doorState:    0 -> open, 1 -> closed, 2 -> opening, 3 -> closing, 4 -> stopped, 5 -> reversing
+            # onOffState:   0 -> open, 1 -> closed
+            # binaryInput1: 0 -> open, 1 -> closed
+            if stateName in updated_device.states:  # choose the first match
+                oldstate = original_device.states[stateName]
+                newstate = updated_device.states[stateName]
+                if newstate != oldstate:  # state has changed
 
-                                currentDoorState = (0, 1, 2, 3, 0, 2)[newstate]
-                                accessory.char_current_state.set_value(currentDoorState)
+                    if self.debug2:
+                        self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+                    if this_is_debug_device:
+                        self.logger.warning("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+                    accessory = entry["accessory"]
+
+                    currentDoorState = (0, 1, 2, 3, 0, 2)[newstate]
+                    # TargetDoorState must be 0 -> open or 1 -> closed
+                    targetDoorState = (0, 1, 0, 1, 0, 0)[newstate]
+                    char_values = {accessory.char_current_state: currentDoorState, accessory.char_target_state: targetDoorState}
+
+                    # ObstructionDetected must be 0 -> False or 1 -> True
+                    obstructionDetected = (None, 0, None, None, 1, 1)[newstate]
+                    if obstructionDetected is not None:
+                        char_values[accessory.char_obstruction_detected] = obstructionDetected
+                    ## send together as one update
+                    accessory.set_values(char_values)
+
+                break
+        return True
 
-                                # TargetDoorState must be 0 -> open or 1 -> closed
-                                targetDoorState = (0, 1, 0, 1, 0, 0)[newstate]
-                                accessory.char_target_state.set_value(targetDoorState)
+    def _updated_valve(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Valve, Irrigation, Showerhead, Faucet: onOffState
+        # if type(original_device) == indigo.RelayDevice:
+        if updated_device.states['onOffState'] != original_device.states['onOffState']:
+            newstate = updated_device.states["onOffState"]
+            currentstate = 1 if newstate == True else 0
+            if self.debug2:
+                self.logger.debug(f"{entry['subtype']} Subtype NewState of Device:{updated_device.name} & State: {newstate} & new State {currentstate}")
+            entry["accessory"].set_valve_state(currentstate)
+            return True
 
-                                # ObstructionDetected must be 0 -> False or 1 -> True
-                                obstructionDetected = (None, 0, None, None, 1, 1)[newstate]
-                                if obstructionDetected is not None:
-                                    accessory.char_obstruction_detected.set_value(obstructionDetected)
+    def _updated_linked_doorbell(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Linked Doorbell: any onOffState change rings doorbell
+        # if type(original_device) == indigo.RelayDevice:
+        if "onOffState" in updated_device.states:  ## double check Linked Doorbell are set only to have onOffStates
+            if updated_device.states['onOffState'] != original_device.states['onOffState']:
+                newstate = updated_device.onState
+                if self.debug2:
+                    self.logger.debug("OnOffState Changed...and New State {}".format(newstate))
+                if self.debug2:
+                    self.logger.debug("OnOffState of Device:{} & State: {} ".format(updated_device.name, newstate))
+                ## Trigger doorbell if state change, rather than just On.if newstate:  ##
+                entry["accessory"]._char_doorbell_detected.set_value(0)
+                entry["accessory"]._char_doorbell_detected_switch.set_value(0)
+        # if Doorbell nothing further to do... return regardless
+        return True
 
-                            break
-                    return
+    def _updated_bi_camera(self, entry, original_device, updated_device, this_is_debug_device):
+        ## BlueIris Camera: Motion state
+        # if type(original_device) == indigo.RelayDevice:
+        motionEnabled = updated_device.pluginProps.get("HomeKit_motionEnabled", True)
+        if motionEnabled:
+            if updated_device.states['Motion'] != original_device.states['Motion']:
+                newstate = updated_device.states["Motion"]
+                if self.debug2:
+                    self.logger.debug("Motion Changed...and New State {}".format(newstate))
+                if self.debug2:
+                    self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+                entry["accessory"].char_motion_detected.set_value(newstate)
+                return True
 
-                elif str(updateddevice_subtype) in ("Valve","Irrigation","Showerhead","Faucet"):
-                    # if type(original_device) == indigo.RelayDevice:
-                    if updated_device.states['onOffState'] != original_device.states['onOffState']:
-                        newstate = updated_device.states["onOffState"]
-                        currentstate = 1 if newstate == True else 0
-                        if self.debug2:
-                            self.logger.debug(f"{updateddevice_subtype} Subtype NewState of Device:{updated_device.name} & State: {newstate} & new State {currentstate}")
-                        self.device_list_internal[checkindex]["accessory"].set_valve_state(currentstate)
-                        return
-                # Check Doorbell prior to Camera..
-                elif str(updateddevice_subtype) == "Linked-DoorBell":
-                    # if type(original_device) == indigo.RelayDevice:
-                    if "onOffState" in updated_device.states:  ## double check Linked Doorbell are set only to have onOffStates
-                        if updated_device.states['onOffState'] != original_device.states['onOffState']:
-                            newstate = updated_device.onState
-                            if self.debug2:
-                                self.logger.debug("OnOffState Changed...and New State {}".format(newstate))
-                            if self.debug2:
-                                self.logger.debug("OnOffState of Device:{} & State: {} ".format(updated_device.name, newstate))
-                            ## Trigger doorbell if state change, rather than just On.if newstate:  ##
-                            self.device_list_internal[checkindex]["accessory"]._char_doorbell_detected.set_value(0)
-                            self.device_list_internal[checkindex]["accessory"]._char_doorbell_detected_switch.set_value(0)
-                    # if Doorbell nothing further to do... return regardless
-                    return
+    def _updated_ss_camera(self, entry, original_device, updated_device, this_is_debug_device):
+        ## SecuritySpy Camera: event_on state
+        # if type(original_device) == indigo.RelayDevice:
 
-                elif str(updateddevice_subtype) == "BlueIrisCamera":  #update
-                    # if type(original_device) == indigo.RelayDevice:
-                    motionEnabled = updated_device.pluginProps.get("HomeKit_motionEnabled", True)
-                    if motionEnabled:
-                        if updated_device.states['Motion'] != original_device.states['Motion']:
-                            newstate = updated_device.states["Motion"]
-                            if self.debug2:
-                                self.logger.debug("Motion Changed...and New State {}".format(newstate))
-                            if self.debug2:
-                                self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
-                            self.device_list_internal[checkindex]["accessory"].char_motion_detected.set_value(newstate)
-                            return
+        motionEnabled = updated_device.pluginProps.get("HomeKit_motionEnabled", True)
+        if self.debug2:
+            self.logger.debug(f"Within the SecuritySpyCamera Moption Check. {motionEnabled=}")
 
-                elif str(updateddevice_subtype) == "SecuritySpyCamera":
-                    # if type(original_device) == indigo.RelayDevice:
+        if motionEnabled:
+            if 'event_on' in updated_device.states:  ## Other plugin doesnt have it
+                if updated_device.states['event_on'] != original_device.states['event_on']:
+                    newstate = updated_device.states["event_on"]
+                    if self.debug2:
+                        self.logger.debug("Motion Changed...and New State {}".format(newstate))
+                    if self.debug2:
+                        self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+                    entry["accessory"].char_motion_detected.set_value(newstate)
+                    return True
 
-                    motionEnabled = updated_device.pluginProps.get("HomeKit_motionEnabled", True)
+    def _updated_fan(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Fan: brightnessLevel or SpeedControl speedLevel to rotation speed
+        ## Fan device has a brightnessLevel below, likely dimmer update Rotation speed with that.
+        ## Onoff will be active at bottom as well
+        if "brightnessLevel" in updated_device.states:
+            if updated_device.states['brightnessLevel'] != original_device.states['brightnessLevel']:
+                brightness = updated_device.states["brightnessLevel"]
+                if self.debug2:
+                    self.logger.debug("This is a Fan: But found a brightnessLevel state try using that:  ValuetoSet: {}".format(brightness))
+                if isinstance(brightness, int):
+                    entry["accessory"].char_rotation_speed.set_value(brightness)
+        elif type(updated_device) == indigo.SpeedControlDevice:
+            ## Speed control device update speedLevel hope rest follows... hard to test
+            ## strange device, hard to test
+            ## update speed index to that set by Homekit 0-100 fits
+            if updated_device.speedLevel != original_device.speedLevel:
+                speedLevel = updated_device.speedLevel
+                if self.debug2:
+                    self.logger.debug("This is a Fan (HK) & SpeedControlDevice (indigo) found a speedLevel state try using that:  speedLevel: {}".format(speedLevel))
+                if isinstance(speedLevel, int):
+                    entry["accessory"].char_rotation_speed.set_value(speedLevel)
+
+    def _updated_covering(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Blind/Window/Door: brightnessLevel, or onOffState if no brightness
+        if "brightnessLevel" in updated_device.states:
+            if updated_device.states['brightnessLevel'] != original_device.states['brightnessLevel']:
+                brightness = updated_device.states["brightnessLevel"]
+                if self.debug2:
+                    self.logger.debug("Blind/Window: Found a brightnessLevel state try using that:  ValuetoSet: {}".format(brightness))
+                if isinstance(brightness, int):
+                    entry["accessory"].set_covering_state(brightness, None)
+        elif "onOffState" in updated_device.states:
+            ## use brightness and calculate onOff first, if no brightness because of device - use on off and 100/0
+            ## Inverse can be actioned at the accessory level
+            if updated_device.states['onOffState'] != original_device.states['onOffState']:
+                newstate = updated_device.states["onOffState"]
+                if self.debug2:
+                    self.logger.debug("Blind/Window: Defaulting to onOffState Check: NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+                entry["accessory"].set_covering_state(None, updated_device.states["onOffState"])
+
+    def _updated_brightness(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Lights: brightnessLevel
+        if "brightnessLevel" in updated_device.states:
+            if updated_device.states['brightnessLevel'] != original_device.states['brightnessLevel']:
+                brightness = updated_device.states["brightnessLevel"]
+                if self.debug2:
+                    self.logger.debug("Found a brightnessLevel state try using that:  ValuetoSet: {}".format(brightness))
+                if isinstance(brightness, int):
+                    entry["accessory"].Brightness.set_value(brightness)
+                    entry["accessory"].HomeKitBrightnessLevel = brightness
+
+    def _updated_colour(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Hue and ColorTemp lights: RGB, whiteTemperature and colorMode
+        # remove specific hue stuff, huelevel wrong and better to go one lower to indigo dimmer
+        if 'redLevel' in updated_device.states:  # and 'hue' not in updated_device.states:  ### if Hue - set with hue as above, if no hue use RGB here...  done- could move to RGB for all given HueLights...
+            ##   use redLevel as check for all if has redLevel, will have greenLevel & blueLevel no need to check for all
+            if updated_device.supportsRGB:  # has to otherwise wouldnt be huelightbulb - except for User Forcing - keep check
+                if updated_device.states['redLevel'] != original_device.states["redLevel"] or updated_device.states['blueLevel'] != original_device.states["blueLevel"] or updated_device.states['greenLevel'] != original_device.states["greenLevel"]:
+                    ## check any updated, don't worry about state/brighgtess other changes
+                    red = updated_device.states['redLevel']
+                    green = updated_device.states['greenLevel']
+                    blue = updated_device.states['blueLevel']
+                    hsvReturned = colorsys.rgb_to_hsv(red / 100, green / 100, blue / 100)
+                    # rgbReturned = colorsys.hsv_to_rgb(huetoSet / 360.0, saturationtoSet / 100.0, 1)
                     if self.debug2:
-                        self.logger.debug(f"Within the SecuritySpyCamera Moption Check. {motionEnabled=}")
-
-                    if motionEnabled:
-                        if 'event_on' in updated_device.states:  ## Other plugin doesnt have it
-                            if updated_device.states['event_on'] != original_device.states['event_on']:
-                                newstate = updated_device.states["event_on"]
-                                if self.debug2:
-                                    self.logger.debug("Motion Changed...and New State {}".format(newstate))
-                                if self.debug2:
-                                    self.logger.debug("NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
-                                self.device_list_internal[checkindex]["accessory"].char_motion_detected.set_value(newstate)
-                                return
-
-                elif str(updateddevice_subtype) == "Fan":
-                    ## Fan device has a brightnessLevel below, likely dimmer update Rotation speed with that.
-                    ## Onoff will be active at bottom as well
-                    if "brightnessLevel" in updated_device.states:
-                        if updated_device.states['brightnessLevel'] != original_device.states['brightnessLevel']:
-                            brightness = updated_device.states["brightnessLevel"]
-                            if self.debug2:
-                                self.logger.debug("This is a Fan: But found a brightnessLevel state try using that:  ValuetoSet: {}".format(brightness))
-                            if isinstance(brightness, int):
-                                self.device_list_internal[checkindex]["accessory"].char_rotation_speed.set_value(brightness)
-                    elif type(updated_device) == indigo.SpeedControlDevice:
-                        ## Speed control device update speedLevel hope rest follows... hard to test
-                        ## strange device, hard to test
-                        ## update speed index to that set by Homekit 0-100 fits
-                        if updated_device.speedLevel != original_device.speedLevel:
-                            speedLevel = updated_device.speedLevel
-                            if self.debug2:
-                                self.logger.debug("This is a Fan (HK) & SpeedControlDevice (indigo) found a speedLevel state try using that:  speedLevel: {}".format(speedLevel))
-                            if isinstance(speedLevel, int):
-                                self.device_list_internal[checkindex]["accessory"].char_rotation_speed.set_value(speedLevel)
-
-                elif str(updateddevice_subtype) in ("Blind", "Window", "Door"):
-                    if "brightnessLevel" in updated_device.states:
-                        if updated_device.states['brightnessLevel'] != original_device.states['brightnessLevel']:
-                            brightness = updated_device.states["brightnessLevel"]
-                            if self.debug2:
-                                self.logger.debug("Blind/Window: Found a brightnessLevel state try using that:  ValuetoSet: {}".format(brightness))
-                            if isinstance(brightness, int):
-                                self.device_list_internal[checkindex]["accessory"].set_covering_state(brightness, None)
-                    elif "onOffState" in updated_device.states:
-                        ## use brightness and calculate onOff first, if no brightness because of device - use on off and 100/0
-                        ## Inverse can be actioned at the accessory level
-                        if updated_device.states['onOffState'] != original_device.states['onOffState']:
-                            newstate = updated_device.states["onOffState"]
+                        self.logger.debug("Found updated Red/Green/Blue Level & Converted/Returned HSV data: {}".format(hsvReturned))
+                    if len(hsvReturned) >= 1:
+                        entry["accessory"].set_values({entry["accessory"].Hue: hsvReturned[0] * 360, entry["accessory"].Saturation: hsvReturned[1] * 100})
+                elif "whiteTemperature" in updated_device.states:
+                    if updated_device.supportsWhiteTemperature:
+                    ## add check for whiteTemp supported - although won't be picked up by Hue...
+                        if updated_device.states["whiteTemperature"] != original_device.states["whiteTemperature"]:
+                            ## colortemp changed.
+                            mired = HKutils.color_temperature_kelvin_to_mired(updated_device.states["whiteTemperature"])
                             if self.debug2:
-                                self.logger.debug("Blind/Window: Defaulting to onOffState Check: NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
-                            self.device_list_internal[checkindex]["accessory"].set_covering_state(None, updated_device.states["onOffState"])
-
-                if str(updateddevice_subtype) in ("HueLightBulb", "LightBulb", "ColorTempLightBulb"):
-                    if "brightnessLevel" in updated_device.states:
-                        if updated_device.states['brightnessLevel'] != original_device.states['brightnessLevel']:
-                            brightness = updated_device.states["brightnessLevel"]
+                                self.logger.debug("Found WhiteTemp Changed, converting to mired == {}".format(mired))
+                            hue, saturation = HKutils.color_temperature_to_hs(HKutils.color_temperature_mired_to_kelvin(mired))
+                            ## check for device state change in colorMode - below checks hue ?
+                            ## Not sure others - if not present will delay inteface update
+                            entry["accessory"].set_values({entry["accessory"].Hue: round(hue, 0), entry["accessory"].Saturation: round(saturation, 0)})
+                            entry["accessory"].char_color_temp.set_value(round(mired, 0))
+                ## if huebulb and colorMode change notify
+                if "colorMode" in updated_device.states:
+                    if updated_device.supportsWhiteTemperature and updated_device.supportsRGB:
+                        if updated_device.states["colorMode"] != original_device.states["colorMode"]:
+                            ## there has been a change in color mode
+                            ## should update
                             if self.debug2:
-                                self.logger.debug("Found a brightnessLevel state try using that:  ValuetoSet: {}".format(brightness))
-                            if isinstance(brightness, int):
-                                self.device_list_internal[checkindex]["accessory"].Brightness.set_value(brightness)
-                                self.device_list_internal[checkindex]["accessory"].HomeKitBrightnessLevel = brightness
-
-                if str(updateddevice_subtype) in ( "HueLightBulb", "ColorTempLightBulb"):
-                    # remove specific hue stuff, huelevel wrong and better to go one lower to indigo dimmer
-                    if 'redLevel' in updated_device.states:  # and 'hue' not in updated_device.states:  ### if Hue - set with hue as above, if no hue use RGB here...  done- could move to RGB for all given HueLights...
-                        ##   use redLevel as check for all if has redLevel, will have greenLevel & blueLevel no need to check for all
-                        if updated_device.supportsRGB:  # has to otherwise wouldnt be huelightbulb - except for User Forcing - keep check
-                            if updated_device.states['redLevel'] != original_device.states["redLevel"] or updated_device.states['blueLevel'] != original_device.states["blueLevel"] or updated_device.states['greenLevel'] != original_device.states["greenLevel"]:
-                                ## check any updated, don't worry about state/brighgtess other changes
-                                red = updated_device.states['redLevel']
-                                green = updated_device.states['greenLevel']
-                                blue = updated_device.states['blueLevel']
-                                hsvReturned = colorsys.rgb_to_hsv(red / 100, green / 100, blue / 100)
-                                # rgbReturned = colorsys.hsv_to_rgb(huetoSet / 360.0, saturationtoSet / 100.0, 1)
-                                if self.debug2:
-                                    self.logger.debug("Found updated Red/Green/Blue Level & Converted/Returned HSV data: {}".format(hsvReturned))
-                                if len(hsvReturned) >= 1:
-                                    self.device_list_internal[checkindex]["accessory"].Hue.set_value(hsvReturned[0] * 360)
-                                    self.device_list_internal[checkindex]["accessory"].Saturation.set_value(hsvReturned[1] * 100)
-                            elif "whiteTemperature" in updated_device.states:
-                                if updated_device.supportsWhiteTemperature:
-                                ## add check for whiteTemp supported - although won't be picked up by Hue...
-                                    if updated_device.states["whiteTemperature"] != original_device.states["whiteTemperature"]:
-                                        ## colortemp changed.
-                                        mired = HKutils.color_temperature_kelvin_to_mired(updated_device.states["whiteTemperature"])
-                                        if self.debug2:
-                                            self.logger.debug("Found WhiteTemp Changed, converting to mired == {}".format(mired))
-                                        hue, saturation = HKutils.color_temperature_to_hs(HKutils.color_temperature_mired_to_kelvin(mired))
-                                        self.device_list_internal[checkindex]["accessory"].Hue.set_value(round(hue, 0))
-                                        self.device_list_internal[checkindex]["accessory"].Saturation.set_value(round(saturation, 0))
-                                        ## check for device state change in colorMode - below checks hue ?
-                                        ## Not sure others - if not present will delay inteface update
-                                        self.device_list_internal[checkindex]["accessory"].char_color_temp.set_value(round(mired, 0))
-                            ## if huebulb and colorMode change notify
-                            if "colorMode" in updated_device.states:
-                                if updated_device.supportsWhiteTemperature and updated_device.supportsRGB:
-                                    if updated_device.states["colorMode"] != original_device.states["colorMode"]:
-                                        ## there has been a change in color mode
-                                        ## should update
-                                        if self.debug2:
-                                            self.logger.debug("ColorMode has changed sending Notify to Hue,Sat, and ColorTemp.  New Mode {}".format(updated_device.states["colorMode"]))
-                                        self.device_list_internal[checkindex]["accessory"].Hue.notify()
-                                        self.device_list_internal[checkindex]["accessory"].Saturation.notify()
-                                        self.device_list_internal[checkindex]["accessory"].char_color_temp.notify()
-
-                if "onOffState" in updated_device.states and str(updateddevice_subtype) not in ("Blind", "Window","Door","TemperatureSensor", "HumiditySensor", "LightSensor"):   ## work around to remnove this TODO
-                    if updated_device.states['onOffState'] != original_device.states['onOffState']:
-                        newstate = updated_device.states["onOffState"]
-                        if self.debug2:
-                            self.logger.debug("onOffState Check: NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
-                        if this_is_debug_device:
-                            self.logger.warning("onOffState Check: NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
-                        self.device_list_internal[checkindex]["accessory"].char_on.set_value(newstate)
-
-        except (AttributeError):
-            self.logger.info(f"HomekitLink Published Device: {original_device.name} caused a Nonetype error, this usually means device, or entire bridge has not correctly started.")
-            self.logger.debug("Caught exception in Device Update", exc_info=True)
-        except:
-            self.logger.debug("Caught exception in Device Update", exc_info=True)
+                                self.logger.debug("ColorMode has changed sending Notify to Hue,Sat, and ColorTemp.  New Mode {}".format(updated_device.states["colorMode"]))
+                            entry["accessory"].Hue.notify()
+                            entry["accessory"].Saturation.notify()
+                            entry["accessory"].char_color_temp.notify()
+
+    def _updated_onoff(self, entry, original_device, updated_device, this_is_debug_device):
+        ## Generic onOffState to char_on - all types except coverings and analog sensors
+        if updated_device.states['onOffState'] != original_device.states['onOffState']:
+            newstate = updated_device.states["onOffState"]
+            if self.debug2:
+                self.logger.debug("onOffState Check: NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+            if this_is_debug_device:
+                self.logger.warning("onOffState Check: NewState of Device:{} & State: {} ".format(updated_device.name, newstate))
+            entry["accessory"].char_on.set_value(newstate)
         ## Motion Detected
 
     ## TODO consider move to Que model and thread setter out
@@ -2755,7 +2894,7 @@ class Plugin(indigo.PluginBase):
             if self.debug4:
                 self.logger.debug("Plugin getter Called: Indigo DeviceID {} State {} ".format(accessoryself.indigodeviceid, statetoGet))
 
-            indigodevice = indigo.devices[accessoryself.indigodeviceid]
+            indigodevice = self.state_cache.get(int(accessoryself.indigodeviceid))
 
             if statetoGet in ("temperature", "SensorLeak", "humidity", "LightLevel", "sensorOccupancy", "motionSensor","sensorSmoke", "SensorCarbonDioxide", "SensorCarbonMonoxide", "sensorContactSensor"):  ## this could actually be a number of options..
                 ## attempt to get temperature
@@ -2763,9 +2902,9 @@ class Plugin(indigo.PluginBase):
                 ## now where is that saved device info gone...
                 ## should remain in internal device list, iter that and pull the Sensor state using...
                 ## Can use this for every sensor -- will need to check for correct values otherwise HK == crash
-                checkindex = next((i for i, item in enumerate(self.device_list_internal) if item["deviceid"] == indigodevice.id), None)
-                if checkindex != None:
-                    sensortouse = self.device_list_internal[checkindex]["devicesensor"]
+                internal_item = self.device_list_internal.get(indigodevice.id)
+                if internal_item != None:
+                    sensortouse = internal_item["devicesensor"]
                 else:
                     self.logger.debug("Plugin getter Called: Indigo DeviceID {} State {} ".format(accessoryself.indigodeviceid, statetoGet))
                     return
@@ -3042,14 +3181,14 @@ class Plugin(indigo.PluginBase):
             if self.debug4:
                 self.logger.debug("Inital at Start: Setting up Accessory {}".format(accessoryself.indigodeviceid))
 
-            check = next((i for i, item in enumerate(self.device_list_internal) if item["deviceid"] == accessoryself.indigodeviceid), None)
-            # check=  next((item for item in self.device_list_internalif item["deviceid"] == ), False)
-            if check != None:
-                # self.logger.info("Found Key= {}".format(check))
-                self.device_list_internal[check]["accessory"] = accessoryself
+            internal_item = self.device_list_internal.get(accessoryself.indigodeviceid)
+            if internal_item != None:
+                internal_item["accessory"] = accessoryself
                 # below doesn't catch those without callback == temp sensors - but they still need callback...
-                self.runningAccessoryCount = self.runningAccessoryCount + 1
-                self.running_deviceids.append(accessoryself.indigodeviceid)
+                ## bridges are built concurrently at startup, so the count is updated under the bridge start lock
+                with self.bridge_start_lock:
+                    self.runningAccessoryCount = self.runningAccessoryCount + 1
+                    self.running_deviceids.append(accessoryself.indigodeviceid)
                 ## if checking and camera, add callback if DoorBell Accessory exists to same accessory as Camera...
                 self.logger.debug("{}".format(accessoryself.services))
                 check_doorbell = None
@@ -3063,10 +3202,10 @@ class Plugin(indigo.PluginBase):
                     self.logger.debug("Found Doorbell Service {}".format(accessoryself))
                     if accessoryself.doorbellID != None:
                         self.logger.debug("Found DoorBell ID in Accessory. = {} \nSearching self.device_list_internal for it..".format(accessoryself.doorbellID))
-                        doorbell_ID_Found = next((i for i, item in enumerate(self.device_list_internal) if item["deviceid"] == int(accessoryself.doorbellID)), None)
-                        if doorbell_ID_Found != None:
+                        doorbell_item = self.device_list_internal.get(int(accessoryself.doorbellID))
+                        if doorbell_item != None:
                             self.logger.debug(f"Check DoorBell Found: id: {accessoryself.doorbellID}")
-                            self.device_list_internal[doorbell_ID_Found]["accessory"] = accessoryself
+                            doorbell_item["accessory"] = accessoryself
                             self.running_deviceids.append(accessoryself.doorbellID)
 
                 if self.debug4:
@@ -3256,20 +3395,17 @@ class Plugin(indigo.PluginBase):
                 self.logger.debug("Action Device list Generator:\n valuesDict {} \n typeId {}".format(valuesDict, typeId))
 
             if devicetype !="":
-                for num in range(0, len(self.running_deviceids)):
-                    device = self.return_deviceorAG(self.running_deviceids[num])
-                    device_props = dict(device.pluginProps)
-                    devicename = device_props.get("homekit-name", "")
-                    deviceType = device_props.get("HomeKit_deviceSubtype", "")
-                    devicesensor = device_props.get("HomeKit_deviceSensor", "")
-                    try:
-                        deviceBridgeID = int(device_props.get("HomeKit_bridgeUniqueID", 99))
-                    except ValueError:
-                        deviceBridgeID = 99
+                ## the internal list already has name, subtype and bridge of every running accessory
+                for deviceid in self.running_deviceids:
+                    item = self.device_list_internal.get(deviceid)
+                    if item == None:
+                        continue
+                    devicename = item["devicename"]
+                    deviceType = item["subtype"]
                     if self.debug11:
-                        self.logger.debug("Bridge: {0:<20}: Indigo Id: {1:<20} Name: {2:<50} DeviceName: {3:<40} Type: {4:<20}".format(deviceBridgeID, device.id, device.name, devicename, deviceType))
+                        self.logger.debug("Bridge: {0:<20}: Indigo Id: {1:<20} DeviceName: {2:<40} Type: {3:<20}".format(item["bridgeID"], deviceid, devicename, deviceType))
                     if deviceType=="BlueIrisCamera" or deviceType=="SecuritySpyCamera":
-                        camera_device_list.append( (device.id, devicename))
+                        camera_device_list.append( (deviceid, devicename))
 
             if devicetype == "camera_doorbell":
                 return camera_device_list
@@ -3296,32 +3432,27 @@ class Plugin(indigo.PluginBase):
                 self.logger.info("DeviceId incorrect.  Please check menu items")
                 return
 
-            if int(deviceId) not in self.device_list_internal_idonly:
+            if int(deviceId) not in self.device_list_internal:
                 self.logger.info("Selected Device not in internal HomeKitLinkSiri database.  ? Selected device no longer active, enabled, or running")
                 return
 
-            checkindex = next((i for i, item in enumerate(self.device_list_internal) if item["deviceid"] == int(deviceId)), None)
-
-            if checkindex != None:
-                homekit_name = self.device_list_internal[checkindex]["devicename"]
-                if self.debug11:
-                    self.logger.debug(f"CheckIndex has found device with result {checkindex=}")
-                if type_device=="camera_doorbell":
-                    self.logger.info(f"Activating Camera DoorBell Notification in Home App, for Home device {homekit_name}")
-                    self.device_list_internal[checkindex]["accessory"]._char_doorbell_detected.set_value(0)
-                    self.device_list_internal[checkindex]["accessory"]._char_doorbell_detected_switch.set_value(0)
-                    return
-                elif type_device=="camera_motion_true":
-                    self.logger.info(f"Setting Motion to Detected with Home Camera, for Home device {homekit_name}")
-                    self.device_list_internal[checkindex]["accessory"].char_motion_detected.set_value(1)
-                    return
-                elif type_device=="camera_motion_false":
-                    self.logger.info(f"Setting Motion to False with Home Camera, for Home device {homekit_name}")
-                    self.device_list_internal[checkindex]["accessory"].char_motion_detected.set_value(0)
-                    return
+            checkindex = int(deviceId)
 
-            else:
-                self.logger.info(f"Device not able to be found.  ? Not running successfully in Homekit Plugin.")
+            homekit_name = self.device_list_internal[checkindex]["devicename"]
+            if self.debug11:
+                self.logger.debug(f"CheckIndex has found device with result {checkindex=}")
+            if type_device=="camera_doorbell":
+                self.logger.info(f"Activating Camera DoorBell Notification in Home App, for Home device {homekit_name}")
+                self.device_list_internal[checkindex]["accessory"]._char_doorbell_detected.set_value(0)
+                self.device_list_internal[checkindex]["accessory"]._char_doorbell_detected_switch.set_value(0)
+                return
+            elif type_device=="camera_motion_true":
+                self.logger.info(f"Setting Motion to Detected with Home Camera, for Home device {homekit_name}")
+                self.device_list_internal[checkindex]["accessory"].char_motion_detected.set_value(1)
+                return
+            elif type_device=="camera_motion_false":
+                self.logger.info(f"Setting Motion to False with Home Camera, for Home device {homekit_name}")
+                self.device_list_internal[checkindex]["accessory"].char_motion_detected.set_value(0)
                 return
         except:
             self.logger.exception(f"Caught Exception with Action Notification.")
@@ -3330,9 +3461,8 @@ class Plugin(indigo.PluginBase):
         try:
             unassigned_device_list = []
             assigned_device_list = []
-            for device in indigo.devices:
-                if "onOffState" in device.states:  # for doorbell only use onOffState devices
-                    unassigned_device_list.append((device.id, device.name))
+            for entry in self.device_catalog.category("doorbell"):  # for doorbell only use onOffState devices
+                unassigned_device_list.append((entry.id, entry.name))
             unassigned_device_list.sort(key=lambda x: x[1])
             assigned_device_list.sort(key=lambda x: x[1])
             device_list = []
@@ -3408,6 +3538,7 @@ class Plugin(indigo.PluginBase):
             assigned_another_bridgelist = []  # seperate out devices published by another bridge.
             isdevorAG = valuesDict.get("selectdevice_or_AG", "device")
             NametoUse = "Devices"
+            menu_names = {"device": "Devices", "BI_camera": "Blue Iris Cameras", "lights": "Lights", "SS_camera": "Security Spy Cameras", "switch": "Relays", "sensor": "Sensors"}
             try:
                 bridgeuniqueID = int(valuesDict.get("bridgeUniqueID", 99))
             except ValueError:
@@ -3415,23 +3546,7 @@ class Plugin(indigo.PluginBase):
 
             if self.debug8:
                 self.logger.debug("Device list Generator:\n valuesDict {} \n typeId {}".format(valuesDict, typeId))
-            if isdevorAG == "device":
-                NametoUse = "Devices"
-                for device in indigo.devices:
-                    if device.id in self.device_list:
-                        device_name = device.name
-                        ## is assigned to a bridgeget bridge it is assigned to
-                        try:
-                            bridgeassigned = int(device.pluginProps.get("HomeKit_bridgeUniqueID", 99))  ## shouldnt ever =99
-                        except ValueError:
-                            bridgeassigned = 99
-                        if int(bridgeassigned) == bridgeuniqueID:  ## device assigned to this bridge can access
-                            assigned_device_list.append((device.id, device_name))
-                        else:  ## assigned but by another Bridge.
-                            assigned_another_bridgelist.append((device.id, "%%disabled:" + "Bridge Id: " + str(bridgeassigned) + " " + str(device_name) + ":%%"))  ## disabled selection
-                    else:
-                        unassigned_device_list.append((device.id, device.name))
-            elif isdevorAG == "action_group":
+            if isdevorAG == "action_group":
                 NametoUse = "Action Groups"
                 for actionGroup in indigo.actionGroups:
                     if actionGroup.id in self.device_list:
@@ -3447,108 +3562,17 @@ class Plugin(indigo.PluginBase):
                             assigned_another_bridgelist.append((actionGroup.id, "%%disabled:" + "Bridge Id: " + str(bridgeassigned) + " " + (actionG_name) + ":%%"))  ## disabled selection
                     else:
                         unassigned_device_list.append((actionGroup.id, actionGroup.name))
-            elif isdevorAG == "BI_camera":
-                NametoUse = "Blue Iris Cameras"
-                for device in indigo.devices:
-                    if device.pluginId == "com.GlennNZ.indigoplugin.BlueIris":
-                        # self.logger.info("{}".format(device.model) )
-                        if device.model == "BlueIris Camera":
-                            if device.id in self.device_list:
-                                device_name = device.name
-                                try:
-                                    bridgeassigned = int(device.pluginProps.get("HomeKit_bridgeUniqueID", 99))  ## shouldnt ever =99
-                                except ValueError:
-                                    bridgeassigned = 99  ## shouldnt ever =99
-                                if int(bridgeassigned) == bridgeuniqueID:  ## device assigned to this bridge can access
-                                    assigned_device_list.append((device.id, device_name))
-                                else:  ## assigned but by another Bridge.
-                                    assigned_another_bridgelist.append((device.id, "%%disabled:" + "Bridge Id: " + str(bridgeassigned) + " " + str(device_name) + ":%%"))  ## disabled selection
-                            else:
-                                unassigned_device_list.append((device.id, device.name))
-            elif isdevorAG == "lights":
-                NametoUse = "Lights"
-                for device in indigo.devices:
-                    if hasattr(device, "brightness"):
-                        if device.id in self.device_list:
-                            device_name = device.name
-                            try:
-                                bridgeassigned = int(device.pluginProps.get("HomeKit_bridgeUniqueID", 99))  ## shouldnt ever =99
-                            except ValueError:
-                                bridgeassigned = 99  ## shouldnt ever =99
-                            if int(bridgeassigned) == bridgeuniqueID:  ## device assigned to this bridge can access
-                                assigned_device_list.append((device.id, device_name))
-                            else:  ## assigned but by another Bridge.
-                                assigned_another_bridgelist.append((device.id, "%%disabled:" + "Bridge Id: " + str(bridgeassigned) + " " + str(device_name) + ":%%"))  ## disabled selection
-                        else:
-                            unassigned_device_list.append((device.id, device.name))
-            elif isdevorAG == "SS_camera":
-                NametoUse = "Security Spy Cameras"
-                for device in indigo.devices:
-                    if device.pluginId == "org.cynic.indigo.securityspy":
-                        # self.logger.info("{}".format(device.model) )
-                        if device.model == "Camera":
-                            if device.id in self.device_list:
-                                device_name = device.name
-                                try:
-                                    bridgeassigned = int(device.pluginProps.get("HomeKit_bridgeUniqueID", 99))
-                                except ValueError:
-                                    bridgeassigned = 99
-                                ## shouldnt ever =99
-                                if int(bridgeassigned) == bridgeuniqueID:  ## device assigned to this bridge can access
-                                    assigned_device_list.append((device.id, device_name))
-                                else:  ## assigned but by another Bridge.
-                                    assigned_another_bridgelist.append((device.id, "%%disabled:" + "Bridge Id: " + str(bridgeassigned) + " " + (device_name) + ":%%"))  ## disabled selection
-                            else:
-                                unassigned_device_list.append((device.id, device.name))
-                    elif device.pluginId == "com.flyingdiver.indigoplugin.securityspy":
-                        # self.logger.info("{}".format(device.model) )
-                        if device.model == "SecuritySpy Camera":
-                            if device.id in self.device_list:
-                                device_name = device.name
-                                try:
-                                    bridgeassigned = int(device.pluginProps.get("HomeKit_bridgeUniqueID", 99)) ## shouldnt ever =99
-                                except ValueError:
-                                    bridgeassigned = 99
-                                if int(bridgeassigned) == bridgeuniqueID:  ## device assigned to this bridge can access
-                                    assigned_device_list.append((device.id, device_name))
-                                else:  ## assigned but by another Bridge.
-                                    assigned_another_bridgelist.append((device.id, "%%disabled:" + "Bridge Id: " + str(bridgeassigned) + " " + (device_name) + ":%%"))  ## disabled selection
-                            else:
-                                unassigned_device_list.append((device.id, device.name))
-            elif isdevorAG == "switch":
-                NametoUse = "Relays"
-                for device in indigo.devices:
-                    if type(device) == indigo.RelayDevice:  ## use relay
-                        if device.id in self.device_list:
-                            device_name = device.name
-                            ## is assigned to a bridgeget bridge it is assigned to
-                            try:
-                                bridgeassigned = int(device.pluginProps.get("HomeKit_bridgeUniqueID", 99) ) ## shouldnt ever =99
-                            except ValueError:
-                                bridgeassigned = 99
-                            if int(bridgeassigned) == bridgeuniqueID:  ## device assigned to this bridge can access
-                                assigned_device_list.append((device.id, device_name))
-                            else:  ## assigned but by another Bridge.
-                                assigned_another_bridgelist.append((device.id, "%%disabled:" + "Bridge Id: " + str(bridgeassigned) + " " + str(device_name) + ":%%"))  ## disabled selection
-                        else:
-                            unassigned_device_list.append((device.id, device.name))
-            elif isdevorAG == "sensor":
-                NametoUse = "Sensors"
-                for device in indigo.devices:
-                    if type(device) == indigo.SensorDevice:  ## use relay
-                        if device.id in self.device_list:
-                            device_name = device.name
-                            ## is assigned to a bridgeget bridge it is assigned to
-                            try:
-                                bridgeassigned = int(device.pluginProps.get("HomeKit_bridgeUniqueID", 99) )## shouldnt ever =99
-                            except ValueError:
-                                bridgeassigned = 99  ## shouldnt ever =99
-                            if int(bridgeassigned) == bridgeuniqueID:  ## device assigned to this bridge can access
-                                assigned_device_list.append((device.id, device_name))
-                            else:  ## assigned but by another Bridge.
-                                assigned_another_bridgelist.append((device.id, "%%disabled:" + "Bridge Id: " + str(bridgeassigned) + " " + str(device_name) + ":%%"))  ## disabled selection
-                        else:
-                            unassigned_device_list.append((device.id, device.name))
+            elif isdevorAG in menu_names:
+                NametoUse = menu_names[isdevorAG]
+                ## sorted by name already, from the catalog rather than a pass over indigo.devices
+                for entry in self.device_catalog.category(isdevorAG):
+                    if entry.id in self.device_list:
+                        if entry.bridge == bridgeuniqueID:  ## device assigned to this bridge can access
+                            assigned_device_list.append((entry.id, entry.name))
+                        else:  ## assigned but by another Bridge.
+                            assigned_another_bridgelist.append((entry.id, "%%disabled:" + "Bridge Id: " + str(entry.bridge) + " " + str(entry.name) + ":%%"))  ## disabled selection
+                    else:
+                        unassigned_device_list.append((entry.id, entry.name))
 
             unassigned_device_list.sort(key=lambda x: x[1])
             assigned_device_list.sort(key=lambda x: x[1])
@@ -3586,12 +3610,23 @@ class Plugin(indigo.PluginBase):
         #
 
     def detectHomeKitType(self, objId):
+        ## memoized per device id and lastChanged, deviceUpdated drops it once the device changes
+        detected = self.device_catalog.homekit_type(objId)
+        if detected != None:
+            return detected
+        dev = self.return_deviceorAG(objId)
+        if dev == None:
+            return None
+        detected = self.classifyHomeKitType(dev)
+        if detected != None:
+            self.device_catalog.remember_homekit_type(dev, detected)
+        return detected
+
+    def classifyHomeKitType(self, dev):
         try:
-            if objId in indigo.actionGroups:
+            if type(dev) == indigo.ActionGroup:
                 return "service_Switch"
 
-            dev = indigo.devices[objId]
-
             if dev.pluginId == "com.perceptiveautomation.indigoplugin.zwave" and dev.deviceTypeId == "zwLockType":
                 return "service_LockMechanism"
 
@@ -3920,17 +3955,17 @@ class Plugin(indigo.PluginBase):
                 device_props["HomeKit_audioSelector"] = ""
                 try:
                     self.device_list.remove(device.id)  ## not good to just remove here and internal list no longer deleted.
-                    checkindex = next((i for i, item in enumerate(self.device_list_internal) if item["deviceid"] == device.id), None)
-                    if checkindex != None:
-                        self.logger.info("Deleting item:{}".format(self.device_list_internal[checkindex]))
-                        del self.device_list_internal[checkindex]
-                        if device.id in self.device_list_internal_idonly:
-                            self.device_list_internal_idonly.remove(device.id)
+                    removed_item = self.device_list_internal.remove(device.id)
+                    if removed_item != None:
+                        self.logger.info("Deleting item:{}".format(removed_item))
                     self.logger.info("Given just unpublished device to HomeKit, Bridge will need to be restarted for changes to take effect")
                 except:
                     self.logger.debug("device_list remove error, Exception\n", exc_info=True)
             self.logger.debug(u"saving plugin props: \n{}".format(device_props))
             device.replacePluginPropsOnServer(indigo.Dict(device_props))
+            if type(device) != indigo.ActionGroup:
+                ## menus reopened before deviceUpdated arrives should show the new bridge
+                self.device_catalog.updated(device)
 
             if publication_change:
                 if values_dict["enablePublishFields"]:
@@ -3953,12 +3988,56 @@ class Plugin(indigo.PluginBase):
     ########################################
     def show_internallist(self, *args, **kwargs):
         # Write all published devices to the event log with their friendly name
-        self.logger.info(u"{0:=^165}".format(" self device_list_internal_idonly "))
-        for device in self.device_list_internal_idonly:
+        self.logger.info(u"{0:=^165}".format(" self device_list_internal ids "))
+        for device in self.device_list_internal.ids():
             self.logger.info(f"{device}")
         self.logger.info(u"{0:=^165}".format(" self device_list_internal "))
         for device in self.device_list_internal:
             self.logger.info(f"{device}")
+        self.logger.info(u"{0:=^165}".format(" by Bridge / Subtype "))
+        for bridgeid in self.device_list_internal.bridges():
+            self.logger.info(f"Bridge {bridgeid}: {len(self.device_list_internal.for_bridge(bridgeid))} devices")
+        for subtype in self.device_list_internal.subtypes():
+            self.logger.info(f"Subtype {subtype}: {len(self.device_list_internal.for_subtype(subtype))} devices")
+        self.show_statecache()
+
+    def start_camera_warm_pool(self):
+        if not self.camera_warm_pool_enabled or self.camera_warm_pool != None:
+            return
+        self.camera_warm_pool = WarmPool(str(self.ffmpeg_command_line), size=self.camera_warm_pool_size, idle_timeout=self.camera_warm_pool_idle)
+        self.logger.info(f"Camera warm pool started, up to {self.camera_warm_pool_size} cameras kept connected.")
+        for camera in self.listofenabledcameras:
+            ## doorbells and listed priority cameras are always kept warm
+            if "DoorBell_ID" in camera or HKSnapshotFetcher.camera_name(camera) in self.camera_warm_priority:
+                self.camera_warm(camera, pinned=True)
+
+    def camera_warm(self, camera, pinned=False):
+        if self.camera_warm_pool == None or not camera.get("stream_source"):
+            return
+        self.camera_warm_pool.warm(HKSnapshotFetcher.camera_name(camera), ["-rtsp_transport", "tcp", "-i", camera["stream_source"]], pinned=pinned)
+
+    def camera_warm_input(self, camera):
+        ## local input for start_stream if this camera has a warm source ready, else None
+        if self.camera_warm_pool == None:
+            return None
+        return self.camera_warm_pool.input_for(HKSnapshotFetcher.camera_name(camera))
+
+    def get_default_snapshot(self):
+        ## packaged placeholder image, read once
+        if self.default_snapshot == None:
+            with open(self.pluginPath + "/cameras/snapshot.jpg", 'rb') as f:
+                self.default_snapshot = f.read()
+        return self.default_snapshot
+
+    def show_statecache(self, *args, **kwargs):
+        stats = self.state_cache.stats()
+        self.logger.info(u"{0:=^165}".format(" Getter State Cache "))
+        self.logger.info(f"Devices cached: {stats['devices']}  TTL: {self.state_cache.ttl} seconds")
+        self.logger.info(f"Hits: {stats['hits']}  Stale hits: {stats['stale']}  Misses: {stats['misses']}  Hit rate: {stats['hit_rate']:.1%}")
+        self.logger.info(f"Background refreshes: {stats['refreshes']}  Refresh errors: {stats['refresh_errors']}")
+        stats = self.snapshot_store.stats()
+        self.logger.info(u"{0:=^165}".format(" Camera Snapshot Cache "))
+        self.logger.info(f"Images: {stats['images']}  Using {stats['bytes'] / 1048576:.1f} of {stats['max_bytes'] / 1048576:.0f} MB  Hits: {stats['hits']}  Misses: {stats['misses']}  Evictions: {stats['evictions']}")
     ####
 
     def bridgeListGenerator(self, filter="", valuesDict=None, typeId="", targetId=0):
@@ -4530,7 +4609,7 @@ class Plugin(indigo.PluginBase):
                     deviceBridgeID = 99
                 self.logger.info("Bridge: {0:<20}: Indigo Id: {1:<20} Name: {2:<50} DeviceName: {3:<40} Type: {4:<20}".format(deviceBridgeID, device.id, device.name, devicename, deviceType))
 
-        missing_id = list(set(self.device_list_internal_idonly).difference(self.running_deviceids))
+        missing_id = list(set(self.device_list_internal.ids()).difference(self.running_deviceids))
         if len(missing_id) >0:
             self.logger.info(u"{0:=^190}".format(""))
             self.logger.info(u"{0:=^190}".format(" Enabled Bridge, yet not Running Devices "))
@@ -4596,7 +4675,6 @@ class Plugin(indigo.PluginBase):
             info summary line. If False, uses info level for results.
         """
         import json
-        import subprocess
 
         log = self.logger.debug if debug_only else self.logger.info
 
@@ -4614,7 +4692,23 @@ class Plugin(indigo.PluginBase):
             log("Camera Stream Compatibility Check")
             log("=" * 100)
 
+        ## Cameras with a valid cached result aren't probed again - unless run from the menu
+        to_probe = []
         for cam in self.listofenabledcameras:
+            if not cam.get("stream_source", ""):
+                log("[%s] No stream_source configured — skipping.", cam.get("cameraName", cam.get("BI_name", cam.get("SS_name", "Unknown"))))
+                continue
+            if debug_only and self.ffprobe_service.apply(cam):
+                continue
+            to_probe.append(cam)
+        if debug_only:
+            self.logger.debug(f"ffprobe: {len(self.listofenabledcameras) - len(to_probe)} cameras from cache, probing {len(to_probe)}")
+        ## all probes run at once (bounded), analysis below is then just parsing
+        probe_start = t.time()
+        probe_results = self.ffprobe_service.probe_all(ffprobe_bin, to_probe)
+        self.logger.debug(f"ffprobe: probed {len(to_probe)} cameras in {t.time() - probe_start:.1f} seconds")
+
+        for cam in to_probe:
             stream_source = cam.get("stream_source", "")
             cam_name = cam.get("cameraName", cam.get("BI_name", cam.get("SS_name", "Unknown")))
             video_codec_cfg = cam.get("video_codec", "libx264")
@@ -4626,31 +4720,17 @@ class Plugin(indigo.PluginBase):
             cam["ffprobe_video"] = None
             cam["ffprobe_audio"] = None
 
-            if not stream_source:
-                log("[%s] No stream_source configured — skipping.", cam_name)
-                continue
-
             if not debug_only:
                 log("-" * 80)
             log("[%s] Probing: %s", cam_name, stream_source)
 
             # --- Stream info probe ---
-            cmd = [
-                ffprobe_bin,
-                "-rtsp_transport", "tcp",
-                "-v", "error",
-                "-show_entries", "stream=index,codec_name,codec_type,width,height,r_frame_rate,pix_fmt,profile,level,sample_rate,channels,channel_layout",
-                "-of", "json",
-                "-i", stream_source,
-            ]
-
-            try:
-                result = subprocess.run(cmd, capture_output=True, timeout=15)
-            except subprocess.TimeoutExpired:
+            result = probe_results[id(cam)]
+            if result.error == "timeout":
                 self.logger.error("[%s] ffprobe timed out after 15 seconds.", cam_name)
                 continue
-            except Exception:
-                self.logger.exception("[%s] Failed to run ffprobe.", cam_name)
+            elif result.error != None:
+                self.logger.error("[%s] Failed to run ffprobe. %s", cam_name, result.error)
                 continue
 
             if result.returncode != 0:
@@ -4678,63 +4758,12 @@ class Plugin(indigo.PluginBase):
                 elif s.get("codec_type") == "audio" and audio_stream is None:
                     audio_stream = s
 
-            # --- GOP detection (read a few seconds of frames) ---
             # --- GOP detection ---
+            # fps needed here too, for GOP length when packets have no timestamps
             gop_frames = None
             gop_seconds = None
-            if video_stream:
-                gop_cmd = [
-                    ffprobe_bin,
-                    "-rtsp_transport", "tcp",
-                    "-v", "error",
-                    "-select_streams", "v:0",
-                    "-show_entries", "packet=flags,pts_time,dts_time",
-                    "-of", "csv=p=0",
-                    "-read_intervals", "%+5",
-                    "-i", stream_source,
-                ]
-                try:
-                    gop_result = subprocess.run(gop_cmd, capture_output=True, timeout=15)
-                    stdout_text = gop_result.stdout.decode(errors="replace").strip()
-                    if gop_result.returncode == 0 and stdout_text:
-                        lines = stdout_text.splitlines()
-                        keyframe_indices = []
-                        keyframe_times = []
-                        for i, line in enumerate(lines):
-                            parts = [p.strip() for p in line.split(",")]
-                            # CSV order from ffprobe: pts_time, dts_time, flags
-                            # Find which part contains the flags (has K or _)
-                            flags = ""
-                            time_val = None
-                            for p in parts:
-                                if "K" in p or p.startswith("_"):
-                                    flags = p
-                                else:
-                                    if time_val is None and p != "N/A":
-                                        try:
-                                            time_val = float(p)
-                                        except (ValueError, TypeError):
-                                            pass
-
-                            if "K" in flags:
-                                keyframe_indices.append(i)
-                                if time_val is not None:
-                                    keyframe_times.append(time_val)
-
-                        if len(keyframe_indices) >= 2:
-                            gop_frames = keyframe_indices[1] - keyframe_indices[0]
-                            if len(keyframe_times) >= 2:
-                                gop_seconds = round(keyframe_times[1] - keyframe_times[0], 1)
-                            elif v_fps and v_fps > 0:
-                                gop_seconds = round(gop_frames / v_fps, 1)
-                        elif len(keyframe_indices) == 1 and len(lines) > 1:
-                            gop_frames = len(lines)
-                            if v_fps and v_fps > 0:
-                                gop_seconds = round(len(lines) / v_fps, 1)
-                except subprocess.TimeoutExpired:
-                    self.logger.debug("[%s] GOP probe timed out — skipping GOP detection.", cam_name)
-                except Exception:
-                    self.logger.debug("[%s] GOP probe failed — skipping GOP detection.", cam_name, exc_info=True)
+            if video_stream and result.gop_text:
+                gop_frames, gop_seconds = HKffprobe.parse_gop(result.gop_text, HKffprobe.parse_fps(video_stream))
 
             # --- Video analysis ---
             if video_stream:
@@ -4743,12 +4772,7 @@ class Plugin(indigo.PluginBase):
                 v_height = video_stream.get("height", 0)
                 v_profile = video_stream.get("profile", "unknown")
                 v_pix_fmt = video_stream.get("pix_fmt", "unknown")
-                v_fps_raw = video_stream.get("r_frame_rate", "0/1")
-                try:
-                    num, den = v_fps_raw.split("/")
-                    v_fps = round(int(num) / int(den), 1) if int(den) else 0.0
-                except Exception:
-                    v_fps = 0.0
+                v_fps = HKffprobe.parse_fps(video_stream)
 
                 v_can_copy = v_codec == "h264"
                 v_pix_ok = v_pix_fmt == "yuv420p"
@@ -4877,6 +4901,9 @@ class Plugin(indigo.PluginBase):
                     cam["ffprobe_audio"] = {"present": False, "enabled": False}
                     log("[%s]   No audio stream (audio disabled — OK).", cam_name)
 
+            self.ffprobe_service.store(cam)
+        self.ffprobe_service.save()
+
         if not debug_only:
             log("=" * 100)
             log("Camera Stream Check Complete")
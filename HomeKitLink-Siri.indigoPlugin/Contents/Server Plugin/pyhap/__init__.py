@@ -1,3 +1,4 @@
+import importlib.util
 import os
 import logging
 
@@ -10,11 +11,7 @@ SERVICES_FILE = os.path.join(RESOURCE_DIR, "services.json")
 logger = logging.getLogger("Plugin.HomeKit_pyHap")
 # Flag if QR Code dependencies are installed.
 # Installation with `pip install HAP-python[QRCode]`.
-SUPPORT_QR_CODE = True
-try:
-    import base36  # noqa: F401
-    import pyqrcode  # noqa: F401
-
-    SUPPORT_QR_CODE = True
-except ImportError:
-    pass
+# Only looked up here, they are imported when a setup code is made.
+SUPPORT_QR_CODE = all(
+    importlib.util.find_spec(name) is not None for name in ("base36", "pyqrcode")
+)
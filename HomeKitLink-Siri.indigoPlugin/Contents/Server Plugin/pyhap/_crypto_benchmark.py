@@ -0,0 +1,89 @@
+"""Benchmark HAPCrypto.decrypt throughput against the number of frames.
+
+Run with ``python -m pyhap._crypto_benchmark``.  Each body is encrypted into
+HAP frames (1024 byte blocks) and decrypted in one call, by the current
+HAPCrypto.decrypt and by the previous implementation, which trimmed the front
+of the receive buffer and concatenated bytes per block.  The outputs are
+checked to match.
+"""
+import os
+import struct
+import time
+
+from .hap_crypto import HAP_CRYPTO, PACK_NONCE, HAPCrypto
+
+
+def _previous_decrypt(crypto):
+    """HAPCrypto.decrypt as it was, for comparison."""
+    result = b""
+    crypt_in_buffer = crypto._crypt_in_buffer
+    length_length = crypto.LENGTH_LENGTH
+    tag_length = HAP_CRYPTO.TAG_LENGTH
+
+    while len(crypt_in_buffer) > crypto.MIN_BLOCK_LENGTH:
+        block_length_bytes = crypt_in_buffer[:length_length]
+        block_size = struct.unpack("H", block_length_bytes)[0]
+        block_size_with_length = length_length + block_size + tag_length
+        if len(crypt_in_buffer) < block_size_with_length:
+            return result
+        del crypt_in_buffer[:length_length]
+        data_size = block_size + tag_length
+        nonce = PACK_NONCE(crypto._in_count)
+        result += crypto._in_cipher.decrypt(
+            nonce,
+            bytes(crypt_in_buffer[:data_size]),
+            bytes(block_length_bytes),
+        )
+        crypto._in_count += 1
+        del crypt_in_buffer[:data_size]
+    return result
+
+
+def _pair():
+    """An encrypting side and a decrypting side sharing a key."""
+    shared_key = os.urandom(32)
+    sender = HAPCrypto(shared_key)
+    receiver = HAPCrypto(shared_key)
+    # The receiver decrypts with what the sender encrypts with
+    sender._out_cipher = receiver._in_cipher
+    return sender, receiver
+
+
+def _rate(decrypt, frames, rounds):
+    sender, receiver = _pair()
+    bodies = [sender.encrypt(os.urandom(frames * HAPCrypto.MAX_BLOCK_LENGTH)) for _ in range(rounds)]
+    plain = b""
+    start = time.perf_counter()
+    for body in bodies:
+        receiver.receive_data(body)
+        plain = decrypt(receiver)
+    elapsed = time.perf_counter() - start
+    return rounds * frames * HAPCrypto.MAX_BLOCK_LENGTH / elapsed / 1e6, plain
+
+
+def main():
+    # Same frames, split at awkward points, must give the same plaintext
+    sender, receiver = _pair()
+    _, previous = _pair()
+    previous._in_cipher = receiver._in_cipher
+    data = os.urandom(20 * HAPCrypto.MAX_BLOCK_LENGTH + 77)
+    encrypted = sender.encrypt(data)
+    current_out, previous_out = [], []
+    for cut in range(0, len(encrypted), 333):
+        receiver.receive_data(encrypted[cut : cut + 333])
+        current_out.append(receiver.decrypt())
+        previous.receive_data(encrypted[cut : cut + 333])
+        previous_out.append(_previous_decrypt(previous))
+    assert b"".join(current_out) == b"".join(previous_out) == data
+    print("Output matches previous implementation: OK")
+
+    print(f"{'frames':>7} {'previous MB/s':>14} {'current MB/s':>13} {'speedup':>8}")
+    for frames in (1, 8, 64, 256, 1024, 4096):
+        rounds = max(1, 2048 // frames)
+        previous_rate, _ = _rate(_previous_decrypt, frames, rounds)
+        current_rate, _ = _rate(HAPCrypto.decrypt, frames, rounds)
+        print(f"{frames:>7} {previous_rate:>14.1f} {current_rate:>13.1f} {current_rate / previous_rate:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ from pyhap.const import (
     HAP_REPR_VALUE,
     STANDALONE_AID,
 )
+from pyhap.characteristic import ALWAYS_NULL, IMMEDIATE_NOTIFY
 from pyhap.iid_manager import IIDManager
 from pyhap.iid_manager import HomeIIDManager
 from pyhap.iid_manager import AccessoryIIDStorage
@@ -21,8 +22,6 @@ from pyhap.iid_manager import AccessoryIIDStorage
 from pyhap.service import Service
 
 
-import base36
-from pyqrcode import QRCode
 import webbrowser
 
 
@@ -196,6 +195,8 @@ class Accessory:
             int(self.driver.state.pincode.replace(b"-", b""), 10) & 0x7FFFFFFF
         )  # pincode
 
+        import base36  # pylint: disable=import-outside-toplevel
+
         encoded_payload = base36.dumps(payload).upper()
         encoded_payload = encoded_payload.rjust(9, "0")
 
@@ -211,9 +212,12 @@ class Accessory:
 
         return self.iid_manager.get_obj(iid)
 
-    def to_HAP(self):
+    def to_HAP(self, include_value=True):
         """A HAP representation of this Accessory.
 
+        :param include_value: Whether to include characteristic values.
+        :type include_value: bool
+
         :return: A HAP representation of this accessory. For example:
 
         .. code-block:: python
@@ -230,7 +234,7 @@ class Accessory:
         """
         return {
             HAP_REPR_AID: self.aid,
-            HAP_REPR_SERVICES: [s.to_HAP() for s in self.services],
+            HAP_REPR_SERVICES: [s.to_HAP(include_value) for s in self.services],
         }
 
     def setup_message(self):
@@ -241,6 +245,8 @@ class Accessory:
         """
         pincode = self.driver.state.pincode.decode()
         if SUPPORT_QR_CODE:
+            from pyqrcode import QRCode  # pylint: disable=import-outside-toplevel
+
             xhm_uri = self.xhm_uri()
             print(f"Setup payload: {xhm_uri}", flush=True)
             print(
@@ -322,6 +328,37 @@ class Accessory:
         }
         self.driver.publish(acc_data, sender_client_addr, immediate)
 
+    def set_values(self, char_values, sender_client_addr=None):
+        """Set several characteristics and publish the changes together.
+
+        The changed values reach the event loop as one unit, so HomeKit gets them
+        in the same event rather than one wakeup per characteristic.
+
+        :param char_values: Characteristic to new value.
+        :type char_values: dict
+        """
+        datas = []
+        immediate = False
+        for char, value in char_values.items():
+            if char.type_id in ALWAYS_NULL:
+                # Event only characteristics are reset to None, always send on their own
+                char.set_value(value)
+                continue
+            previous_value = char.value
+            char.set_value(value, should_notify=False)
+            if char.value == previous_value or not char.broker:
+                continue
+            immediate = immediate or char.type_id in IMMEDIATE_NOTIFY
+            datas.append(
+                {
+                    HAP_REPR_AID: self.aid,
+                    HAP_REPR_IID: self.iid_manager.get_iid(char),
+                    HAP_REPR_VALUE: char.value,
+                }
+            )
+        if datas:
+            self.driver.publish_many(datas, sender_client_addr, immediate)
+
 
 class Bridge(Accessory):
     """A representation of a HAP bridge.
@@ -371,12 +408,15 @@ class Bridge(Accessory):
 
         self.accessories[acc.aid] = acc
 
-    def to_HAP(self):
+    def to_HAP(self, include_value=True):
         """Returns a HAP representation of itself and all contained accessories.
 
         .. seealso:: Accessory.to_HAP
         """
-        return [acc.to_HAP() for acc in (super(), *self.accessories.values())]
+        return [
+            acc.to_HAP(include_value)
+            for acc in (super(), *self.accessories.values())
+        ]
 
     def get_characteristic(self, aid, iid):
         """.. seealso:: Accessory.to_HAP"""
@@ -17,6 +17,7 @@ the Characteristic does not block waiting for the actual send to happen.
 """
 import asyncio
 import base64
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 import hashlib
 import logging
@@ -29,6 +30,7 @@ import time
 import threading
 
 from zeroconf import ServiceInfo
+from zeroconf import IPVersion
 from zeroconf.asyncio import AsyncZeroconf
 #from zeroconf import InterfaceChoice, IPVersion, ServiceStateChange
 from typing import Optional
@@ -38,13 +40,16 @@ from pyhap.accessory import Accessory, get_topic
 from pyhap.characteristic import CharacteristicError
 from pyhap.const import (
     HAP_PERMISSION_NOTIFY,
+    HAP_PERMISSION_READ,
     HAP_PROTOCOL_SHORT_VERSION,
     HAP_REPR_ACCS,
     HAP_REPR_AID,
     HAP_REPR_CHARS,
     HAP_REPR_IID,
+    HAP_REPR_PERM,
     HAP_REPR_TTL,
     HAP_REPR_PID,
+    HAP_REPR_SERVICES,
     HAP_REPR_STATUS,
     HAP_REPR_VALUE,
     HAP_REPR_WRITE_RESPONSE,
@@ -53,7 +58,7 @@ from pyhap.const import (
 from pyhap.encoder import AccessoryEncoder
 from pyhap.hap_server import HAPServer
 from pyhap.hsrp import Server as SrpServer
-from pyhap.loader import Loader
+from pyhap.loader import get_loader
 from pyhap.params import get_srp_context
 from pyhap.state import State
 
@@ -278,11 +283,12 @@ class AccessoryDriver:
                 executor_opts["thread_name_prefix"] = "SyncWorker"
             self.executor = ThreadPoolExecutor(**executor_opts)
             loop.set_default_executor(self.executor)
-            self.tid = threading.current_thread()
         else:
             logger.debug("Asyncio using Main Thread")
-            self.tid = threading.main_thread()
             self.executor = None
+        # The thread running the loop, set by start() (or BridgeLoop.start_driver).
+        # Until then every publish goes through _queue_events.
+        self.tid = None
 
         logger.debug(f"\n\nInit mDNS: Using interface choices for Zeroconf of {interface_choice=}\n" +
         f"Init mDNS: Using zeroconf_interfaces of {zeroconf_interfaces=}\n" +
@@ -302,7 +308,14 @@ class AccessoryDriver:
         self.persist_file = os.path.expanduser(persist_file)
         self.encoder = encoder or AccessoryEncoder()
         self.topics = {}  # topic: set of (address, port) of subscribed clients
-        self.loader = loader or Loader()
+        # Events published from other threads (Indigo deviceUpdated) queue here and
+        # are drained by the loop in one wakeup.  deque append/popleft are thread safe.
+        self._pending_events = deque()
+        self._pending_events_scheduled = False
+        # Structure of the /accessories response, per aid, see _accessories_structure
+        self._hap_structure = {}
+        self._hap_structure_version = None
+        self.loader = loader or get_loader()
         self.aio_stop_event = None
         self.stop_event = threading.Event()
 
@@ -311,10 +324,13 @@ class AccessoryDriver:
         self.mdns_service_info = None
         self.srp_verifier = None
 
+        self.address = address
         address = address or util.get_local_address()
-        advertised_address = advertised_address or address
         self.state = State(
-            address=advertised_address, mac=mac, pincode=pincode, port=port
+            address=self._advertised_addresses(address),
+            mac=mac,
+            pincode=pincode,
+            port=port,
         )
 
         listen_address = listen_address or address
@@ -336,6 +352,9 @@ class AccessoryDriver:
 
         Pyhap will be stopped gracefully on a KeyBoardInterrupt.
         """
+        # publish() compares the calling thread against tid to decide whether
+        # it is on the loop, and this is the thread that will run it
+        self.tid = threading.current_thread()
         try:
 
             logger.debug("Starting the event loop")
@@ -601,9 +620,64 @@ class AccessoryDriver:
             self.async_send_event(topic, data, sender_client_addr, immediate)
             return
 
-        self.loop.call_soon_threadsafe(
-            self.async_send_event, topic, data, sender_client_addr, immediate
-        )
+        self._queue_events(((topic, data, sender_client_addr, immediate),))
+
+    def publish_many(self, datas, sender_client_addr=None, immediate=False):
+        """Publishes several events together.
+
+        All of the events are handed to the event loop as one unit, so clients
+        never see part of the batch - used to update several characteristics
+        of one accessory at once.
+
+        :param datas: List of data dicts as for `publish`.
+        :type datas: list
+        """
+        events = []
+        for data in datas:
+            topic = get_topic(data[HAP_REPR_AID], data[HAP_REPR_IID])
+            if topic in self.topics:
+                events.append((topic, data, sender_client_addr, immediate))
+        if not events:
+            return
+
+        if threading.current_thread() == self.tid:
+            for event in events:
+                self.async_send_event(*event)
+            return
+
+        self._queue_events(tuple(events))
+
+    def _queue_events(self, events):
+        """Queue events from another thread, waking the loop only if a drain isn't already pending."""
+        self._pending_events.append(events)
+        if not self._pending_events_scheduled:
+            self._pending_events_scheduled = True
+            self.loop.call_soon_threadsafe(self._async_drain_pending_events)
+
+    @callback
+    def _async_drain_pending_events(self):
+        """Send all queued events, keeping only the latest value for each characteristic.
+
+        Must be called in the event loop
+        """
+        # Clear the flag before draining so anything queued from now on
+        # either gets picked up below or schedules its own drain.
+        self._pending_events_scheduled = False
+        pending = self._pending_events
+        coalesced = {}
+        queued = 0
+        while pending:
+            for topic, data, sender_client_addr, immediate in pending.popleft():
+                queued += 1
+                previous = coalesced.pop(topic, None)
+                if previous is not None:
+                    immediate = immediate or previous[2]
+                coalesced[topic] = (data, sender_client_addr, immediate)
+
+        if queued != len(coalesced):
+            logger.debug("Coalesced %s queued events into %s", queued, len(coalesced))
+        for topic, (data, sender_client_addr, immediate) in coalesced.items():
+            self.async_send_event(topic, data, sender_client_addr, immediate)
 
     def async_send_event(self, topic, data, sender_client_addr, immediate):
         """Send an event to a client.
@@ -613,35 +687,17 @@ class AccessoryDriver:
         if self.aio_stop_event.is_set():
             return
 
-        subscribed_clients = self.topics.get(topic, [])
         logger.debug(
-            "Send event: topic(%s), data(%s), sender_client_addr(%s)",
+            "Send event: topic(%s), data(%s), sender_client_addr(%s), immediate(%s)",
             topic,
             data,
             sender_client_addr,
+            immediate,
         )
-        unsubs = []
-        for client_addr in subscribed_clients:
-            if sender_client_addr and sender_client_addr == client_addr:
-                logger.debug(
-                    "Skip sending event to client since "
-                    "its the client that made the characteristic change: %s",
-                    client_addr,
-                )
-                continue
-            logger.debug(
-                "Sending event to client: %s, immediate: %s", client_addr, immediate
-            )
-            pushed = self.http_server.push_event(data, client_addr, immediate)
-            if not pushed:
-                logger.debug(
-                    "Could not send event to %s, probably stale socket.", client_addr
-                )
-                unsubs.append(client_addr)
-                # Maybe consider removing the client_addr from every topic?
-
-        for client_addr in unsubs:
-            self.async_subscribe_client_topic(client_addr, topic, False)
+        # The subscribed clients are looked up when the coalescing window closes,
+        # the event is encoded once for all of them and skips the client that
+        # made the characteristic change.
+        self.http_server.event_fanout.queue(topic, data, sender_client_addr, immediate)
 
     def config_changed(self):
         """Notify the driver that the accessory's configuration has changed.
@@ -651,9 +707,44 @@ class AccessoryDriver:
         to fetch new data.
         """
         self.state.increment_config_version()
+        self.invalidate_accessories_cache()
         self.persist()
         self.update_advertisement()
 
+    def _advertised_addresses(self, local_address=None):
+        """Return the addresses to advertise.
+
+        These are advertised_address, else address, else the local address. Only
+        those of the IP version in interface_choice are kept, unless none are.
+
+        :param local_address: The local address, if already looked up.
+        :type local_address: str
+        """
+        address = (
+            self.advertised_address
+            or self.address
+            or local_address
+            or util.get_local_address()
+        )
+        addresses = [address] if isinstance(address, str) else list(address)
+        if self.interface_choice == IPVersion.V4Only:
+            matching = [addr for addr in addresses if ":" not in addr]
+        elif self.interface_choice == IPVersion.V6Only:
+            matching = [addr for addr in addresses if ":" in addr]
+        else:
+            matching = addresses
+        return matching or addresses
+
+    @callback
+    def async_refresh_addresses(self):
+        """Look up the advertised addresses again, after a network change.
+
+        Must be run in the event loop, call update_advertisement after it to
+        announce them.
+        """
+        self.state.addresses = self._advertised_addresses()
+        logger.debug("Advertised addresses now %s", self.state.addresses)
+
     def update_advertisement(self):
         """Updates the mDNS service info for the accessory."""
         self.loop.call_soon_threadsafe(self.async_update_advertisement)
@@ -784,11 +875,65 @@ class AccessoryDriver:
 
     @property
     def accessories_hash(self):
-        """Hash the get_accessories response to track configuration changes."""
+        """Hash the get_accessories structure to track configuration changes.
+
+        Values are left out, they change all the time and are not configuration.
+        Each accessory is hashed once and its digest kept until the cache is
+        invalidated, the hash is then taken over the digests in aid order.
+        """
         return hashlib.sha512(
-            util.to_sorted_hap_json(self.get_accessories())
+            b"".join(entry[2] for entry in self._accessories_structure())
         ).hexdigest()
 
+    def invalidate_accessories_cache(self, aid=None):
+        """Drop the cached /accessories structure, for one accessory or all.
+
+        Changing the config version does this too, call it directly when an
+        accessory's services or characteristics change without one.
+        """
+        if aid is None:
+            self._hap_structure = {}
+        else:
+            self._hap_structure.pop(aid, None)
+
+    def _accessories_structure(self):
+        """Return (accessory, HAP representation, digest, value slots, unread) per aid.
+
+        The representation is built without values, so without calling any getter,
+        and kept until the config version changes.  Value slots are the
+        (characteristic dict, characteristic) pairs of readable characteristics,
+        for get_accessories to fill in.  Unread starts as every readable
+        characteristic with a getter, get_accessories reads each of them once.
+        """
+        if self._hap_structure_version != self.state.config_version:
+            self._hap_structure = {}
+            self._hap_structure_version = self.state.config_version
+
+        top = self.accessory
+        accessories = [top, *getattr(top, "accessories", {}).values()]
+        structure = {}
+        for acc in accessories:
+            entry = self._hap_structure.get(acc.aid)
+            if entry is None or entry[0] is not acc:
+                # Accessory.to_HAP, a Bridge's own includes every bridged accessory
+                hap_rep = Accessory.to_HAP(acc, include_value=False)
+                slots = [
+                    (char_rep, char)
+                    for service, service_rep in zip(
+                        acc.services, hap_rep[HAP_REPR_SERVICES]
+                    )
+                    for char, char_rep in zip(
+                        service.characteristics, service_rep[HAP_REPR_CHARS]
+                    )
+                    if HAP_PERMISSION_READ in char_rep[HAP_REPR_PERM]
+                ]
+                digest = hashlib.sha512(util.to_sorted_hap_json(hap_rep)).digest()
+                unread = [char for _, char in slots if char.getter_callback]
+                entry = (acc, hap_rep, digest, slots, unread)
+            structure[acc.aid] = entry
+        self._hap_structure = structure
+        return structure.values()
+
     def get_accessories(self):
         """Returns the accessory in HAP format.
 
@@ -812,13 +957,29 @@ class AccessoryDriver:
               ]
            }
 
+        The structure comes from the cache kept by _accessories_structure, with
+        each characteristic's last known value (set by the plugin, or by the
+        last read) filled in.  A characteristic whose value only comes from its
+        getter has its getter called the first time, so its default is never
+        sent; after that set_value and /characteristics reads keep it current.
+
         :rtype: dict
         """
-        hap_rep = self.accessory.to_HAP()
-        if not isinstance(hap_rep, list):
-            hap_rep = [
-                hap_rep,
-            ]
+        hap_rep = []
+        for acc, acc_rep, _, slots, unread in self._accessories_structure():
+            while unread:
+                char = unread.pop()
+                try:
+                    char.get_value()
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception(
+                        "%s: Unexpected error getting value for characteristic %s.",
+                        acc.display_name,
+                        char.display_name,
+                    )
+            for char_rep, char in slots:
+                char_rep[HAP_REPR_VALUE] = char.value
+            hap_rep.append(acc_rep)
         logger.debug("Get accessories response: %s", hap_rep)
         return {HAP_REPR_ACCS: hap_rep}
 
@@ -345,11 +345,15 @@ class Characteristic:
         self.broker.publish(self.value, self, sender_client_addr, immediate)
 
     # pylint: disable=invalid-name
-    def to_HAP(self):
+    def to_HAP(self, include_value=True):
         """Create a HAP representation of this Characteristic.
 
         Used for json serialization.
 
+        :param include_value: Whether to include the current value. Without it
+            the getter is not called and the representation is structure only.
+        :type include_value: bool
+
         :return: A HAP representation.
         :rtype: dict
         """
@@ -368,7 +372,6 @@ class Characteristic:
         ):
             hap_rep[HAP_REPR_DESC] = self.display_name
 
-        value = self.get_value()
         if self.properties[PROP_FORMAT] in HAP_FORMAT_NUMERICS:
             hap_rep.update(
                 {
@@ -385,11 +388,33 @@ class Characteristic:
             max_length = self.properties.get(HAP_REPR_MAX_LEN, DEFAULT_MAX_LENGTH)
             if max_length != DEFAULT_MAX_LENGTH:
                 hap_rep[HAP_REPR_MAX_LEN] = max_length
-        if HAP_PERMISSION_READ in self.properties[PROP_PERMISSIONS]:
-            hap_rep[HAP_REPR_VALUE] = value
+        if include_value and HAP_PERMISSION_READ in self.properties[PROP_PERMISSIONS]:
+            hap_rep[HAP_REPR_VALUE] = self.get_value()
 
         return hap_rep
 
+    def clone(self):
+        """Return a new, unattached copy of this characteristic.
+
+        Used by the Loader to stamp out characteristics from its prebuilt
+        templates without re-parsing the UUID or re-validating properties.
+        Callbacks, broker, service and unique_id are not copied.
+        """
+        char = Characteristic.__new__(type(self))
+        char.broker = None
+        char.allow_invalid_client_values = self.allow_invalid_client_values
+        char.display_name = self.display_name
+        char.properties = self.properties.copy()
+        char.type_id = self.type_id
+        char.value = self.value
+        char.getter_callback = None
+        char.setter_callback = None
+        char.service = None
+        char.unique_id = None
+        char._uuid_str = self._uuid_str
+        char._loader_display_name = self._loader_display_name
+        return char
+
     @classmethod
     def from_dict(cls, name, json_dict, from_loader=False):
         """Initialize a characteristic object from a dict.
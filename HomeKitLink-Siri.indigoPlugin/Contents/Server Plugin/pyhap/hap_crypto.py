@@ -1,6 +1,5 @@
 '''This module partially implements crypto for HAP.'''
 import logging
-import struct
 from functools import partial
 from typing import List
 from struct import Struct
@@ -15,6 +14,7 @@ CRYPTO_BACKEND = default_backend()
 
 PACK_NONCE = partial(Struct("<LQ").pack, 0)
 PACK_LENGTH = Struct("H").pack
+UNPACK_LENGTH = Struct("H").unpack_from
 
 
 class HAP_CRYPTO:
@@ -78,38 +78,45 @@ class HAPCrypto:
         The received full cipher blocks are decrypted and returned and partial cipher
         blocks are buffered locally.
         """
-        result = b""
+        # Walk the buffer by offset, decrypting straight from memoryview slices,
+        # and trim what was consumed once at the end.  Trimming the front of
+        # the bytearray per block made large bodies quadratic in block count.
+        result: List[bytes] = []
         crypt_in_buffer = self._crypt_in_buffer
         length_length = self.LENGTH_LENGTH
         tag_length = HAP_CRYPTO.TAG_LENGTH
+        total = len(crypt_in_buffer)
+        offset = 0
 
-        while len(crypt_in_buffer) > self.MIN_BLOCK_LENGTH:
-            block_length_bytes = crypt_in_buffer[:length_length]
-            block_size = struct.unpack("H", block_length_bytes)[0]
-            block_size_with_length = length_length + block_size + tag_length
-
-            if len(crypt_in_buffer) < block_size_with_length:
-                logger.debug("Incoming buffer does not have the full block")
-                return result
-
-            # Trim off the length
-            del crypt_in_buffer[:length_length]
-
-            data_size = block_size + tag_length
-            nonce = PACK_NONCE(self._in_count)
-
-            result += self._in_cipher.decrypt(
-                nonce,
-                bytes(crypt_in_buffer[:data_size]),
-                bytes(block_length_bytes),
-            )
-
-            self._in_count += 1
-
-            # Now trim out the decrypted data
-            del crypt_in_buffer[:data_size]
-
-        return result
+        view = memoryview(crypt_in_buffer)
+        try:
+            while total - offset > self.MIN_BLOCK_LENGTH:
+                block_size = UNPACK_LENGTH(view, offset)[0]
+                data_start = offset + length_length
+                block_end = data_start + block_size + tag_length
+
+                if total < block_end:
+                    logger.debug("Incoming buffer does not have the full block")
+                    break
+
+                nonce = PACK_NONCE(self._in_count)
+                result.append(
+                    self._in_cipher.decrypt(
+                        nonce,
+                        view[data_start:block_end],
+                        view[offset:data_start],
+                    )
+                )
+
+                self._in_count += 1
+                offset = block_end
+        finally:
+            # The bytearray can't be resized while a view of it exists
+            view.release()
+            if offset:
+                del crypt_in_buffer[:offset]
+
+        return b"".join(result)
 
     def encrypt(self, data: bytes) -> bytes:
         """Encrypt and send the return bytes."""
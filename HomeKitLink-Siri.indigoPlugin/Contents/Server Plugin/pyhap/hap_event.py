@@ -1,7 +1,10 @@
 """This module implements the HAP events."""
+import logging
 
 from .const import HAP_REPR_CHARS
-from .util import to_hap_json
+from .util import callback, to_hap_json
+
+logger = logging.getLogger("Plugin.HomeKit_pyHap")
 
 EVENT_MSG_STUB = (
     b"EVENT/1.0 200 OK\r\n"
@@ -9,6 +12,8 @@ EVENT_MSG_STUB = (
     b"Content-Length: "
 )
 
+EVENT_COALESCE_TIME_WINDOW = 0.5
+
 
 def create_hap_event(data):
     """Creates a HAP HTTP EVENT response for the given data.
@@ -20,3 +25,102 @@ def create_hap_event(data):
     return (
         EVENT_MSG_STUB + str(len(bytesdata)).encode("utf-8") + b"\r\n" * 2 + bytesdata
     )
+
+
+class EventFanout:
+    """Coalesce events for all connections and encode each batch once.
+
+    Events used to be queued on every subscribed connection, and each connection
+    filtered its own queue against the topics and serialized it when its window
+    closed, so the same changes were encoded once per controller.
+
+    Here events are kept for one coalescing window, latest value per topic. When the
+    window closes each client gets the events for the topics it is subscribed to,
+    less those it changed itself. Every distinct set of events is serialized into
+    one EVENT message, and the same bytes are written to each connection that gets
+    that set. Only the encryption is left per connection.
+    """
+
+    def __init__(self, connections, accessory_handler, window=EVENT_COALESCE_TIME_WINDOW):
+        """Create the fan-out for a HAPServer.
+
+        :param connections: The server's (address, port) -> HAPServerProtocol dict.
+        :type connections: dict
+
+        :param accessory_handler: The AccessoryDriver, for its topics.
+        """
+        self.connections = connections
+        self.accessory_handler = accessory_handler
+        self.window = window
+        self.loop = None
+        self._pending = {}  # topic: (data, sender_client_addr)
+        self._timer = None
+        self._flush_soon = False
+        self.payloads = 0
+        self.writes = 0
+
+    @callback
+    def queue(self, topic, data, sender_client_addr=None, immediate=False):
+        """Queue an event for every client subscribed to topic.
+
+        Must be called in the event loop.
+        """
+        self._pending[topic] = (data, sender_client_addr)
+        if immediate:
+            if not self._flush_soon:
+                self._flush_soon = True
+                self.loop.call_soon(self.flush)
+        elif not self._timer:
+            self._timer = self.loop.call_later(self.window, self.flush)
+
+    @callback
+    def flush(self):
+        """Send all pending events, encoding each distinct set of events once."""
+        self._flush_soon = False
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        # Subscriptions are checked now, not when the event was queued,
+        # so clients that unsubscribed in the meantime are left out.
+        topics = self.accessory_handler.topics
+        client_topics = {}
+        for topic, (_, sender_client_addr) in pending.items():
+            for client_addr in topics.get(topic, ()):
+                if client_addr != sender_client_addr:
+                    client_topics.setdefault(client_addr, []).append(topic)
+
+        # Topics are in queue order for every client, so clients that
+        # get the same events have equal keys and share one payload.
+        payloads = {}
+        for client_addr, event_topics in client_topics.items():
+            hap_server_protocol = self.connections.get(client_addr)
+            if hap_server_protocol is None:
+                logger.debug(
+                    "Could not send event to %s, probably stale socket.", client_addr
+                )
+                for topic in event_topics:
+                    self.accessory_handler.async_subscribe_client_topic(
+                        client_addr, topic, False
+                    )
+                continue
+            key = tuple(event_topics)
+            payload = payloads.get(key)
+            if payload is None:
+                payload = payloads[key] = create_hap_event(
+                    [pending[topic][0] for topic in event_topics]
+                )
+                self.payloads += 1
+            hap_server_protocol.write(payload)
+            self.writes += 1
+
+    @callback
+    def cancel(self):
+        """Drop pending events, when the server stops."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._pending.clear()
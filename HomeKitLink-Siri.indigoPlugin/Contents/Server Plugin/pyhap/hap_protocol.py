@@ -13,7 +13,7 @@ from pyhap.accessory import get_topic
 from pyhap.const import HAP_REPR_AID, HAP_REPR_IID
 
 from .hap_crypto import HAPCrypto
-from .hap_event import create_hap_event
+from .hap_event import EVENT_COALESCE_TIME_WINDOW, create_hap_event
 from .hap_handler import HAPResponse, HAPServerHandler
 from .util import async_create_background_task
 
@@ -27,8 +27,6 @@ HIGH_WRITE_BUFFER_SIZE = 2 ** 19
 # reopen homekit.
 IDLE_CONNECTION_TIMEOUT_SECONDS = 90 * 60 * 60
 
-EVENT_COALESCE_TIME_WINDOW = 0.5
-
 
 class HAPServerProtocol(asyncio.Protocol):
     """A asyncio.Protocol implementing the HAP protocol."""
@@ -6,6 +6,7 @@ The HAPServer is the point of contact to and from the world.
 import logging
 import time
 
+from .hap_event import EventFanout
 from .hap_protocol import HAPServerProtocol
 from .util import callback
 
@@ -33,6 +34,7 @@ class HAPServer:
         self._addr_port = addr_port
         self.connections = {}  # (address, port): socket
         self.accessory_handler = accessory_handler
+        self.event_fanout = EventFanout(self.connections, accessory_handler)
         self.server = None
         self._serve_task = None
         self._connection_cleanup = None
@@ -41,6 +43,7 @@ class HAPServer:
     async def async_start(self, loop):
         """Start the http-hap server."""
         self.loop = loop
+        self.event_fanout.loop = loop
         self.server = await loop.create_server(
             lambda: HAPServerProtocol(loop, self.connections, self.accessory_handler),
             self._addr_port[0],
@@ -65,6 +68,7 @@ class HAPServer:
         This method must be run in the event loop.
         """
         self._connection_cleanup.cancel()
+        self.event_fanout.cancel()
         for hap_proto in list(self.connections.values()):
             hap_proto.close()
         self.server.close()
@@ -73,6 +77,9 @@ class HAPServer:
     def push_event(self, data, client_addr, immediate=False):
         """Queue an event to the current connection with the provided data.
 
+        Events for subscribed topics go through event_fanout instead, which
+        encodes them once for all connections.
+
         :param data: The charateristic changes
         :type data: dict
 
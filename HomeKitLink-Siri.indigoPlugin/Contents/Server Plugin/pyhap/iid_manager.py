@@ -4,6 +4,8 @@ import logging
 import tempfile
 import json
 import os
+import sqlite3
+import threading
 from uuid import UUID
 from pyhap.characteristic import Characteristic
 from pyhap.service import Service
@@ -88,15 +90,27 @@ class AccessoryIIDStorage:
     Provide stable allocation of IIDs for the lifetime of an accessory.
     Will generate new ID's, ensure they are unique and store them to make sure they
     persist over reboots.
+
+    With write_behind (default) new allocations only mark the store dirty, it is
+    written by flush() - called once a bridge is built, by a debounce timer
+    IID_MANAGER_SAVE_DELAY seconds after the first unsaved allocation, and
+    with fsync from shutdown().
     """
 
-    def __init__(self, entry_id: str, file_location : str, isDebug : bool) -> None:
+    def __init__(self, entry_id: str, file_location : str, isDebug : bool, write_behind: bool = True) -> None:
         """Create a new iid store."""
         self.allocations: dict[str, dict[str, int]] = {}
         self.allocated_iids: dict[str, list[int]] = {}
         self.entry_id = entry_id
         self.isDebug = isDebug
+        self.write_behind = write_behind
         self.file_name = file_location+"_v"+str(IID_MANAGER_STORAGE_VERSION)
+        self._dirty = False
+        self._flush_timer = None
+        self._lock = threading.RLock()
+        # Held from snapshot to os.replace, so a flush that took an older
+        # snapshot can't land its file after a newer one
+        self._write_lock = threading.Lock()
         logger.debug(f"Init of AccessoryIDStorage")
         if isDebug:
             logger.debug("AccessoryIIDStorage Debuging is enabled.  Changed in pluigin Config Debug9")
@@ -136,25 +150,36 @@ class AccessoryIIDStorage:
             logger.debug(f"IID Get or Allocation:  Allocation Key: {allocation_key}")
 
         aid_str = str(aid)
-        accessory_allocation = self.allocations.setdefault(aid_str, {})
-        accessory_allocated_iids = self.allocated_iids.setdefault(aid_str, [1])
-        if service_hap_type == ACCESSORY_INFORMATION_SERVICE and char_uuid is None:
-            return 1
-        if allocation_key in accessory_allocation:
-            return accessory_allocation[allocation_key]
-        if accessory_allocated_iids:
-            allocated_iid = accessory_allocated_iids[-1] + 1
-        else:
-            allocated_iid = 2
-        accessory_allocation[allocation_key] = allocated_iid
-        accessory_allocated_iids.append(allocated_iid)
+        with self._lock:
+            accessory_allocation, accessory_allocated_iids = self._get_aid_allocations(aid_str)
+            if service_hap_type == ACCESSORY_INFORMATION_SERVICE and char_uuid is None:
+                return 1
+            if allocation_key in accessory_allocation:
+                return accessory_allocation[allocation_key]
+            if accessory_allocated_iids:
+                allocated_iid = accessory_allocated_iids[-1] + 1
+            else:
+                allocated_iid = 2
+            accessory_allocation[allocation_key] = allocated_iid
+            accessory_allocated_iids.append(allocated_iid)
+            self._record_allocation(aid_str, allocation_key, allocated_iid)
 
-        self.persist()
+        if self.write_behind:
+            self._mark_dirty()
+        else:
+            self.persist()
         if self.isDebug:
             logger.debug(f"IID Get or Allocation:  Allocation Key: {allocation_key}, and allocated_iid {allocated_iid}")
 
         return allocated_iid
 
+    def _get_aid_allocations(self, aid_str):
+        """Return (allocation_key -> iid, sorted allocated iids) for an aid.  Called with lock held."""
+        return self.allocations.setdefault(aid_str, {}), self.allocated_iids.setdefault(aid_str, [1])
+
+    def _record_allocation(self, aid_str, allocation_key, allocated_iid):
+        """Hook for backends that store single allocations.  JSON rewrites the whole file in persist."""
+
     def load(self, file_name):
         try:
             with open(file_name, "r", encoding="utf8") as file_handle:
@@ -171,20 +196,71 @@ class AccessoryIIDStorage:
             self.persist()
             return None
 
-    def persist(self):
-        tmp_filename = None
+    def _mark_dirty(self):
+        """Note unsaved allocations and start the debounce timer if one isn't running."""
+        with self._lock:
+            self._dirty = True
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(IID_MANAGER_SAVE_DELAY, self._timer_flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _timer_flush(self):
+        with self._lock:
+            self._flush_timer = None
         try:
-            temp_dir = os.path.dirname(self.file_name)
-            with tempfile.NamedTemporaryFile( mode="w", dir=temp_dir, delete=False) as file_handle:
-                tmp_filename = file_handle.name
-                json.dump(self.allocations, file_handle, ensure_ascii=False, indent=4)
-            os.replace(tmp_filename, self.file_name)
+            self.flush()
         except:
-            logger.exception("Failed to persist accessory state")
-            raise
-        finally:
-            if tmp_filename and os.path.exists(tmp_filename):
-                os.remove(tmp_filename)
+            ## already logged in persist, timer thread has nobody to raise to
+            pass
+
+    def flush(self, fsync: bool = False):
+        """Write allocations to disk if anything changed since the last write."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        self.persist(fsync=fsync)
+        return True
+
+    def shutdown(self):
+        """Final flush, fsync'd so allocations survive a power cut straight after shutdown."""
+        if self.isDebug:
+            logger.debug("AccessoryIIDStorage shutdown, flushing allocations.")
+        self.flush(fsync=True)
+
+    def persist(self, fsync: bool = False):
+        with self._write_lock:
+            tmp_filename = None
+            try:
+                with self._lock:
+                    ## serialise under the lock, allocations may be added from another thread
+                    data = json.dumps(self.allocations, ensure_ascii=False, indent=4)
+                    self._dirty = False
+                temp_dir = os.path.dirname(self.file_name)
+                with tempfile.NamedTemporaryFile( mode="w", dir=temp_dir, delete=False) as file_handle:
+                    tmp_filename = file_handle.name
+                    file_handle.write(data)
+                    if fsync:
+                        file_handle.flush()
+                        os.fsync(file_handle.fileno())
+                os.replace(tmp_filename, self.file_name)
+                if fsync:
+                    dir_fd = os.open(temp_dir or ".", os.O_RDONLY)
+                    try:
+                        os.fsync(dir_fd)
+                    finally:
+                        os.close(dir_fd)
+            except:
+                with self._lock:
+                    self._dirty = True
+                logger.exception("Failed to persist accessory state")
+                raise
+            finally:
+                if tmp_filename and os.path.exists(tmp_filename):
+                    os.remove(tmp_filename)
 
 
 class HomeIIDManager(IIDManager):  # type: ignore[misc]
@@ -215,4 +291,106 @@ class HomeIIDManager(IIDManager):  # type: ignore[misc]
             raise RuntimeError(
                 f"Cannot assign IID {iid} to {obj} as it is already in use by: {self.objs[iid]}"
             )
-        return iid
\ No newline at end of file
+        return iid
+
+
+class SqliteAccessoryIIDStorage(AccessoryIIDStorage):
+    """
+    IID store kept in a sqlite table rather than one JSON file.
+
+    Allocations are read per aid the first time that aid is asked for, so a bridge
+    only loads its own accessories.  New allocations are inserted as single rows,
+    existing entries are never rewritten.  An existing JSON store is imported on
+    first startup and renamed to .migrated.
+    """
+
+    def __init__(self, entry_id: str, file_location : str, isDebug : bool, write_behind: bool = True) -> None:
+        super().__init__(entry_id, file_location, isDebug, write_behind)
+        self.json_file_name = self.file_name
+        self.db_file_name = file_location + ".sqlite"
+        self._conn = None
+        self._pending_rows = []
+
+    def startup(self):
+        with self._lock:
+            self._conn = sqlite3.connect(self.db_file_name, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS allocations ("
+                "aid TEXT NOT NULL, allocation_key TEXT NOT NULL, iid INTEGER NOT NULL, "
+                "PRIMARY KEY (aid, allocation_key)) WITHOUT ROWID"
+            )
+            self._conn.commit()
+            self._migrate_json()
+            self.allocations = {}
+            self.allocated_iids = {}
+        logger.debug(f"Initiated SqliteAccessoryIIDStorage using {self.db_file_name}")
+
+    def _migrate_json(self):
+        """Import the old JSON allocations once, if the table is still empty."""
+        if not os.path.exists(self.json_file_name):
+            return
+        if self._conn.execute("SELECT 1 FROM allocations LIMIT 1").fetchone() is not None:
+            return
+        try:
+            with open(self.json_file_name, "r", encoding="utf8") as file_handle:
+                loaded = json.load(file_handle)
+        except:
+            logger.debug("Exception reading JSON IID file for migration", exc_info=True)
+            return
+        rows = [
+            (aid_str, allocation_key, int(iid))
+            for aid_str, allocations in loaded.items()
+            if isinstance(allocations, dict)
+            for allocation_key, iid in allocations.items()
+        ]
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO allocations VALUES (?, ?, ?)", rows)
+        os.replace(self.json_file_name, self.json_file_name + ".migrated")
+        logger.info(f"Migrated {len(rows)} Accessory IID allocations from JSON storage to sqlite.")
+
+    def _get_aid_allocations(self, aid_str):
+        accessory_allocation = self.allocations.get(aid_str)
+        if accessory_allocation is None:
+            accessory_allocation = dict(
+                self._conn.execute("SELECT allocation_key, iid FROM allocations WHERE aid = ?", (aid_str,)).fetchall()
+            )
+            self.allocations[aid_str] = accessory_allocation
+            self.allocated_iids[aid_str] = sorted(accessory_allocation.values()) or [1]
+            if self.isDebug:
+                logger.debug(f"Loaded {len(accessory_allocation)} IID allocations for aid {aid_str}")
+        return accessory_allocation, self.allocated_iids[aid_str]
+
+    def _record_allocation(self, aid_str, allocation_key, allocated_iid):
+        self._pending_rows.append((aid_str, allocation_key, allocated_iid))
+
+    def persist(self, fsync: bool = False):
+        try:
+            with self._lock:
+                if self._conn is None:
+                    return
+                rows, self._pending_rows = self._pending_rows, []
+                self._dirty = False
+                try:
+                    if rows:
+                        with self._conn:
+                            self._conn.executemany("INSERT OR IGNORE INTO allocations VALUES (?, ?, ?)", rows)
+                except:
+                    self._pending_rows = rows + self._pending_rows
+                    self._dirty = True
+                    raise
+                if fsync:
+                    ## fold the WAL back into the main file so it is all on disk
+                    self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except:
+            logger.exception("Failed to persist accessory IID allocations")
+            raise
+
+    def shutdown(self):
+        super().shutdown()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._conn.close()
+                self._conn = None
@@ -6,15 +6,21 @@ representation.
 The idea is, give a name of a service and you get an
 instance of it (as long as it is described in some
 json file).
+
+The Loader keeps a prebuilt template of every characteristic and service;
+get_char / get_service hand out clones of those, so one shared Loader
+(get_loader) can serve every bridge without re-parsing or re-validating.
 """
 import orjson
 import logging
+import threading
 
 from pyhap import CHARACTERISTICS_FILE, SERVICES_FILE
 from pyhap.characteristic import Characteristic
 from pyhap.service import Service
 
 _loader = None
+_loader_lock = threading.Lock()
 logger = logging.getLogger("Plugin.HomeKit_pyHap")
 
 
@@ -29,6 +35,8 @@ class Loader:
         """Initialize a new Loader instance."""
         self.char_types = self._read_file(path_char)
         self.serv_types = self._read_file(path_service)
+        self._char_templates = {}
+        self._serv_templates = {}
 
     @staticmethod
     def _read_file(path):
@@ -36,23 +44,53 @@ class Loader:
         with open(path, "r", encoding="utf8") as file:
             return orjson.loads(file.read())  # pylint: disable=no-member
 
+    def _char_template(self, name):
+        """Return the template Characteristic for name, building it on first use."""
+        template = self._char_templates.get(name)
+        if template is None:
+            char_dict = self.char_types[name].copy()
+            if (
+                "Format" not in char_dict
+                or "Permissions" not in char_dict
+                or "UUID" not in char_dict
+            ):
+                raise KeyError(f"Could not load char {name}!")
+            template = Characteristic.from_dict(name, char_dict, from_loader=True)
+            self._char_templates[name] = template
+        return template
+
+    def _serv_template(self, name):
+        """Return the template Service for name, building it on first use."""
+        template = self._serv_templates.get(name)
+        if template is None:
+            service_dict = self.serv_types[name].copy()
+            if "RequiredCharacteristics" not in service_dict or "UUID" not in service_dict:
+                raise KeyError(f"Could not load service {name}!")
+            template = Service.from_dict(name, service_dict, self)
+            self._serv_templates[name] = template
+        return template
+
+    def prebuild(self):
+        """Build every template up front so later gets never touch the json dicts."""
+        for name in self.char_types:
+            try:
+                self._char_template(name)
+            except KeyError:
+                logger.debug("Loader skipping incomplete characteristic %s", name)
+        for name in self.serv_types:
+            try:
+                self._serv_template(name)
+            except KeyError:
+                logger.debug("Loader skipping incomplete service %s", name)
+        return self
+
     def get_char(self, name):
         """Return new Characteristic object."""
-        char_dict = self.char_types[name].copy()
-        if (
-            "Format" not in char_dict
-            or "Permissions" not in char_dict
-            or "UUID" not in char_dict
-        ):
-            raise KeyError(f"Could not load char {name}!")
-        return Characteristic.from_dict(name, char_dict, from_loader=True)
+        return self._char_template(name).clone()
 
     def get_service(self, name):
         """Return new service object."""
-        service_dict = self.serv_types[name].copy()
-        if "RequiredCharacteristics" not in service_dict or "UUID" not in service_dict:
-            raise KeyError(f"Could not load service {name}!")
-        return Service.from_dict(name, service_dict, self)
+        return self._serv_template(name).clone()
 
     @classmethod
     def from_dict(cls, char_dict=None, serv_dict=None):
@@ -60,6 +98,8 @@ class Loader:
         loader = cls.__new__(Loader)
         loader.char_types = char_dict or {}
         loader.serv_types = serv_dict or {}
+        loader._char_templates = {}
+        loader._serv_templates = {}
         return loader
 
 
@@ -71,5 +111,7 @@ def get_loader():
     # pylint: disable=global-statement
     global _loader
     if _loader is None:
-        _loader = Loader()
+        with _loader_lock:
+            if _loader is None:
+                _loader = Loader().prebuild()
     return _loader
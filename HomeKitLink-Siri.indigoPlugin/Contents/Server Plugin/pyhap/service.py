@@ -104,16 +104,19 @@ class Service:
         return char
 
     # pylint: disable=invalid-name
-    def to_HAP(self):
+    def to_HAP(self, include_value=True):
         """Create a HAP representation of this Service.
 
+        :param include_value: Whether to include characteristic values.
+        :type include_value: bool
+
         :return: A HAP representation.
         :rtype: dict.
         """
         hap = {
             HAP_REPR_IID: self.broker.iid_manager.get_iid(self),
             HAP_REPR_TYPE: self._uuid_str,
-            HAP_REPR_CHARS: [c.to_HAP() for c in self.characteristics],
+            HAP_REPR_CHARS: [c.to_HAP(include_value) for c in self.characteristics],
         }
 
         if self.is_primary_service is not None:
@@ -128,6 +131,22 @@ class Service:
 
         return hap
 
+    def clone(self):
+        """Return a new, unattached copy of this service with cloned characteristics."""
+        service = Service.__new__(type(self))
+        service.broker = None
+        service.characteristics = []
+        service.linked_services = []
+        service.display_name = self.display_name
+        service.type_id = self.type_id
+        service.is_primary_service = None
+        service.setter_callback = None
+        service.unique_id = None
+        service._uuid_str = self._uuid_str
+        for char in self.characteristics:
+            service.add_characteristic(char.clone())
+        return service
+
     @classmethod
     def from_dict(cls, name, json_dict, loader):
         """Initialize a service object from a dict.